@@ -0,0 +1,113 @@
+"""
+Import-time regression benchmark for the capstone pipeline stages.
+
+Imports every stage module in a fresh interpreter and reports the time it takes and
+which heavy dependencies (mlflow, nltk, boto3, scikit-learn) came with it. Those are
+meant to load only once a stage needs them, so the script exits non-zero when a
+module pulls one in that it is not allowed to, or takes longer than ``--max-seconds``.
+
+Examples::
+
+    python benchmarks/imports.py
+    python benchmarks/imports.py --repeat 5 --max-seconds 1.5 --json imports.json
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("mlflow", "nltk", "boto3", "sklearn")
+
+# Stage modules and the heavy dependencies they may import eagerly
+STAGES = {
+    "capstone.config": (),
+    "capstone.logger": (),
+    "capstone.utils": (),
+    "capstone.data.ingest": (),
+    "capstone.data.normalizer": (),
+    "capstone.data.pre_process": (),
+    "capstone.feature.engineering": ("sklearn",),
+    "capstone.modeling.metrics": (),
+    "capstone.modeling.export": ("sklearn",),
+    "capstone.modeling.train": ("sklearn",),
+    "capstone.modeling.tune": ("sklearn",),
+    "capstone.modeling.evaluate": ("sklearn",),
+    "capstone.modeling.register": (),
+    "capstone.modeling.predict": (),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+loaded = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Time one import of ``module`` in a new interpreter."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT_DIR)}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Stages may log while importing; the probe's result is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int) -> dict:
+    """Median import time and eagerly loaded heavy modules of every stage."""
+    results = {}
+    for module, allowed in STAGES.items():
+        samples = [measure(module) for _ in range(repeat)]
+        loaded = samples[-1]["loaded"]
+        results[module] = {
+            "seconds": statistics.median(sample["seconds"] for sample in samples),
+            "loaded": loaded,
+            "unexpected": [name for name in loaded if name not in allowed],
+        }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module")
+    parser.add_argument(
+        "--max-seconds", type=float, help="Fail if any module takes longer to import"
+    )
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    failed = False
+    print(f"{'module':<32} {'seconds':>8}  heavy imports")
+    for module, result in results.items():
+        notes = ", ".join(result["loaded"]) or "-"
+        if result["unexpected"]:
+            notes += f"  UNEXPECTED: {', '.join(result['unexpected'])}"
+            failed = True
+        if args.max_seconds is not None and result["seconds"] > args.max_seconds:
+            notes += f"  SLOWER THAN {args.max_seconds}s"
+            failed = True
+        print(f"{module:<32} {result['seconds']:>8.3f}  {notes}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=4)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
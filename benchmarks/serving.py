@@ -0,0 +1,258 @@
+"""
+Load-test and latency benchmark for brainserve.
+
+Replays a JSONL corpus (one object per line with a ``text`` or ``review`` field)
+against the app and reports throughput and p50/p95/p99 latency, plus a per-stage
+breakdown of normalization, vectorization, DataFrame construction and ``predict``.
+
+Examples::
+
+    # In-process, against a local stand-in model (no MLflow server needed)
+    python benchmarks/serving.py --standin --requests 2000
+
+    # Over HTTP against a running server, 16 concurrent clients, 32 texts per batch
+    python benchmarks/serving.py --url http://localhost:5001 --corpus reviews.jsonl \\
+        --concurrency 16 --batch-size 32
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+from urllib import parse, request
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.standin import build_standin, synthetic_reviews  # noqa: E402
+
+PERCENTILES = (50, 95, 99)
+
+
+def load_corpus(path: Path) -> list[str]:
+    """Read the ``text`` (or ``review``) field of every line of a JSONL corpus."""
+    texts = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record.get("text") or record["review"])
+    return texts
+
+
+def summarize(latencies: list[float], elapsed: float, texts: int) -> dict:
+    """Throughput and latency percentiles (milliseconds) of a run."""
+    values = np.asarray(latencies) * 1000
+    summary = {
+        "requests": len(values),
+        "texts": texts,
+        "requests_per_second": len(values) / elapsed,
+        "texts_per_second": texts / elapsed,
+        "mean_ms": float(values.mean()),
+    }
+    for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{q}_ms"] = float(value)
+    return summary
+
+
+def run_load(send, payloads: list[list[str]], concurrency: int) -> dict:
+    """Send every payload with ``concurrency`` clients and time each request."""
+
+    def timed(payload):
+        start = time.perf_counter()
+        send(payload)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, payloads))
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, sum(len(p) for p in payloads))
+
+
+def in_process_sender(batch_size: int):
+    """Send requests through the Flask test client of ``brainserve/app.py``."""
+    from brainserve.app import app
+
+    client = app.test_client()
+
+    def send(texts):
+        if batch_size == 1:
+            response = client.post("/predict", data={"text": texts[0]})
+        else:
+            response = client.post("/v1/predict/batch", json={"texts": texts})
+        if response.status_code != 200:
+            raise RuntimeError(f"Request failed with status {response.status_code}")
+
+    return send
+
+
+def http_sender(url: str, batch_size: int, timeout: float):
+    """Send requests to a running brainserve instance over HTTP."""
+
+    def send(texts):
+        if batch_size == 1:
+            data = parse.urlencode({"text": texts[0]}).encode()
+            req = request.Request(f"{url}/predict", data=data)
+        else:
+            data = json.dumps({"texts": texts}).encode()
+            req = request.Request(
+                f"{url}/v1/predict/batch",
+                data=data,
+                headers={"Content-Type": "application/json"},
+            )
+        with request.urlopen(req, timeout=timeout) as response:
+            response.read()
+
+    return send
+
+
+def profile_stages(texts: list[str]) -> dict:
+    """Time each inference stage per text, as the single-text ``/predict`` path runs."""
+    from brainserve import serving
+
+    served = serving.current_model()
+    timings = {stage: [] for stage in ("normalize", "vectorize", "frame", "predict")}
+    for text in texts:
+        start = time.perf_counter()
+        normalized = serving.normalize_text(text)
+        normalized_at = time.perf_counter()
+        features = served.vectorizer.transform([normalized])
+        vectorized_at = time.perf_counter()
+        # Dense DataFrame the pre-sparse serving path built for every request
+        pd.DataFrame(
+            features.toarray(), columns=[str(i) for i in range(features.shape[1])]
+        )
+        framed_at = time.perf_counter()
+        served.model.predict(features)
+        predicted_at = time.perf_counter()
+
+        timings["normalize"].append(normalized_at - start)
+        timings["vectorize"].append(vectorized_at - normalized_at)
+        timings["frame"].append(framed_at - vectorized_at)
+        timings["predict"].append(predicted_at - framed_at)
+
+    report = {}
+    for stage, values in timings.items():
+        values_us = np.asarray(values) * 1e6
+        report[stage] = {"mean_us": float(values_us.mean())}
+        for q, value in zip(PERCENTILES, np.percentile(values_us, PERCENTILES)):
+            report[stage][f"p{q}_us"] = float(value)
+    return report
+
+
+def print_report(report: dict) -> None:
+    load = report["load"]
+    print(
+        f"\n{report['mode']} ({report['engine']}) | {load['requests']} requests, "
+        f"{load['texts']} texts, "
+        f"concurrency {report['concurrency']}, batch size {report['batch_size']}"
+    )
+    print(
+        f"  throughput: {load['requests_per_second']:.1f} req/s, "
+        f"{load['texts_per_second']:.1f} texts/s"
+    )
+    print(
+        "  latency ms: "
+        + ", ".join(f"p{q}={load[f'p{q}_ms']:.2f}" for q in PERCENTILES)
+        + f", mean={load['mean_ms']:.2f}"
+    )
+    if "stages" in report:
+        print("  per-stage latency (us, single text):")
+        for stage, values in report["stages"].items():
+            print(
+                f"    {stage:<10}"
+                + "  ".join(f"p{q}={values[f'p{q}_us']:9.1f}" for q in PERCENTILES)
+                + f"  mean={values['mean_us']:9.1f}"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", type=Path, help="JSONL corpus to replay")
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=1000,
+        help="Number of synthetic reviews to use when no corpus is given",
+    )
+    parser.add_argument("--url", help="Benchmark a running server over HTTP")
+    parser.add_argument(
+        "--standin",
+        action="store_true",
+        help="Serve a local stand-in model instead of the MLflow registry model",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("sklearn", "linear"),
+        default="sklearn",
+        help="Scoring engine of the stand-in model",
+    )
+    parser.add_argument("--max-features", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--no-stages", action="store_true")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    texts = (
+        load_corpus(args.corpus) if args.corpus else synthetic_reviews(args.synthetic)
+    )
+
+    if args.standin and not args.url:
+        standin_dir = Path(tempfile.mkdtemp(prefix="brainserve-standin-"))
+        model_dir, vectorizer_path, linear_dir = build_standin(
+            texts, standin_dir, args.max_features
+        )
+        os.environ["SCORING_ENGINE"] = args.engine
+        os.environ["MODEL_URI"] = str(
+            linear_dir if args.engine == "linear" else model_dir
+        )
+        os.environ["VECTORIZER_PATH"] = str(vectorizer_path)
+
+    stream = itertools.cycle(texts)
+    payloads = [
+        [next(stream) for _ in range(args.batch_size)] for _ in range(args.requests)
+    ]
+
+    if args.url:
+        mode = f"http {args.url}"
+        send = http_sender(args.url.rstrip("/"), args.batch_size, args.timeout)
+    else:
+        mode = "in-process"
+        send = in_process_sender(args.batch_size)
+
+    for payload in payloads[: args.warmup]:
+        send(payload)
+
+    report = {
+        "mode": mode,
+        "engine": os.environ.get("SCORING_ENGINE", "sklearn"),
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "load": run_load(send, payloads, args.concurrency),
+    }
+    if not args.url and not args.no_stages:
+        report["stages"] = profile_stages(texts[: args.requests])
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
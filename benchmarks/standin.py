@@ -0,0 +1,71 @@
+"""
+Local stand-in for the registered model so benchmarks run without an MLflow server.
+
+The stand-in is a CountVectorizer + LogisticRegression fitted on the benchmark corpus
+itself (labels are derived from a stable hash of each text) and saved in the same
+MLflow sklearn format brainserve loads from the registry.
+"""
+
+import hashlib
+from pathlib import Path
+import random
+
+import joblib
+import mlflow.sklearn
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from capstone.data.normalizer import TextNormalizer
+from capstone.modeling.export import export_linear_scorer
+
+POSITIVE_WORDS = (
+    "great love wonderful amazing brilliant superb enjoyable moving".split()
+)
+NEGATIVE_WORDS = "awful terrible boring bad waste poor dull predictable".split()
+NEUTRAL_WORDS = (
+    "movie film plot actor actress scene story director music ending character "
+    "camera script dialogue cast minute sequel audience performance screen"
+).split()
+
+
+def synthetic_reviews(count: int, seed: int = 42) -> list[str]:
+    """Generate reproducible review-like texts of varying length."""
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(count):
+        sentiment = POSITIVE_WORDS if rng.random() < 0.5 else NEGATIVE_WORDS
+        words = rng.choices(sentiment, k=rng.randint(2, 8))
+        words += rng.choices(NEUTRAL_WORDS, k=rng.randint(10, 120))
+        rng.shuffle(words)
+        reviews.append("The " + " ".join(words) + f". Rated {rng.randint(1, 10)}/10!")
+    return reviews
+
+
+def build_standin(
+    texts: list[str], output_dir: Path, max_features: int = 50
+) -> tuple[Path, Path, Path]:
+    """
+    Fit and save a stand-in model and vectorizer.
+
+    Returns the MLflow model directory, the vectorizer pickle path and the exported
+    linear scorer directory.
+    """
+    output_dir = Path(output_dir)
+    normalizer = TextNormalizer()
+    normalized = [normalizer.normalize(text) for text in texts]
+    labels = np.array([hashlib.sha1(t.encode()).digest()[0] & 1 for t in texts])
+    labels[:2] = [0, 1]  # both classes must be present
+
+    vectorizer = CountVectorizer(max_features=max_features)
+    features = vectorizer.fit_transform(normalized)
+    clf = LogisticRegression(C=1, solver="liblinear", penalty="l2", random_state=42)
+    clf.fit(features, labels)
+
+    model_dir = output_dir / "model"
+    vectorizer_path = output_dir / "vectorizer.pkl"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    mlflow.sklearn.save_model(clf, model_dir)
+    joblib.dump(vectorizer, vectorizer_path)
+    linear_dir = export_linear_scorer(clf, vectorizer, output_dir / "linear_scorer")
+    return model_dir, vectorizer_path, linear_dir
@@ -1,183 +1,107 @@
-from pathlib import Path
-import re
-import string
 import time
-import warnings
-
-from dotenv import load_dotenv
-from flask import Flask, render_template, request
-import joblib
-import mlflow
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import numpy as np
-import pandas as pd
-from prometheus_client import (
-    CONTENT_TYPE_LATEST,
-    CollectorRegistry,
-    Counter,
-    Histogram,
-    generate_latest,
-)
-
-from environment import MLFLOW_TRACKING_URI
-
-warnings.simplefilter("ignore", UserWarning)
-warnings.filterwarnings("ignore")
-load_dotenv()  # take environment variables
-
-# Set up MLflow tracking URI
-mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
-
-# ------------------------------------------------------------------------------------------
-# Model and vectorizer setup
-model_name = "capstone_model"
-
-
-def lemmatization(text):
-    """Lemmatize the text."""
-    lemmatizer = WordNetLemmatizer()
-    text = text.split()
-    text = [lemmatizer.lemmatize(word) for word in text]
-    return " ".join(text)
-
-
-def remove_stop_words(text):
-    """Remove stop words from the text."""
-    stop_words = set(stopwords.words("english"))
-    text = [word for word in str(text).split() if word not in stop_words]
-    return " ".join(text)
-
-
-def removing_numbers(text):
-    """Remove numbers from the text."""
-    text = "".join([char for char in text if not char.isdigit()])
-    return text
-
-
-def lower_case(text):
-    """Convert text to lower case."""
-    text = text.split()
-    text = [word.lower() for word in text]
-    return " ".join(text)
-
-
-def removing_punctuations(text):
-    """Remove punctuations from the text."""
-    text = re.sub("[%s]" % re.escape(string.punctuation), " ", text)
-    text = text.replace("؛", "")
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-
-def removing_urls(text):
-    """Remove URLs from the text."""
-    url_pattern = re.compile(r"https?://\S+|www\.\S+")
-    return url_pattern.sub(r"", text)
-
-
-def remove_small_sentences(df):
-    """Remove sentences with less than 3 words."""
-    for i in range(len(df)):
-        if len(df.text.iloc[i].split()) < 3:
-            df.text.iloc[i] = np.nan
-
-
-def normalize_text(text):
-    text = lower_case(text)
-    text = remove_stop_words(text)
-    text = removing_numbers(text)
-    text = removing_punctuations(text)
-    text = removing_urls(text)
-    text = lemmatization(text)
-
-    return text
 
+from flask import Flask, jsonify, render_template, request
+from prometheus_client import CONTENT_TYPE_LATEST
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# Create a custom registry
-registry = CollectorRegistry()
-
-# Define your custom metrics using this registry
-REQUEST_COUNT = Counter(
-    "app_request_count",
-    "Total number of requests to the app",
-    ["method", "endpoint"],
-    registry=registry,
-)
-REQUEST_LATENCY = Histogram(
-    "app_request_latency_seconds",
-    "Latency of requests in seconds",
-    ["endpoint"],
-    registry=registry,
+from brainserve.metrics import (
+    PREDICTION_COUNT,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    STAGE_LATENCY,
+    generate_metrics,
 )
-PREDICTION_COUNT = Counter(
-    "model_prediction_count",
-    "Count of predictions for each class",
-    ["prediction"],
-    registry=registry,
+from brainserve.serving import (
+    AdminRequestError,
+    BatchRequestError,
+    current_model,
+    format_predictions,
+    handle_admin_reload,
+    parse_batch_payload,
+    predict_texts,
+    routing_key,
 )
 
-
-def get_latest_model_version(model_name_arg):
-    client = mlflow.MlflowClient()
-    latest_version = client.get_latest_versions(model_name_arg, stages=["Staging"])
-    if not latest_version:
-        latest_version = client.get_latest_versions(model_name_arg, stages=["None"])
-    return latest_version[0].version if latest_version else None
+# Initialize Flask app
+app = Flask(__name__)
 
 
-model_version = get_latest_model_version(model_name)
-model_uri = f"models:/{model_name}/{model_version}"
-print(f"Fetching model from: {model_uri}")
-model = mlflow.pyfunc.load_model(model_uri)
-print("Loaded model.")
-vectorizer = joblib.load(Path("models/vectorizer.pkl"))
-print("Loaded vectorizer.")
+def render_page(result):
+    with STAGE_LATENCY.labels(stage="render").time():
+        return render_template("index.html", result=result)
 
 
 @app.route("/")
+@REQUESTS_IN_FLIGHT.labels(endpoint="/").track_inprogress()
 def home():
     REQUEST_COUNT.labels(method="GET", endpoint="/").inc()
     start_time = time.time()
-    response = render_template("index.html", result=None)
+    response = render_page(None)
     REQUEST_LATENCY.labels(endpoint="/").observe(time.time() - start_time)
     return response
 
 
 @app.route("/predict", methods=["POST"])
+@REQUESTS_IN_FLIGHT.labels(endpoint="/predict").track_inprogress()
 def predict():
     REQUEST_COUNT.labels(method="POST", endpoint="/predict").inc()
     start_time = time.time()
 
     text = request.form["text"]
-    # Clean text
-    text = normalize_text(text)
-    # Convert to features
-    features = vectorizer.transform([text])
-    features_df = pd.DataFrame(
-        features.toarray(), columns=[str(i) for i in range(features.shape[1])]
-    )
-
-    # Predict
-    result = model.predict(features_df)
-    prediction = result[0]
+    labels, _, _ = predict_texts([text], [routing_key(request.headers, [text])])
+    prediction = labels[0]
 
     # Increment prediction count metric
     PREDICTION_COUNT.labels(prediction=str(prediction)).inc()
 
+    response = render_page(prediction)
+
     # Measure latency
     REQUEST_LATENCY.labels(endpoint="/predict").observe(time.time() - start_time)
 
-    return render_template("index.html", result=prediction)
+    return response
+
+
+@app.route("/v1/predict/batch", methods=["POST"])
+@REQUESTS_IN_FLIGHT.labels(endpoint="/v1/predict/batch").track_inprogress()
+def predict_batch():
+    """Score a JSON array of texts (or ``{"texts": [...]}``) in one pass."""
+    REQUEST_COUNT.labels(method="POST", endpoint="/v1/predict/batch").inc()
+    start_time = time.time()
+
+    try:
+        texts = parse_batch_payload(request.get_json(silent=True))
+    except BatchRequestError as e:
+        return jsonify(error=str(e)), e.status_code
+
+    model_version, predictions = current_model().version, []
+    if texts:
+        key = routing_key(request.headers, texts)
+        labels, probabilities, versions = predict_texts(texts, [key] * len(texts))
+        model_version = versions[0]
+        predictions = format_predictions(labels, probabilities)
+
+    REQUEST_LATENCY.labels(endpoint="/v1/predict/batch").observe(
+        time.time() - start_time
+    )
+    return jsonify(model_version=model_version, predictions=predictions)
+
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    """Move every worker to the latest (or the requested) model version."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        return jsonify(handle_admin_reload(request.headers, payload)), 202
+    except AdminRequestError as e:
+        body = {"error": str(e), "model_version": current_model().version}
+        return jsonify(body), e.status_code
 
 
 @app.route("/metrics", methods=["GET"])
 def metrics():
     """Expose only custom Prometheus metrics."""
-    return generate_latest(registry), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+    return generate_metrics(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
 
 
 if __name__ == "__main__":
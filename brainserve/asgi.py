@@ -0,0 +1,160 @@
+"""
+ASGI entry point for brainserve with request coalescing.
+
+Run from the repository root with
+``gunicorn -k uvicorn.workers.UvicornWorker brainserve.asgi:app`` (or
+``uvicorn brainserve.asgi:app``).
+Concurrent ``/predict`` and ``/v1/predict/batch`` calls that arrive within
+``COALESCE_MAX_WAIT_MS`` of each other are scored together in one vectorize+predict call.
+"""
+
+from contextlib import asynccontextmanager
+from pathlib import Path
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+
+from brainserve.batching import MicroBatcher
+from brainserve.environment import COALESCE_MAX_BATCH_SIZE, COALESCE_MAX_WAIT_MS
+from brainserve.metrics import (
+    COALESCED_BATCH_SIZE,
+    PREDICTION_COUNT,
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    STAGE_LATENCY,
+    generate_metrics,
+)
+from brainserve.serving import (
+    AdminRequestError,
+    BatchRequestError,
+    current_model,
+    format_predictions,
+    handle_admin_reload,
+    parse_batch_payload,
+    predict_texts,
+    routing_key,
+)
+
+templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
+
+
+def predict_coalesced(texts, keys):
+    COALESCED_BATCH_SIZE.observe(len(texts))
+    return predict_texts(texts, keys)
+
+
+batcher = MicroBatcher(
+    predict_coalesced,
+    max_batch_size=COALESCE_MAX_BATCH_SIZE.get(),
+    max_wait_ms=COALESCE_MAX_WAIT_MS.get(),
+)
+
+
+def render_page(request, result):
+    # TemplateResponse renders the template when it is created
+    with STAGE_LATENCY.labels(stage="render").time():
+        return templates.TemplateResponse(request, "index.html", {"result": result})
+
+
+async def home(request):
+    with REQUESTS_IN_FLIGHT.labels(endpoint="/").track_inprogress():
+        REQUEST_COUNT.labels(method="GET", endpoint="/").inc()
+        start_time = time.time()
+        response = render_page(request, None)
+        REQUEST_LATENCY.labels(endpoint="/").observe(time.time() - start_time)
+        return response
+
+
+async def predict(request):
+    with REQUESTS_IN_FLIGHT.labels(endpoint="/predict").track_inprogress():
+        REQUEST_COUNT.labels(method="POST", endpoint="/predict").inc()
+        start_time = time.time()
+
+        form = await request.form()
+        text = form.get("text")
+        if not isinstance(text, str):
+            return JSONResponse({"error": "Expected a 'text' form field."}, 400)
+        key = routing_key(request.headers, [text])
+        labels, _, _ = await batcher.submit([text], key)
+        prediction = labels[0]
+
+        # Increment prediction count metric
+        PREDICTION_COUNT.labels(prediction=str(prediction)).inc()
+
+        response = render_page(request, prediction)
+
+        # Measure latency
+        REQUEST_LATENCY.labels(endpoint="/predict").observe(time.time() - start_time)
+
+        return response
+
+
+async def predict_batch(request):
+    """Score a JSON array of texts (or ``{"texts": [...]}``) in one pass."""
+    with REQUESTS_IN_FLIGHT.labels(endpoint="/v1/predict/batch").track_inprogress():
+        REQUEST_COUNT.labels(method="POST", endpoint="/v1/predict/batch").inc()
+        start_time = time.time()
+
+        try:
+            texts = parse_batch_payload(await request.json())
+        except ValueError as e:
+            status_code = e.status_code if isinstance(e, BatchRequestError) else 400
+            return JSONResponse({"error": str(e)}, status_code=status_code)
+
+        model_version, predictions = current_model().version, []
+        if texts:
+            key = routing_key(request.headers, texts)
+            labels, probabilities, versions = await batcher.submit(texts, key)
+            model_version = versions[0]
+            predictions = format_predictions(labels, probabilities)
+
+        REQUEST_LATENCY.labels(endpoint="/v1/predict/batch").observe(
+            time.time() - start_time
+        )
+        return JSONResponse(
+            {"model_version": model_version, "predictions": predictions}
+        )
+
+
+async def admin_reload(request):
+    """Move every worker to the latest (or the requested) model version."""
+    try:
+        payload = await request.json() if await request.body() else {}
+    except ValueError:
+        payload = None
+    try:
+        body = await run_in_threadpool(handle_admin_reload, request.headers, payload)
+    except AdminRequestError as e:
+        body = {"error": str(e), "model_version": current_model().version}
+        return JSONResponse(body, status_code=e.status_code)
+    return JSONResponse(body, status_code=202)
+
+
+async def metrics(request):
+    """Expose only custom Prometheus metrics."""
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await batcher.start()
+    yield
+    await batcher.stop()
+
+
+app = Starlette(
+    routes=[
+        Route("/", home),
+        Route("/predict", predict, methods=["POST"]),
+        Route("/v1/predict/batch", predict_batch, methods=["POST"]),
+        Route("/admin/reload", admin_reload, methods=["POST"]),
+        Route("/metrics", metrics),
+    ],
+    lifespan=lifespan,
+)
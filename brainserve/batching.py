@@ -0,0 +1,91 @@
+import asyncio
+import contextlib
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent prediction requests into single model calls.
+
+    Requests are queued; the first one opens a batch that is closed when it holds
+    ``max_batch_size`` texts or ``max_wait_ms`` milliseconds have passed. The merged
+    batch is scored by ``predict_fn(texts, keys)`` on a thread so the event loop keeps
+    accepting requests, and each caller gets back its own slice of every part of the
+    results. ``keys`` repeats the key each request was submitted with for every one of
+    its texts, so that the requests can still be told apart in the merged batch.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._held = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._held = None
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._worker
+
+    async def submit(self, texts, key=None):
+        """Queue texts for scoring and wait for their slice of each result part."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, key, future))
+        return await future
+
+    async def _collect(self):
+        """
+        Wait for a first request, then gather more until the batch is full or due.
+
+        A request that would take the batch past ``max_batch_size`` is held over to
+        open the next batch; only a single request larger than the limit is scored on
+        its own as an oversized batch.
+        """
+        loop = asyncio.get_running_loop()
+        if self._held is not None:
+            items, self._held = [self._held], None
+        else:
+            items = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except TimeoutError:
+                break
+            if size + len(item[0]) > self.max_batch_size:
+                self._held = item
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            texts = [text for item_texts, _, _ in items for text in item_texts]
+            keys = [key for item_texts, key, _ in items for _ in item_texts]
+            try:
+                results = await loop.run_in_executor(None, self.predict_fn, texts, keys)
+            except Exception as e:
+                for _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, _, future in items:
+                end = offset + len(item_texts)
+                # Callers that disconnected have cancelled their future
+                if not future.done():
+                    future.set_result(tuple(part[offset:end] for part in results))
+                offset = end
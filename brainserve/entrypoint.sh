@@ -18,5 +18,11 @@ endpoint_url = ${AWS_S3_ENDPOINT_URL}
 EOF
 fi
 
+# Prometheus multiprocess mode needs an empty metrics directory at every start
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 # Start the app
 exec "$@"
@@ -89,3 +89,25 @@ S3_ACCESS_KEY = _EnvironmentVariable("S3_ACCESS_KEY", str, None)
 S3_SECRET_KEY = _EnvironmentVariable("S3_SECRET_KEY", str, None)
 PARAMS_FILE = _EnvironmentVariable("PARAMS_FILE", str, "params.yaml")
 MLFLOW_TRACKING_URI = _EnvironmentVariable("MLFLOW_TRACKING_URI", str, None)
+BATCH_MAX_SIZE = _EnvironmentVariable("BATCH_MAX_SIZE", int, 1000)
+LEMMA_CACHE_SIZE = _EnvironmentVariable("LEMMA_CACHE_SIZE", int, 100_000)
+COALESCE_MAX_BATCH_SIZE = _EnvironmentVariable("COALESCE_MAX_BATCH_SIZE", int, 64)
+COALESCE_MAX_WAIT_MS = _EnvironmentVariable("COALESCE_MAX_WAIT_MS", float, 5.0)
+MODEL_URI = _EnvironmentVariable("MODEL_URI", str, None)
+VECTORIZER_PATH = _EnvironmentVariable("VECTORIZER_PATH", str, "models/vectorizer.pkl")
+MODEL_VERSION = _EnvironmentVariable("MODEL_VERSION", str, None)
+MODEL_CACHE_DIR = _EnvironmentVariable("MODEL_CACHE_DIR", str, "models/cache")
+MODEL_CACHE_OFFLINE = _BooleanEnvironmentVariable("MODEL_CACHE_OFFLINE", False)
+MODEL_RELOAD_INTERVAL = _EnvironmentVariable("MODEL_RELOAD_INTERVAL", float, 0.0)
+MODEL_SYNC_INTERVAL = _EnvironmentVariable("MODEL_SYNC_INTERVAL", float, 5.0)
+ADMIN_TOKEN = _EnvironmentVariable("ADMIN_TOKEN", str, None)
+SCORING_ENGINE = _EnvironmentVariable("SCORING_ENGINE", str, "sklearn")
+PROMETHEUS_MULTIPROC_DIR = _EnvironmentVariable("PROMETHEUS_MULTIPROC_DIR", str, None)
+PREDICTION_CACHE_SIZE = _EnvironmentVariable("PREDICTION_CACHE_SIZE", int, 10_000)
+PREDICTION_CACHE_TTL = _EnvironmentVariable("PREDICTION_CACHE_TTL", float, 3600.0)
+PREDICTION_CACHE_PATH = _EnvironmentVariable("PREDICTION_CACHE_PATH", str, None)
+CANARY_MODEL_VERSION = _EnvironmentVariable("CANARY_MODEL_VERSION", str, None)
+CANARY_PERCENT = _EnvironmentVariable("CANARY_PERCENT", float, 0.0)
+SHADOW_MODEL_VERSION = _EnvironmentVariable("SHADOW_MODEL_VERSION", str, None)
+SHADOW_WORKERS = _EnvironmentVariable("SHADOW_WORKERS", int, 1)
+SHADOW_MAX_PENDING = _EnvironmentVariable("SHADOW_MAX_PENDING", int, 64)
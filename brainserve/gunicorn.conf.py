@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for brainserve, passed with ``--config brainserve/gunicorn.conf.py``.
+
+With ``--preload`` the master loads the model, vectorizer and WordNet once and the
+workers share those pages copy-on-write. Freezing the garbage collector before the
+fork keeps the workers' collections from writing to (and so copying) those objects.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set, Prometheus metrics run in multiprocess mode:
+every worker writes its metrics to its own files in that directory and ``/metrics``
+merges them, so a scrape shows the whole server instead of one worker. The directory
+must be emptied before the server starts (``entrypoint.sh`` does).
+"""
+
+import gc
+
+
+def when_ready(server):
+    # Runs in the master after --preload and before any worker is forked
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Forked workers start from empty metric files; set what the master published
+    from brainserve.environment import PROMETHEUS_MULTIPROC_DIR
+
+    if PROMETHEUS_MULTIPROC_DIR.defined:
+        from brainserve import serving
+
+        serving.publish_model_version()
+
+
+def child_exit(server, worker):
+    # Drop the live gauges (in-flight requests, model versions) of a dead worker
+    from prometheus_client import multiprocess
+
+    from brainserve.environment import PROMETHEUS_MULTIPROC_DIR
+
+    if PROMETHEUS_MULTIPROC_DIR.defined:
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,143 @@
+from functools import lru_cache
+import json
+from pathlib import Path
+import re
+
+import numpy as np
+from scipy.sparse import coo_matrix, diags
+
+
+def _normalize_rows(features, norm):
+    """Scale each row of a CSR matrix to unit ``l1`` or ``l2`` norm, in place."""
+    if norm == "l1":
+        norms = np.asarray(abs(features).sum(axis=1)).ravel()
+    elif norm == "l2":
+        norms = np.sqrt(np.asarray(features.multiply(features).sum(axis=1)).ravel())
+    else:
+        raise ValueError(f"Unsupported norm {norm!r}")
+    norms[norms == 0.0] = 1.0
+    return diags(1.0 / norms) @ features
+
+
+class LinearScorer:
+    """
+    Scores text with an exported linear model using only NumPy and SciPy.
+
+    Loads the artifact written by ``capstone.modeling.export.export_linear_scorer`` and
+    replaces both the vectorizer and the classifier: :meth:`transform` tokenizes
+    exactly like the original Count or Hashing Vectorizer (and TF-IDF) into a CSR
+    matrix, and :meth:`predict_proba` is a sparse dot product plus a sigmoid. It skips
+    the pyfunc schema checks and pandas conversions altogether.
+
+    The coefficients, IDF weights and vocabulary are memory-mapped read-only, so every
+    process scoring with the same files shares one copy through the page cache. The
+    vocabulary stays a sorted array of terms, searched with ``np.searchsorted``,
+    instead of becoming a dict of Python strings in each worker.
+    """
+
+    def __init__(self, directory, hash_cache_size=100_000):
+        directory = Path(directory)
+        with open(directory / "meta.json") as file:
+            meta = json.load(file)
+        self.token_pattern = re.compile(meta["token_pattern"])
+        self.lowercase = meta["lowercase"]
+        self.binary = meta["binary"]
+        self.hashing = meta.get("vectorizer", "count") == "hashing"
+        if self.hashing:
+            self.vocabulary = None
+            self.n_features = meta["n_features"]
+            self.alternate_sign = meta["alternate_sign"]
+            self.norm = meta["norm"]
+            self._hash = lru_cache(maxsize=hash_cache_size)(self._hash_token)
+        else:
+            self.vocabulary = np.load(directory / "vocabulary.npy", mmap_mode="r")
+            # Terms are exported in column order, which is sorted for a fitted
+            # CountVectorizer; a fixed vocabulary needs a sorted copy and its columns
+            self.columns = None
+            if np.any(self.vocabulary[1:] < self.vocabulary[:-1]):
+                self.columns = np.argsort(self.vocabulary, kind="stable")
+                self.vocabulary = self.vocabulary[self.columns]
+            self.norm = None
+        tfidf = meta.get("tfidf")
+        self.tfidf_norm = tfidf["norm"] if tfidf else None
+        self.sublinear_tf = tfidf["sublinear_tf"] if tfidf else False
+        idf_path = directory / "idf.npy"
+        self.idf = None
+        if tfidf and idf_path.exists():
+            self.idf = np.load(idf_path, mmap_mode="r")
+        self.coef = np.load(directory / "coef.npy", mmap_mode="r")
+        self.intercept = float(np.load(directory / "intercept.npy")[0])
+        self.classes_ = np.load(directory / "classes.npy")
+
+    def _hash_token(self, token):
+        """Column and sign of a token, as ``sklearn``'s FeatureHasher computes them."""
+        from sklearn.utils import murmurhash3_32
+
+        h = murmurhash3_32(token, seed=0)
+        if h == -(2**31):
+            index = (2**31 - 1 - (self.n_features - 1)) % self.n_features
+        else:
+            index = abs(h) % self.n_features
+        sign = -1.0 if self.alternate_sign and h < 0 else 1.0
+        return index, sign
+
+    def _token_columns(self, tokens):
+        """Column and value of every token; the column is -1 for unknown terms."""
+        if self.hashing:
+            hashed = [self._hash(token) for token in tokens]
+            columns = np.fromiter((index for index, _ in hashed), np.intp, len(hashed))
+            values = np.fromiter((sign for _, sign in hashed), np.float64, len(hashed))
+            return columns, values
+        values = np.ones(len(tokens))
+        if not tokens:
+            return np.empty(0, dtype=np.intp), values
+        # Compared at their own width, so a long token never matches a term prefix
+        tokens = np.array(tokens)
+        positions = np.searchsorted(self.vocabulary, tokens)
+        np.minimum(positions, len(self.vocabulary) - 1, out=positions)
+        found = self.vocabulary[positions] == tokens
+        if self.columns is not None:
+            positions = self.columns[positions]
+        return np.where(found, positions, -1), values
+
+    def transform(self, texts):
+        """Vectorize texts into a ``(len(texts), n_features)`` CSR matrix."""
+        findall = self.token_pattern.findall
+        tokens = []
+        lengths = []
+        for text in texts:
+            if self.lowercase:
+                text = text.lower()
+            text_tokens = findall(text)
+            tokens.extend(text_tokens)
+            lengths.append(len(text_tokens))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        columns, values = self._token_columns(tokens)
+        known = columns >= 0
+        features = coo_matrix(
+            (values[known], (rows[known], columns[known])),
+            shape=(len(texts), len(self.coef)),
+        ).tocsr()
+        features.sum_duplicates()
+        if self.binary:
+            features.data.fill(1.0)
+        if self.norm is not None:
+            features = _normalize_rows(features, self.norm)
+        if self.sublinear_tf:
+            np.log(features.data, features.data)
+            features.data += 1.0
+        if self.idf is not None:
+            features = features @ diags(self.idf)
+        if self.tfidf_norm is not None:
+            features = _normalize_rows(features, self.tfidf_norm)
+        return features
+
+    def decision_function(self, features):
+        return features @ self.coef + self.intercept
+
+    def predict_proba(self, features):
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(features)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, features):
+        return self.classes_[(self.decision_function(features) > 0).astype(int)]
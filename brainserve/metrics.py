@@ -0,0 +1,197 @@
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from brainserve.environment import PROMETHEUS_MULTIPROC_DIR
+
+# Create a custom registry
+registry = CollectorRegistry()
+
+# Model stages take microseconds to a few milliseconds per call
+STAGE_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+# Define your custom metrics using this registry
+REQUEST_COUNT = Counter(
+    "app_request_count",
+    "Total number of requests to the app",
+    ["method", "endpoint"],
+    registry=registry,
+)
+REQUEST_LATENCY = Histogram(
+    "app_request_latency_seconds",
+    "Latency of requests in seconds",
+    ["endpoint"],
+    registry=registry,
+)
+PREDICTION_COUNT = Counter(
+    "model_prediction_count",
+    "Count of predictions for each class",
+    ["prediction"],
+    registry=registry,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "app_requests_in_flight",
+    "Requests being handled right now",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+STAGE_LATENCY = Histogram(
+    "app_stage_latency_seconds",
+    "Latency of each inference stage per model call or page render, in seconds",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+    registry=registry,
+)
+INPUT_LENGTH = Histogram(
+    "model_input_length_chars",
+    "Length of each text sent to the model, in characters",
+    buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536),
+    registry=registry,
+)
+INPUT_TOKENS = Histogram(
+    "model_input_tokens",
+    "Number of tokens in each text after normalization",
+    buckets=(1, 4, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+    registry=registry,
+)
+LEMMA_CACHE_LOOKUPS = Gauge(
+    "lemma_cache_lookups",
+    "Lemma cache lookups by result",
+    ["result"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+MODEL_CACHE_LOOKUPS = Counter(
+    "model_cache_lookup_count",
+    "Local model cache lookups by result",
+    ["result"],
+    registry=registry,
+)
+PREDICTION_CACHE_LOOKUPS = Counter(
+    "prediction_cache_lookup_count",
+    "Prediction cache lookups by result, one per text",
+    ["result"],
+    registry=registry,
+)
+PREDICTION_CACHE_EVICTIONS = Counter(
+    "prediction_cache_eviction_count",
+    "Predictions dropped from the cache by reason (capacity, expired, model_change)",
+    ["reason"],
+    registry=registry,
+)
+MODEL_LOAD_DURATION = Histogram(
+    "model_load_duration_seconds",
+    "Time to load a model and its vectorizer, by trigger (startup or reload)",
+    ["trigger"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+    registry=registry,
+)
+COALESCED_BATCH_SIZE = Histogram(
+    "model_coalesced_batch_size",
+    "Number of texts scored per coalesced model call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+    registry=registry,
+)
+MODEL_VERSION_LATENCY = Histogram(
+    "model_version_latency_seconds",
+    "Vectorize and predict time per model call, by version and role",
+    ["version", "role"],
+    buckets=STAGE_BUCKETS,
+    registry=registry,
+)
+MODEL_VERSION_PREDICTIONS = Counter(
+    "model_version_prediction_count",
+    "Texts answered by each model version, by role (primary or canary)",
+    ["version", "role"],
+    registry=registry,
+)
+SHADOW_AGREEMENT = Counter(
+    "shadow_agreement_count",
+    "Shadow predictions by whether their label matches the served one",
+    ["version", "result"],
+    registry=registry,
+)
+SHADOW_PROBABILITY_DELTA = Histogram(
+    "shadow_probability_delta",
+    "Absolute difference of the shadow and served positive class probabilities",
+    ["version"],
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0),
+    registry=registry,
+)
+SHADOW_DROPPED = Counter(
+    "shadow_dropped_count",
+    "Batches not shadowed because the shadow pool was saturated",
+    ["version"],
+    registry=registry,
+)
+MODEL_VERSION_INFO = Gauge(
+    "model_version_info",
+    "Model versions held by this worker, by role (current, previous, canary, shadow)",
+    ["version", "role"],
+    multiprocess_mode="liveall",
+    registry=registry,
+)
+MODEL_RELOADS = Counter(
+    "model_reload_count",
+    "Model hot reloads by result",
+    ["result"],
+    registry=registry,
+)
+
+# Series of MODEL_VERSION_INFO set by this process
+_model_version_labels = []
+
+
+def set_model_versions(current, previous=None, canary=None, shadow=None):
+    """
+    Publish the model versions this process holds, by role.
+
+    The series of versions no longer held are zeroed before they are cleared: in
+    multiprocess mode their values live in this process's file, which ``clear()``
+    does not touch.
+    """
+    for labels in _model_version_labels:
+        MODEL_VERSION_INFO.labels(*labels).set(0)
+    MODEL_VERSION_INFO.clear()
+    _model_version_labels[:] = [(str(current), "current")]
+    roles = {"previous": previous, "canary": canary, "shadow": shadow}
+    for role, version in roles.items():
+        if version is not None:
+            _model_version_labels.append((str(version), role))
+    for labels in _model_version_labels:
+        MODEL_VERSION_INFO.labels(*labels).set(1)
+
+
+def generate_metrics():
+    """
+    Render the custom metrics in the Prometheus text format.
+
+    Under gunicorn with ``PROMETHEUS_MULTIPROC_DIR`` set, every worker writes its
+    metrics to files in that directory and the ones of all workers are merged here,
+    so any worker answers for the whole server.
+    """
+    if not PROMETHEUS_MULTIPROC_DIR.defined:
+        return generate_latest(registry)
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged)
+    return generate_latest(merged)
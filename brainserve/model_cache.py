@@ -0,0 +1,182 @@
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import joblib
+import mlflow
+import mlflow.sklearn
+
+from brainserve.linear_scorer import LinearScorer
+from brainserve.metrics import MODEL_CACHE_LOOKUPS
+
+
+class ModelCache:
+    """
+    Content-addressed local cache of resolved model versions.
+
+    Each registry version is stored once as a prebuilt bundle holding both the model and
+    its vectorizer, named by the SHA-256 of its contents::
+
+        <root>/objects/<digest>/bundle.joblib
+        <root>/refs/<model_name>/<version>   # contains <digest>
+        <root>/refs/<model_name>/latest      # last version that was loaded
+        <root>/refs/<model_name>/target.<role>  # version every worker should serve
+        <root>/refs/<model_name>/polled      # registry's latest version when last polled
+
+    Bundles are uncompressed joblib files, so their NumPy arrays are memory-mapped on
+    load and shared through the page cache by every process that opens them. A cached
+    version loads without any registry or artifact-store round trip.
+    """
+
+    BUNDLE_NAME = "bundle.joblib"
+    LINEAR_SCORER_NAME = "linear_scorer"
+
+    def __init__(self, root, model_name, vectorizer_path=None):
+        self.root = Path(root)
+        self.model_name = model_name
+        self.vectorizer_path = vectorizer_path
+        self.refs_dir = self.root / "refs" / model_name
+
+    def latest_version(self):
+        """The version loaded most recently, or ``None`` if the cache is empty."""
+        latest = self.refs_dir / "latest"
+        return latest.read_text().strip() if latest.exists() else None
+
+    def _read_ref(self, name):
+        ref = self.refs_dir / name
+        return ref.read_text().strip() if ref.exists() else None
+
+    def target_version(self, role):
+        """The version every process sharing this cache should serve as ``role``."""
+        return self._read_ref(f"target.{role}")
+
+    def set_target_version(self, role, version):
+        """
+        Ask every process sharing this cache to serve ``version`` as ``role``.
+
+        The ref is replaced atomically, so a process polling it never reads a partial
+        version.
+        """
+        self._write_ref(f"target.{role}", str(version))
+
+    def polled_version(self):
+        """The registry's latest version when a process last polled it."""
+        return self._read_ref("polled")
+
+    def set_polled_version(self, version):
+        self._write_ref("polled", str(version))
+
+    def _ref_name(self, version, engine):
+        return str(version) if engine == "sklearn" else f"{version}.{engine}"
+
+    def _object_name(self, engine):
+        return self.BUNDLE_NAME if engine == "sklearn" else self.LINEAR_SCORER_NAME
+
+    def bundle_path(self, version, engine="sklearn"):
+        """Path of the cached bundle for ``version``, or ``None`` on a cache miss."""
+        ref = self.refs_dir / self._ref_name(version, engine)
+        if not ref.exists():
+            return None
+        digest = ref.read_text().strip()
+        path = self.root / "objects" / digest / self._object_name(engine)
+        return path if path.exists() else None
+
+    def load(self, version, engine="sklearn", latest=True):
+        """
+        Load ``(model, vectorizer)`` for a version, fetching it on a cache miss.
+
+        With the ``linear`` engine both are the same ``LinearScorer`` built from the
+        exported NumPy artifact of the version's run. ``latest=False`` loads a version
+        (such as a canary) without recording it as the one to serve offline.
+        """
+        path = self.bundle_path(version, engine)
+        if path is None:
+            MODEL_CACHE_LOOKUPS.labels(result="miss").inc()
+            print(f"Model cache miss for {self.model_name} version {version}.")
+            fetch = self._fetch if engine == "sklearn" else self._fetch_linear_scorer
+            path = fetch(version)
+        else:
+            MODEL_CACHE_LOOKUPS.labels(result="hit").inc()
+            print(f"Model cache hit for {self.model_name} version {version}.")
+        if latest:
+            self._write_ref("latest", str(version))
+        if engine == "linear":
+            scorer = LinearScorer(path)
+            return scorer, scorer
+        bundle = joblib.load(path, mmap_mode="r")
+        return bundle["model"], bundle["vectorizer"]
+
+    def _fetch(self, version):
+        """Download a registry version and its vectorizer and store them as a bundle."""
+        model_uri = f"models:/{self.model_name}/{version}"
+        print(f"Fetching model from: {model_uri}")
+        model = mlflow.sklearn.load_model(model_uri)
+        bundle = {"model": model, "vectorizer": self._fetch_vectorizer(version)}
+
+        objects_dir = self.root / "objects"
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=objects_dir, delete=False) as tmp:
+            joblib.dump(bundle, tmp.name)
+        digest = hashlib.sha256(Path(tmp.name).read_bytes()).hexdigest()
+        path = objects_dir / digest / self.BUNDLE_NAME
+        path.parent.mkdir(exist_ok=True)
+        os.replace(tmp.name, path)
+        self._write_ref(str(version), digest)
+        return path
+
+    def _fetch_linear_scorer(self, version):
+        """Download the exported linear scorer arrays of a version's run."""
+        client = mlflow.MlflowClient()
+        run_id = client.get_model_version(self.model_name, str(version)).run_id
+        print(f"Fetching linear scorer from run {run_id}")
+
+        objects_dir = self.root / "objects"
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=objects_dir))
+        try:
+            local_dir = Path(
+                mlflow.artifacts.download_artifacts(
+                    run_id=run_id,
+                    artifact_path=self.LINEAR_SCORER_NAME,
+                    dst_path=str(tmp_dir),
+                )
+            )
+            digest = hashlib.sha256()
+            for file in sorted(local_dir.iterdir()):
+                digest.update(file.name.encode())
+                digest.update(file.read_bytes())
+            path = objects_dir / digest.hexdigest() / self.LINEAR_SCORER_NAME
+            path.parent.mkdir(exist_ok=True)
+            try:
+                os.replace(local_dir, path)
+            except OSError:
+                # Another worker stored the same arrays first; its copy is identical
+                if not path.is_dir():
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._write_ref(self._ref_name(version, "linear"), digest.hexdigest())
+        return path
+
+    def _fetch_vectorizer(self, version):
+        """Prefer the vectorizer logged with the model's run, else the local file."""
+        client = mlflow.MlflowClient()
+        run_id = client.get_model_version(self.model_name, str(version)).run_id
+        try:
+            local_dir = mlflow.artifacts.download_artifacts(
+                run_id=run_id, artifact_path="vectorizer"
+            )
+            return joblib.load(next(Path(local_dir).glob("*.pkl")))
+        except Exception as e:
+            if self.vectorizer_path is None:
+                raise
+            print(f"No vectorizer logged with run {run_id} ({e}); using local file.")
+            return joblib.load(self.vectorizer_path)
+
+    def _write_ref(self, name, value):
+        self.refs_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.refs_dir, delete=False) as tmp:
+            tmp.write(value)
+        os.replace(tmp.name, self.refs_dir / name)
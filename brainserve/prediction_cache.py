@@ -0,0 +1,227 @@
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def cache_key(version, text):
+    """Key of a normalized text's prediction by a model version."""
+    return hashlib.blake2b(f"{version}\0{text}".encode(), digest_size=16).digest()
+
+
+class PredictionCache:
+    """
+    Bounded in-process LRU cache of predictions with an optional time to live.
+
+    Values are ``(label, probability)`` pairs keyed by :func:`cache_key`. Entries older
+    than ``ttl`` seconds (``0`` keeps them until evicted) count as misses. Evictions are
+    reported to ``on_evict(reason, count)`` with reason ``capacity``, ``expired`` or
+    ``model_change``.
+    """
+
+    def __init__(self, max_size, ttl=0.0, on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict or (lambda reason, count: None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """The cached value of every key, or ``None`` where it is missing or expired."""
+        now = time.monotonic()
+        values = []
+        expired = 0
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl and entry[0] <= now:
+                    del self._entries[key]
+                    expired += 1
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                values.append(None if entry is None else entry[2])
+        if expired:
+            self.on_evict("expired", expired)
+        return values
+
+    def put_many(self, version, keys, values):
+        """Cache the values of a model version, evicting the least recently used."""
+        expires_at = time.monotonic() + self.ttl
+        evicted = 0
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (expires_at, str(version), value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.on_evict("capacity", evicted)
+
+    def invalidate(self, version):
+        """Drop the predictions of a retired model version, keeping every other one."""
+        with self._lock:
+            retired = [
+                key for key, entry in self._entries.items() if entry[1] == str(version)
+            ]
+            for key in retired:
+                del self._entries[key]
+        if retired:
+            self.on_evict("model_change", len(retired))
+
+
+class SqlitePredictionCache(PredictionCache):
+    """
+    Prediction cache in a SQLite file shared by every worker process on the host.
+
+    Same behaviour as :class:`PredictionCache`, but a prediction made by one gunicorn
+    worker is a hit for the others. The database runs in WAL mode so readers do not
+    block the writer; each thread of each process opens its own connection.
+
+    To keep writes off the read path, hits are recorded in memory and their access
+    times written at most every ``TOUCH_INTERVAL`` seconds. The size is checked after
+    every ``max_size // 100`` rows a process inserts rather than on every insert, so
+    the cache may briefly run over ``max_size`` by that many rows per worker.
+    """
+
+    # Stay below SQLite's limit on the number of parameters per statement
+    MAX_PARAMETERS = 500
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, path, max_size, ttl=0.0, on_evict=None):
+        super().__init__(max_size, ttl, on_evict)
+        self.path = str(path)
+        self._local = threading.local()
+        self._evict_every = max(1, max_size // 100)
+        self._inserted = 0
+        self._touched = set()
+        self._touched_at = time.time()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key BLOB PRIMARY KEY, version TEXT, label, probability REAL, "
+            "expires_at REAL, accessed_at REAL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS predictions_accessed_at "
+            "ON predictions (accessed_at)"
+        )
+
+    def __len__(self):
+        return (
+            self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        )
+
+    def _connection(self):
+        # Connections must not cross threads, nor processes after a fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def get_many(self, keys):
+        # Wall-clock time, since the entries are shared between processes
+        now = time.time()
+        connection = self._connection()
+        found = {}
+        expired = []
+        for start in range(0, len(keys), self.MAX_PARAMETERS):
+            chunk = keys[start : start + self.MAX_PARAMETERS]
+            rows = connection.execute(
+                "SELECT key, label, probability, expires_at FROM predictions "
+                f"WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, label, probability, expires_at in rows:
+                if self.ttl and expires_at <= now:
+                    expired.append(key)
+                else:
+                    found[key] = (label, probability)
+
+        if expired:
+            with connection:
+                connection.executemany(
+                    "DELETE FROM predictions WHERE key = ?",
+                    [(key,) for key in expired],
+                )
+            self.on_evict("expired", len(expired))
+        with self._lock:
+            self._touched.update(found)
+            due = now - self._touched_at >= self.TOUCH_INTERVAL
+        if due or len(self._touched) >= self.MAX_PARAMETERS:
+            self._flush_touched(connection, now)
+        return [found.get(key) for key in keys]
+
+    def _flush_touched(self, connection, now):
+        """Write the access time of the keys read since the last flush."""
+        with self._lock:
+            touched, self._touched = list(self._touched), set()
+            self._touched_at = now
+        with connection:
+            for start in range(0, len(touched), self.MAX_PARAMETERS):
+                chunk = touched[start : start + self.MAX_PARAMETERS]
+                connection.execute(
+                    "UPDATE predictions SET accessed_at = ? "
+                    f"WHERE key IN ({', '.join('?' * len(chunk))})",
+                    [now, *chunk],
+                )
+
+    def put_many(self, version, keys, values):
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (key, str(version), label, probability, now + self.ttl, now)
+                    for key, (label, probability) in zip(keys, values)
+                ],
+            )
+        with self._lock:
+            self._inserted += len(keys)
+            due = self._inserted >= self._evict_every
+            if due:
+                self._inserted = 0
+        if due:
+            self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        """Delete the least recently used rows beyond ``max_size``."""
+        # Recent hits first, so that they are not taken for unused rows
+        self._flush_touched(connection, now)
+        with connection:
+            excess = len(self) - self.max_size
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM predictions WHERE key IN (SELECT key FROM "
+                    "predictions ORDER BY accessed_at LIMIT ?)",
+                    (excess,),
+                )
+        if excess > 0:
+            self.on_evict("capacity", excess)
+
+    def invalidate(self, version):
+        connection = self._connection()
+        with connection:
+            dropped = connection.execute(
+                "DELETE FROM predictions WHERE version = ?", (str(version),)
+            ).rowcount
+        if dropped:
+            self.on_evict("model_change", dropped)
+
+
+def build_prediction_cache(max_size, ttl=0.0, path=None, on_evict=None):
+    """The configured prediction cache, shared through ``path`` if given, or ``None``."""
+    if max_size <= 0:
+        return None
+    if path:
+        return SqlitePredictionCache(path, max_size, ttl, on_evict)
+    return PredictionCache(max_size, ttl, on_evict)
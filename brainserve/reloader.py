@@ -0,0 +1,44 @@
+import os
+import threading
+import traceback
+
+
+class ModelWatcher:
+    """
+    Background thread that calls ``reload_fn`` every ``interval`` seconds.
+
+    ``reload_fn`` loads and swaps in a new model off the request path. Threads do not
+    survive ``fork``, so with gunicorn ``--preload`` the watcher is started lazily by
+    :meth:`ensure_started` from inside each worker rather than at import in the master.
+    """
+
+    def __init__(self, reload_fn, interval):
+        self.reload_fn = reload_fn
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        """Start the watcher in this process if it is enabled and not yet running."""
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(
+                target=self._run, name="model-watcher", daemon=True
+            ).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload_fn()
+            except Exception:
+                # A failed poll keeps the current model; try again next interval
+                traceback.print_exc()
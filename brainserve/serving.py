@@ -0,0 +1,545 @@
+import hashlib
+import hmac
+from pathlib import Path
+import threading
+import time
+from typing import Any, NamedTuple
+import warnings
+
+from dotenv import load_dotenv
+import joblib
+import mlflow
+import mlflow.sklearn
+import numpy as np
+
+from brainserve.environment import (
+    ADMIN_TOKEN,
+    BATCH_MAX_SIZE,
+    CANARY_MODEL_VERSION,
+    CANARY_PERCENT,
+    LEMMA_CACHE_SIZE,
+    MLFLOW_TRACKING_URI,
+    MODEL_CACHE_DIR,
+    MODEL_CACHE_OFFLINE,
+    MODEL_RELOAD_INTERVAL,
+    MODEL_SYNC_INTERVAL,
+    MODEL_URI,
+    MODEL_VERSION,
+    PREDICTION_CACHE_PATH,
+    PREDICTION_CACHE_SIZE,
+    PREDICTION_CACHE_TTL,
+    SCORING_ENGINE,
+    SHADOW_MAX_PENDING,
+    SHADOW_MODEL_VERSION,
+    SHADOW_WORKERS,
+    VECTORIZER_PATH,
+)
+from brainserve.linear_scorer import LinearScorer
+from brainserve.metrics import (
+    INPUT_LENGTH,
+    INPUT_TOKENS,
+    LEMMA_CACHE_LOOKUPS,
+    MODEL_LOAD_DURATION,
+    MODEL_RELOADS,
+    MODEL_VERSION_LATENCY,
+    MODEL_VERSION_PREDICTIONS,
+    PREDICTION_CACHE_EVICTIONS,
+    PREDICTION_CACHE_LOOKUPS,
+    PREDICTION_COUNT,
+    SHADOW_AGREEMENT,
+    SHADOW_DROPPED,
+    SHADOW_PROBABILITY_DELTA,
+    STAGE_LATENCY,
+    set_model_versions,
+)
+from brainserve.model_cache import ModelCache
+from brainserve.prediction_cache import build_prediction_cache, cache_key
+from brainserve.reloader import ModelWatcher
+from brainserve.shadow import ShadowRunner
+from capstone.data.normalizer import TextNormalizer
+
+warnings.simplefilter("ignore", UserWarning)
+warnings.filterwarnings("ignore")
+load_dotenv()  # take environment variables
+
+# Set up MLflow tracking URI; a MODEL_URI override does not need the registry
+mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=MODEL_URI.defined))
+
+# ------------------------------------------------------------------------------------------
+# Model and vectorizer setup
+model_name = "capstone_model"
+
+# Same normalization as capstone/data/pre_process.py applies before training
+normalizer = TextNormalizer(lemma_cache_size=LEMMA_CACHE_SIZE.get())
+# With gunicorn --preload this runs in the master, so workers share the corpus
+normalizer.load_corpora()
+normalize_text = normalizer.normalize
+
+
+def _count_evictions(reason, count):
+    PREDICTION_CACHE_EVICTIONS.labels(reason=reason).inc(count)
+
+
+# Repeated texts skip vectorize and predict; keys include the model version
+prediction_cache = build_prediction_cache(
+    PREDICTION_CACHE_SIZE.get(),
+    PREDICTION_CACHE_TTL.get(),
+    PREDICTION_CACHE_PATH.get(),
+    on_evict=_count_evictions,
+)
+
+
+def get_latest_model_version(model_name_arg):
+    client = mlflow.MlflowClient()
+    latest_version = client.get_latest_versions(model_name_arg, stages=["Staging"])
+    if not latest_version:
+        latest_version = client.get_latest_versions(model_name_arg, stages=["None"])
+    return latest_version[0].version if latest_version else None
+
+
+def resolve_model_version(cache):
+    """
+    Pick the version to serve, avoiding the registry when it is already known.
+
+    A version requested through ``/admin/reload`` comes first, so a restarted worker
+    serves the same version as the others.
+    """
+    if version := cache.target_version("primary"):
+        return version
+    if MODEL_VERSION.defined:
+        return MODEL_VERSION.get()
+    if MODEL_CACHE_OFFLINE.get() and (version := cache.latest_version()):
+        return version
+    version = get_latest_model_version(model_name)
+    if version is None:
+        raise ValueError(f"No registered version of {model_name} to serve")
+    return str(version)
+
+
+class ServedModel(NamedTuple):
+    """The model, vectorizer and version that serve requests together."""
+
+    version: str | None
+    model: Any
+    vectorizer: Any
+
+
+scoring_engine = SCORING_ENGINE.get()
+if scoring_engine not in ("sklearn", "linear"):
+    raise ValueError(f"Unknown SCORING_ENGINE {scoring_engine!r}")
+
+_load_start = time.perf_counter()
+if MODEL_URI.defined:
+    model_cache = None
+    print(f"Fetching model from: {MODEL_URI.get()}")
+    if scoring_engine == "linear":
+        # MODEL_URI is a local directory exported by export_linear_scorer
+        _scorer = LinearScorer(MODEL_URI.get())
+        _served = ServedModel(None, _scorer, _scorer)
+    else:
+        _served = ServedModel(
+            None,
+            mlflow.sklearn.load_model(MODEL_URI.get()),
+            joblib.load(Path(VECTORIZER_PATH.get())),
+        )
+else:
+    model_cache = ModelCache(MODEL_CACHE_DIR.get(), model_name, VECTORIZER_PATH.get())
+    _version = resolve_model_version(model_cache)
+    _served = ServedModel(_version, *model_cache.load(_version, scoring_engine))
+MODEL_LOAD_DURATION.labels(trigger="startup").observe(time.perf_counter() - _load_start)
+print(
+    f"Loaded model and vectorizer (version {_served.version}, engine {scoring_engine})."
+)
+
+
+def load_extra_version(role, env_var):
+    """
+    Load the canary or shadow version, if there is one.
+
+    A version requested through ``/admin/reload`` comes before the environment
+    variable, so a restarted worker holds the same version as the others.
+    """
+    target = model_cache.target_version(role) if model_cache is not None else None
+    if target is None and not env_var.defined:
+        return None
+    if model_cache is None:
+        raise ValueError(f"{env_var} needs the model registry, not MODEL_URI")
+    version = target or env_var.get()
+    # Not recorded as latest, so MODEL_CACHE_OFFLINE keeps serving the current model
+    served = ServedModel(version, *model_cache.load(version, scoring_engine, False))
+    print(f"Loaded {role} model version {version}.")
+    return served
+
+
+# Extra versions held next to the current one: a canary that answers CANARY_PERCENT
+# percent of the requests, and a shadow that scores traffic in the background
+_canary = load_extra_version("canary", CANARY_MODEL_VERSION)
+canary_percent = CANARY_PERCENT.get()
+_shadow = load_extra_version("shadow", SHADOW_MODEL_VERSION)
+shadow_runner = None
+if _shadow is not None:
+    shadow_runner = ShadowRunner(SHADOW_WORKERS.get(), SHADOW_MAX_PENDING.get())
+_previous_version = None
+
+
+def _publish_versions():
+    set_model_versions(
+        _served.version,
+        _previous_version,
+        canary=_canary.version if _canary is not None else None,
+        shadow=_shadow.version if _shadow is not None else None,
+    )
+
+
+_publish_versions()
+
+_reload_lock = threading.Lock()
+
+RELOAD_ROLES = ("primary", "canary", "shadow")
+
+
+def _held_versions():
+    return {
+        served.version for served in (_served, _canary, _shadow) if served is not None
+    }
+
+
+def reload_model(version=None, role="primary"):
+    """
+    Load a new model version and swap it in atomically.
+
+    Without ``version`` the registry is asked for the latest one (unless MODEL_VERSION
+    pins the served version). With ``role`` ``canary`` or ``shadow`` the given version
+    replaces (or starts) the canary or shadow model instead. The new model and
+    vectorizer are loaded before the swap, so in-flight requests finish on the old
+    snapshot and new requests see the new one. Returns ``True`` if a swap happened.
+    """
+    global _served, _canary, _shadow, _previous_version, shadow_runner
+    if role not in RELOAD_ROLES:
+        raise ValueError(f"Unknown role {role!r}, expected one of {RELOAD_ROLES}")
+    if model_cache is None or (
+        version is None and (role != "primary" or MODEL_VERSION.defined)
+    ):
+        return False
+    with _reload_lock:
+        if version is None:
+            version = get_latest_model_version(model_name)
+            if version is None:
+                return False
+        version = str(version)
+        previous = {"primary": _served, "canary": _canary, "shadow": _shadow}[role]
+        previous_version = previous.version if previous is not None else None
+        if version == previous_version:
+            return False
+        try:
+            with MODEL_LOAD_DURATION.labels(trigger="reload").time():
+                # Only the primary version is recorded as the cache's latest
+                replacement = ServedModel(
+                    version,
+                    *model_cache.load(version, scoring_engine, role == "primary"),
+                )
+        except Exception:
+            MODEL_RELOADS.labels(result="failure").inc()
+            raise
+        if role == "primary":
+            _served, _previous_version = replacement, previous_version
+        elif role == "canary":
+            _canary = replacement
+        else:
+            if shadow_runner is None:
+                shadow_runner = ShadowRunner(
+                    SHADOW_WORKERS.get(), SHADOW_MAX_PENDING.get()
+                )
+            _shadow = replacement
+        # Only the retired version's predictions go, unless another role holds it
+        if (
+            prediction_cache is not None
+            and previous_version is not None
+            and previous_version not in _held_versions()
+        ):
+            prediction_cache.invalidate(previous_version)
+
+        _publish_versions()
+        MODEL_RELOADS.labels(result="success").inc()
+        print(f"Swapped {role} model version {previous_version} for {version}.")
+        return True
+
+
+def sync_model_versions():
+    """
+    Swap in the versions named by the shared target refs, where this worker lacks them.
+
+    Every worker runs this every MODEL_SYNC_INTERVAL seconds, so a reload requested
+    from any one worker reaches all the workers sharing MODEL_CACHE_DIR; the canary then
+    answers its share of every worker's traffic and the shadow sees all of it.
+    """
+    if model_cache is None:
+        return
+    failures = []
+    for role in RELOAD_ROLES:
+        target = model_cache.target_version(role)
+        try:
+            if target is not None:
+                reload_model(target, role)
+        except Exception as e:
+            # One role that fails to load does not hold back the others
+            failures.append(e)
+    if failures:
+        raise failures[0]
+
+
+def poll_registry():
+    """
+    Point every worker at the registry's latest version when it changes.
+
+    Only a change counts, so a rollback through ``/admin/reload`` holds until another
+    version is registered.
+    """
+    if model_cache is None or MODEL_VERSION.defined:
+        return
+    latest = get_latest_model_version(model_name)
+    if latest is None or str(latest) == model_cache.polled_version():
+        return
+    model_cache.set_target_version("primary", latest)
+    model_cache.set_polled_version(latest)
+
+
+model_watcher = ModelWatcher(poll_registry, MODEL_RELOAD_INTERVAL.get())
+sync_watcher = ModelWatcher(sync_model_versions, MODEL_SYNC_INTERVAL.get())
+
+
+def publish_model_version():
+    """
+    Publish the served version from a freshly forked worker.
+
+    In Prometheus multiprocess mode a forked worker starts from empty metric files, so
+    the gauge set when the master loaded the model (``--preload``) must be set again.
+    """
+    _publish_versions()
+
+
+class AdminRequestError(Exception):
+    """An admin request that is refused or failed, with the HTTP status to answer."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def authorize_admin(headers):
+    """
+    Admin endpoints require the ``X-Admin-Token`` header to match ADMIN_TOKEN.
+
+    Without ADMIN_TOKEN they are disabled rather than open to anyone.
+    """
+    if not ADMIN_TOKEN.defined:
+        raise AdminRequestError("Admin endpoints are disabled; set ADMIN_TOKEN.", 404)
+    token = headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.get().encode()):
+        raise AdminRequestError("Unauthorized.", 401)
+
+
+def handle_admin_reload(headers, payload):
+    """
+    Authorize and accept an ``/admin/reload`` request, returning the JSON response.
+
+    The version is loaded in this worker first, so one that fails to load raises
+    :class:`AdminRequestError` and leaves every worker on its current model. The
+    version is then written to the shared target ref of its role, which the other
+    workers swap to within MODEL_SYNC_INTERVAL seconds.
+    """
+    authorize_admin(headers)
+    version, role = None, None
+    if isinstance(payload, dict):
+        version, role = payload.get("version"), payload.get("role", "primary")
+    if not (version is None or str(version).isdigit()) or role not in RELOAD_ROLES:
+        raise AdminRequestError(
+            "Expected {'version': <number>, 'role': 'primary' | 'canary' | 'shadow'}"
+            " or no body.",
+            400,
+        )
+    if role != "primary" and version is None:
+        raise AdminRequestError(f"Reloading the {role} needs a version.", 400)
+    if model_cache is None:
+        raise AdminRequestError(
+            "Reloading needs the model registry, not MODEL_URI.", 409
+        )
+    try:
+        if version is None:
+            version = get_latest_model_version(model_name)
+            if version is None:
+                raise ValueError(f"no registered version of {model_name}")
+        version = str(version)
+        reload_model(version, role)
+    except Exception as e:
+        raise AdminRequestError(
+            f"Could not load {role} model version {version or 'latest'}: {e}", 503
+        ) from e
+    model_cache.set_target_version(role, version)
+    return {"accepted": True, "role": role, "version": version}
+
+
+def current_model():
+    """The model snapshot to use for one request."""
+    model_watcher.ensure_started()
+    sync_watcher.ensure_started()
+    return _served
+
+
+def routing_key(headers, texts):
+    """
+    The key that routes a request: its ``X-Routing-Key`` header, else its texts.
+
+    A client that sends the same key (say, a user id) is always answered by the same
+    version; without one, resubmitting the same texts is.
+    """
+    return headers.get("X-Routing-Key") or "\0".join(texts)
+
+
+def routes_to_canary(key):
+    """Whether a request key falls in the ``CANARY_PERCENT`` share of the canary."""
+    if _canary is None or not canary_percent:
+        return False
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % 10000 < canary_percent * 100
+
+
+class BatchRequestError(ValueError):
+    """A batch prediction payload that cannot be scored."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def score_texts(served, normalized, role="primary"):
+    """Vectorize and score normalized texts with a single model call."""
+    model = served.model
+    with MODEL_VERSION_LATENCY.labels(version=str(served.version), role=role).time():
+        # The CSR matrix goes straight to the classifier; it is never densified
+        with STAGE_LATENCY.labels(stage="vectorize").time():
+            features = served.vectorizer.transform(normalized)
+        with STAGE_LATENCY.labels(stage="predict").time():
+            probabilities = model.predict_proba(features)
+    labels = model.classes_[probabilities.argmax(axis=1)]
+    return labels, probabilities[:, list(model.classes_).index(1)]
+
+
+def score_cached(served, role, normalized):
+    """Score normalized texts, skipping those whose prediction is cached."""
+    if prediction_cache is None:
+        return score_texts(served, normalized, role)
+
+    keys = [cache_key(served.version, text) for text in normalized]
+    cached = prediction_cache.get_many(keys)
+    misses = [i for i, value in enumerate(cached) if value is None]
+    PREDICTION_CACHE_LOOKUPS.labels(result="hit").inc(len(keys) - len(misses))
+    PREDICTION_CACHE_LOOKUPS.labels(result="miss").inc(len(misses))
+    if misses:
+        labels, probabilities = score_texts(
+            served, [normalized[i] for i in misses], role
+        )
+        scored = list(zip(labels.tolist(), probabilities.tolist()))
+        prediction_cache.put_many(served.version, [keys[i] for i in misses], scored)
+        for i, value in zip(misses, scored):
+            cached[i] = value
+    labels, probabilities = zip(*cached) if cached else ((), ())
+    return (
+        np.asarray(labels, dtype=served.model.classes_.dtype),
+        np.asarray(probabilities, dtype=np.float64),
+    )
+
+
+def score_shadow(shadow, normalized, labels, probabilities):
+    """Score a batch with the shadow model and compare it with the served answers."""
+    version = str(shadow.version)
+    with MODEL_VERSION_LATENCY.labels(version=version, role="shadow").time():
+        shadow_probabilities = shadow.model.predict_proba(
+            shadow.vectorizer.transform(normalized)
+        )
+    classes = shadow.model.classes_
+    shadow_labels = classes[shadow_probabilities.argmax(axis=1)]
+    agree = int((shadow_labels == labels).sum())
+    SHADOW_AGREEMENT.labels(version=version, result="agree").inc(agree)
+    SHADOW_AGREEMENT.labels(version=version, result="disagree").inc(len(labels) - agree)
+    deltas = np.abs(shadow_probabilities[:, list(classes).index(1)] - probabilities)
+    for delta in deltas:
+        SHADOW_PROBABILITY_DELTA.labels(version=version).observe(delta)
+
+
+def predict_texts(texts, keys=None):
+    """Normalize, vectorize and score a batch of texts, one model call per version.
+
+    Each text is answered by the canary if its routing key (``keys``, one per text;
+    the text itself where it is ``None``) falls in the canary's share, and by the current model
+    otherwise, so routing does not depend on how requests were batched. Texts whose
+    prediction by that version is cached skip the model call. With a shadow model the
+    batch is scored again in the background. Returns the predicted labels, the
+    probability of the positive class and the version that answered each text.
+    """
+    # One snapshot per batch, so a concurrent reload cannot mix versions
+    served, canary, shadow = current_model(), _canary, _shadow
+    with STAGE_LATENCY.labels(stage="normalize").time():
+        normalized = [normalize_text(text) for text in texts]
+    for text, normalized_text in zip(texts, normalized):
+        INPUT_LENGTH.observe(len(text))
+        INPUT_TOKENS.observe(len(normalized_text.split()))
+    lemma_cache = normalizer.cache_info()
+    LEMMA_CACHE_LOOKUPS.labels(result="hit").set(lemma_cache.hits)
+    LEMMA_CACHE_LOOKUPS.labels(result="miss").set(lemma_cache.misses)
+
+    keys = [None] * len(texts) if keys is None else keys
+    to_canary = np.array(
+        [
+            routes_to_canary(text if key is None else key)
+            for text, key in zip(texts, keys)
+        ],
+        dtype=bool,
+    )
+    labels = np.empty(len(texts), dtype=served.model.classes_.dtype)
+    probabilities = np.empty(len(texts), dtype=np.float64)
+    versions = np.full(len(texts), served.version, dtype=object)
+    for snapshot, role, rows in (
+        (served, "primary", np.flatnonzero(~to_canary)),
+        (canary, "canary", np.flatnonzero(to_canary)),
+    ):
+        if not len(rows):
+            continue
+        labels[rows], probabilities[rows] = score_cached(
+            snapshot, role, [normalized[i] for i in rows]
+        )
+        versions[rows] = snapshot.version
+        MODEL_VERSION_PREDICTIONS.labels(version=str(snapshot.version), role=role).inc(
+            len(rows)
+        )
+    if shadow is not None and texts:
+        shadowed = shadow_runner.submit(
+            score_shadow, shadow, normalized, labels, probabilities
+        )
+        if not shadowed:
+            SHADOW_DROPPED.labels(version=str(shadow.version)).inc()
+    return labels, probabilities, versions.tolist()
+
+
+def parse_batch_payload(payload):
+    """Extract the texts from a JSON array of strings or ``{"texts": [...]}``."""
+    texts = payload.get("texts") if isinstance(payload, dict) else payload
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise BatchRequestError("Expected a JSON array of strings or {'texts': [...]}.")
+    max_batch_size = BATCH_MAX_SIZE.get()
+    if len(texts) > max_batch_size:
+        raise BatchRequestError(
+            f"Batch size {len(texts)} exceeds limit {max_batch_size}.", 413
+        )
+    return texts
+
+
+def format_predictions(labels, probabilities):
+    """Count the predictions and convert them to JSON-serializable records."""
+    for label, count in zip(*np.unique(labels, return_counts=True)):
+        PREDICTION_COUNT.labels(prediction=str(label)).inc(int(count))
+    with STAGE_LATENCY.labels(stage="format").time():
+        return [
+            {"label": int(label), "probability": float(probability)}
+            for label, probability in zip(labels, probabilities)
+        ]
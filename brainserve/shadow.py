@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import traceback
+
+
+class ShadowRunner:
+    """
+    Runs shadow scoring on a background thread pool, off the response path.
+
+    At most ``max_pending`` calls wait or run at once; beyond that :meth:`submit` drops
+    the call rather than letting a slow shadow model queue up memory. Like
+    ``ModelWatcher``, the pool is created lazily in each process, since threads do not
+    survive the ``fork`` of gunicorn ``--preload``.
+    """
+
+    def __init__(self, max_workers=1, max_pending=64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pid = None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Call ``fn(*args)`` in the background; ``False`` if it had to be dropped."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix="shadow"
+                )
+                self._pending = 0
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+        self._executor.submit(self._run, fn, args)
+        return True
+
+    def _run(self, fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            # A failing shadow model must never affect the served predictions
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._pending -= 1
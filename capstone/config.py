@@ -1,14 +1,12 @@
 from pathlib import Path
 
 from dotenv import load_dotenv
-from loguru import logger
 
 # Load environment variables from .env file if it exists
 load_dotenv()
 
 # Paths
 PROJ_ROOT = Path(__file__).resolve().parents[1]
-logger.info(f"PROJ_ROOT path is: {PROJ_ROOT}")
 
 DATA_DIR = PROJ_ROOT / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
@@ -18,23 +16,20 @@ INTERIM_DATA_DIR = DATA_DIR / "interim"
 INTERIM_TRAIN_DATA_FILE = INTERIM_DATA_DIR / "train_processed.csv"
 INTERIM_TEST_DATA_FILE = INTERIM_DATA_DIR / "test_processed.csv"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
-PROCESSED_TRAIN_DATA_FILE = PROCESSED_DATA_DIR / "train_bow.csv"
-PROCESSED_TEST_DATA_FILE = PROCESSED_DATA_DIR / "test_bow.csv"
+PROCESSED_TRAIN_FEATURES_DIR = PROCESSED_DATA_DIR / "train_bow"
+PROCESSED_TEST_FEATURES_DIR = PROCESSED_DATA_DIR / "test_bow"
 EXTERNAL_DATA_DIR = DATA_DIR / "external"
+S3_CACHE_DIR = DATA_DIR / "cache" / "s3"
+PREPROCESSING_CACHE_DIR = DATA_DIR / "cache" / "preprocessing"
+FEATURES_CACHE_DIR = DATA_DIR / "cache" / "features"
 
 MODELS_DIR = PROJ_ROOT / "models"
+LINEAR_SCORER_DIR = MODELS_DIR / "linear_scorer"
+TRAINING_SNAPSHOT_PATH = MODELS_DIR / "training_snapshot.npy"
 
 REPORTS_DIR = PROJ_ROOT / "reports"
 METRICS_PATH = REPORTS_DIR / "metrics.json"
+PR_CURVE_PATH = REPORTS_DIR / "pr_curve.csv"
 EXPERIMENT_INFO_PATH = REPORTS_DIR / "experiment_info.json"
+BEST_PARAMS_PATH = REPORTS_DIR / "best_params.json"
 FIGURES_DIR = REPORTS_DIR / "figures"
-
-# If tqdm is installed, configure loguru with tqdm.write
-# https://github.com/Delgan/loguru/issues/135
-try:
-    from tqdm import tqdm
-
-    logger.remove(0)
-    logger.add(lambda msg: tqdm.write(msg, end=""), colorize=True)
-except ModuleNotFoundError:
-    pass
@@ -1,6 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
+import os
+from pathlib import Path
 
-import boto3
 import pandas as pd
 
 from capstone.logger import logging
@@ -8,17 +10,29 @@ from capstone.logger import logging
 
 class S3Operations:
     def __init__(
-        self, bucket_name, aws_access_key, aws_secret_key, region_name="us-east-1"
+        self,
+        bucket_name,
+        aws_access_key,
+        aws_secret_key,
+        region_name="us-east-1",
+        max_workers=8,
     ):
         """
         Initialize the s3_operations class with AWS credentials and S3 bucket details.
+        The client is thread-safe and pools up to ``max_workers`` connections, so it is
+        shared by the threads of parallel downloads.
         """
+        import boto3
+        from botocore.config import Config
+
         self.bucket_name = bucket_name
+        self.max_workers = max_workers
         self.s3_client = boto3.client(
             "s3",
             aws_access_key_id=aws_access_key,
             aws_secret_access_key=aws_secret_key,
             region_name=region_name,
+            config=Config(max_pool_connections=max_workers),
         )
         logging.info("Data Ingestion from S3 bucket initialized")
 
@@ -41,3 +55,107 @@ class S3Operations:
         except Exception as e:
             logging.exception(f"❌ Failed to fetch '{file_key}' from S3: {e}")
             return None
+
+    def iter_file_chunks_from_s3(self, file_key, chunksize):
+        """
+        Streams a CSV file from the S3 bucket and yields it as DataFrames.
+        The object body is parsed incrementally, so only one chunk is held in memory.
+        :param file_key: S3 file path (e.g., 'data/data.csv')
+        :param chunksize: Number of rows per yielded DataFrame
+        :return: Iterator of Pandas DataFrames
+        """
+        try:
+            logging.info(
+                f"Streaming file '{file_key}' from S3 bucket '{self.bucket_name}' "
+                f"in chunks of {chunksize} rows..."
+            )
+            obj = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+            records = 0
+            for chunk in pd.read_csv(
+                obj["Body"], chunksize=chunksize, encoding="utf-8"
+            ):
+                records += len(chunk)
+                yield chunk
+            logging.info(
+                f"Successfully streamed '{file_key}' from S3 that has {records} records."
+            )
+        except Exception as e:
+            logging.exception(f"❌ Failed to stream '{file_key}' from S3: {e}")
+            raise
+
+    def download_file_from_s3(self, file_key, cache_dir, part_size=8 * 1024 * 1024):
+        """
+        Downloads a file from the S3 bucket into a local cache keyed by its ETag.
+        The object is fetched with parallel ranged GETs of ``part_size`` bytes; when the
+        current ETag is already cached nothing is downloaded.
+        :param file_key: S3 file path (e.g., 'data/data.csv')
+        :param cache_dir: Local cache directory
+        :param part_size: Size in bytes of each ranged GET
+        :return: Path of the cached local file
+        """
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
+            etag, size = head["ETag"], head["ContentLength"]
+            local_path = Path(cache_dir, etag.strip('"'), file_key)
+            if local_path.exists() and local_path.stat().st_size == size:
+                logging.info(f"Using cached '{file_key}' (ETag {etag}) at {local_path}")
+                return local_path
+
+            logging.info(
+                f"Downloading '{file_key}' ({size} bytes) from S3 bucket "
+                f"'{self.bucket_name}' with {self.max_workers} threads..."
+            )
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            partial_path = local_path.with_name(local_path.name + ".part")
+
+            def fetch_range(start):
+                end = min(start + part_size, size) - 1
+                # IfMatch fails the download if the object changes mid-way
+                obj = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Range=f"bytes={start}-{end}",
+                    IfMatch=etag,
+                )
+                with open(partial_path, "r+b") as file:
+                    file.seek(start)
+                    file.write(obj["Body"].read())
+
+            try:
+                with open(partial_path, "wb") as file:
+                    file.truncate(size)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    list(executor.map(fetch_range, range(0, size, part_size)))
+                os.replace(partial_path, local_path)
+            finally:
+                # Only left behind when the download failed
+                partial_path.unlink(missing_ok=True)
+            self._prune_stale_copies(file_key, cache_dir, etag.strip('"'))
+            logging.info(f"Successfully cached '{file_key}' at {local_path}")
+            return local_path
+        except Exception as e:
+            logging.exception(f"❌ Failed to download '{file_key}' from S3: {e}")
+            raise
+
+    @staticmethod
+    def _prune_stale_copies(file_key, cache_dir, etag):
+        """
+        Removes the copies of a file cached under ETags other than the current one,
+        along with the directories they leave empty.
+        :param file_key: S3 file path (e.g., 'data/data.csv')
+        :param cache_dir: Local cache directory
+        :param etag: Current ETag of the file, without quotes
+        """
+        cache_dir = Path(cache_dir)
+        for etag_dir in cache_dir.iterdir():
+            stale_path = etag_dir / file_key
+            if etag_dir.name == etag or not stale_path.parent.is_dir():
+                continue
+            for path in (stale_path, stale_path.with_name(stale_path.name + ".part")):
+                if path.exists():
+                    path.unlink()
+                    logging.info(f"Removed stale cached '{file_key}' at {path}")
+            directory = stale_path.parent
+            while directory != cache_dir and not any(directory.iterdir()):
+                directory.rmdir()
+                directory = directory.parent
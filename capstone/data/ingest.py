@@ -1,14 +1,14 @@
 # data ingestion
+from collections.abc import Iterable
 from pathlib import Path
 
 import pandas as pd
-from sklearn.model_selection import train_test_split
 
-from capstone.config import RAW_DATA_DIR
+from capstone.config import RAW_DATA_DIR, S3_CACHE_DIR
 from capstone.data.connections.s3 import S3Operations
 from capstone.environment import PARAMS_FILE, S3_ACCESS_KEY, S3_BUCKET, S3_SECRET_KEY
 from capstone.logger import logging
-from capstone.utils import load_params, save_data
+from capstone.utils import load_data, load_params, save_data
 
 pd.set_option("future.no_silent_downcasting", True)
 
@@ -18,9 +18,7 @@ def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
     try:
         logging.info("pre-processing...")
         final_df = df[df["sentiment"].isin(["positive", "negative"])]
-        final_df["sentiment"] = final_df["sentiment"].replace(
-            {"positive": 1, "negative": 0}
-        )
+        final_df["sentiment"] = final_df["sentiment"].replace({"positive": 1, "negative": 0})
         logging.info("Data preprocessing completed")
         return final_df
     except KeyError as e:
@@ -31,6 +29,34 @@ def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
         raise
 
 
+def split_and_save_chunks(
+    chunks: Iterable[pd.DataFrame], test_size: float, random_state: int = 42
+) -> None:
+    """Filter, split and append each chunk to the train/test files as it arrives."""
+    train_path = Path(RAW_DATA_DIR, "train.csv")
+    test_path = Path(RAW_DATA_DIR, "test.csv")
+    train_path.unlink(missing_ok=True)
+    test_path.unlink(missing_ok=True)
+
+    from sklearn.model_selection import train_test_split
+
+    train_rows = test_rows = 0
+    for chunk in chunks:
+        final_df = preprocess_data(chunk)
+        if len(final_df) < 2:
+            # Too few rows to split; keep them for training
+            train_data, test_data = final_df, final_df.iloc[0:0]
+        else:
+            train_data, test_data = train_test_split(
+                final_df, test_size=test_size, random_state=random_state
+            )
+        save_data(train_data, train_path, keep_index=False, append=True)
+        save_data(test_data, test_path, keep_index=False, append=True)
+        train_rows += len(train_data)
+        test_rows += len(test_data)
+    logging.info("Chunked ingestion wrote %d train and %d test rows", train_rows, test_rows)
+
+
 def main():
     try:
         params_file = PARAMS_FILE.get()
@@ -42,12 +68,27 @@ def main():
             S3_ACCESS_KEY.get(not_exists_okay=False),
             S3_SECRET_KEY.get(not_exists_okay=False),
         )
-        df = s3.fetch_file_from_s3(params["data_ingestion"]["raw_file"])
+        raw_file = params["data_ingestion"]["raw_file"]
+        chunk_size = params["data_ingestion"].get("chunk_size")
+        if params["data_ingestion"].get("cache"):
+            # Unchanged objects are served from the local ETag-keyed cache
+            local_file = s3.download_file_from_s3(raw_file, S3_CACHE_DIR)
+            if chunk_size:
+                chunks = pd.read_csv(local_file, chunksize=chunk_size)
+                split_and_save_chunks(chunks, test_size)
+                return
+            df = load_data(local_file)
+        elif chunk_size:
+            chunks = s3.iter_file_chunks_from_s3(raw_file, chunk_size)
+            split_and_save_chunks(chunks, test_size)
+            return
+        else:
+            df = s3.fetch_file_from_s3(raw_file)
+
+        from sklearn.model_selection import train_test_split
 
         final_df = preprocess_data(df)
-        train_data, test_data = train_test_split(
-            final_df, test_size=test_size, random_state=42
-        )
+        train_data, test_data = train_test_split(final_df, test_size=test_size, random_state=42)
         save_data(train_data, Path(RAW_DATA_DIR, "train.csv"), keep_index=False)
         save_data(test_data, Path(RAW_DATA_DIR, "test.csv"), keep_index=False)
     except Exception as e:
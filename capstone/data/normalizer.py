@@ -0,0 +1,76 @@
+# text normalization shared by the preprocessing pipeline and brainserve
+
+from functools import cache, lru_cache
+import re
+import string
+import sys
+
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+PUNCTUATION_TABLE = str.maketrans({**dict.fromkeys(string.punctuation, " "), "؛": None})
+# NLTK resources the normalizer reads, by download name
+NLTK_CORPORA = {"stopwords": "corpora/stopwords", "wordnet": "corpora/wordnet"}
+
+
+@cache
+def _digits_table() -> dict:
+    """Translation table deleting every character for which ``str.isdigit`` holds."""
+    return {c: None for c in range(sys.maxunicode + 1) if chr(c).isdigit()}
+
+
+def ensure_corpora() -> None:
+    """Download the NLTK corpora the normalizer needs, if they are not installed."""
+    import nltk
+
+    for name, resource in NLTK_CORPORA.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(name, quiet=True)
+
+
+class TextNormalizer:
+    """
+    Cleans review text before vectorization.
+
+    The same steps run in the same order during training and serving: remove URLs,
+    remove digits, lower-case, replace punctuation with spaces, drop stop words and
+    lemmatize. Stop words and the lemmatizer are loaded once per instance, so an
+    instance should be created once and reused.
+
+    Token frequencies follow Zipf's law, so lemmas are memoized in a bounded LRU cache
+    of ``lemma_cache_size`` entries (``None`` means unbounded, ``0`` disables it).
+    """
+
+    def __init__(self, language: str = "english", lemma_cache_size: int | None = 100_000):
+        # NLTK takes seconds to import, so only pay for it once a normalizer is needed
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+
+        self.stop_words = frozenset(stopwords.words(language))
+        self.lemmatizer = WordNetLemmatizer()
+        self.digits_table = _digits_table()
+        self._lemmatize = lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize)
+
+    def __call__(self, text: str) -> str:
+        return self.normalize(text)
+
+    def normalize(self, text: str) -> str:
+        """Normalize a single text string."""
+        text = URL_PATTERN.sub("", text)
+        text = text.translate(self.digits_table).lower().translate(PUNCTUATION_TABLE)
+        stop_words = self.stop_words
+        lemmatize = self._lemmatize
+        return " ".join(lemmatize(word) for word in text.split() if word not in stop_words)
+
+    def load_corpora(self) -> None:
+        """
+        Load WordNet now rather than on the first lemma.
+
+        NLTK loads corpora lazily; loading it before a server forks its workers lets
+        them share one copy instead of each loading its own.
+        """
+        self.lemmatizer.lemmatize("reviews")
+
+    def cache_info(self):
+        """Hits, misses and size of the lemma cache."""
+        return self._lemmatize.cache_info()
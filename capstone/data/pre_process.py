@@ -1,63 +1,111 @@
 # data preprocessing
 
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import inspect
+from itertools import chain, islice
 import os
-import re
-import string
+from pathlib import Path
 
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
 import pandas as pd
 
 from capstone.config import (
     DATA_DIR,
-    INTERIM_DATA_DIR,
     INTERIM_TEST_DATA_FILE,
     INTERIM_TRAIN_DATA_FILE,
+    PREPROCESSING_CACHE_DIR,
     TEST_DATA_FILE,
     TRAIN_DATA_FILE,
 )
+from capstone.data.normalizer import TextNormalizer, ensure_corpora
+from capstone.environment import PARAMS_FILE
 from capstone.logger import logging
+from capstone.utils import atomic_path, load_params, prune_cache, shard_frame
 
-nltk.download("wordnet")
-nltk.download("stopwords")
+# Per-process normalizer, created once by each pool worker
+_normalizer: TextNormalizer | None = None
 
 
-def preprocess_dataframe(df, col="text"):
+def _init_worker() -> None:
+    """Load the stop words and lemmatizer once per worker process."""
+    global _normalizer
+    _normalizer = TextNormalizer()
+
+
+def _normalize_chunk(texts: list[str]) -> tuple[list[str], int, int]:
+    """
+    Normalize one chunk of texts inside a worker process.
+
+    Returns the texts with the lemma cache hits and misses they took, since each worker
+    keeps its own cache.
+    """
+    before = _normalizer.cache_info()
+    normalized = [_normalizer.normalize(text) for text in texts]
+    after = _normalizer.cache_info()
+    return normalized, after.hits - before.hits, after.misses - before.misses
+
+
+def _log_lemma_cache(hits: int, misses: int, processes: int) -> None:
+    lookups = hits + misses
+    logging.info(
+        "Lemma cache: %d hits, %d misses (%.1f%% hit rate) across %d processes",
+        hits,
+        misses,
+        100 * hits / lookups if lookups else 0.0,
+        processes,
+    )
+
+
+def normalize_texts(texts: list[str], n_jobs: int = 1, chunk_size: int = 5000):
+    """
+    Normalize texts in order, ``chunk_size`` at a time across ``n_jobs`` processes.
+
+    ``n_jobs`` 1 runs in-process and a negative value uses every CPU.
+    """
+    workers = os.cpu_count() if n_jobs < 0 else n_jobs
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        normalizer = TextNormalizer()
+        normalized = [normalizer.normalize(text) for text in texts]
+        info = normalizer.cache_info()
+        _log_lemma_cache(info.hits, info.misses, 1)
+        return normalized
+
+    # map() yields results in submission order, so rows keep their positions
+    processes = min(workers, len(chunks))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as executor:
+        results = list(executor.map(_normalize_chunk, chunks))
+    normalized = list(chain.from_iterable(chunk for chunk, _, _ in results))
+    logging.info(
+        "Normalized %d rows in %d chunks across %d processes",
+        len(texts),
+        len(chunks),
+        processes,
+    )
+    _log_lemma_cache(
+        sum(hits for _, hits, _ in results),
+        sum(misses for _, _, misses in results),
+        processes,
+    )
+    return normalized
+
+
+def preprocess_dataframe(df, col="text", n_jobs=1, chunk_size=5000):
     """
     Preprocess a DataFrame by applying text preprocessing to a specific column.
 
     Args:
         df (pd.DataFrame): The DataFrame to preprocess.
         col (str): The name of the column containing text.
+        n_jobs (int): Number of worker processes; 1 runs in-process and a negative
+            value uses every CPU.
+        chunk_size (int): Number of rows sent to a worker at a time.
 
     Returns:
         pd.DataFrame: The preprocessed DataFrame.
     """
-    # Initialize lemmatizer and stopwords
-    lemmatizer = WordNetLemmatizer()
-    stop_words = set(stopwords.words("english"))
-
-    def preprocess_text(text):
-        """Helper function to preprocess a single text string."""
-        # Remove URLs
-        text = re.sub(r"https?://\S+|www\.\S+", "", text)
-        # Remove numbers
-        text = "".join([char for char in text if not char.isdigit()])
-        # Convert to lowercase
-        text = text.lower()
-        # Remove punctuations
-        text = re.sub("[%s]" % re.escape(string.punctuation), " ", text)
-        text = text.replace("؛", "")
-        text = re.sub(r"\s+", " ", text).strip()
-        # Remove stop words
-        text = " ".join([word for word in text.split() if word not in stop_words])
-        # Lemmatization
-        text = " ".join([lemmatizer.lemmatize(word) for word in text.split()])
-        return text
-
-    # Apply preprocessing to the specified column
-    df[col] = df[col].apply(preprocess_text)
+    df[col] = normalize_texts(df[col].tolist(), n_jobs, chunk_size)
 
     # Remove small sentences (less than 3 words)
     # df[col] = df[col].apply(lambda x: np.nan if len(str(x).split()) < 3 else x)
@@ -68,21 +116,90 @@ def preprocess_dataframe(df, col="text"):
     return df
 
 
-def main():
-    try:
-        # Fetch the data from data/raw
-        train_data = pd.read_csv(TRAIN_DATA_FILE)
-        test_data = pd.read_csv(TEST_DATA_FILE)
+def _normalizer_fingerprint() -> str:
+    """Hash of the normalizer's code, so that changing it invalidates cached shards."""
+    source = inspect.getsource(inspect.getmodule(TextNormalizer))
+    return hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
 
-        # Transform the data
-        train_processed_data = preprocess_dataframe(train_data, "review")
-        test_processed_data = preprocess_dataframe(test_data, "review")
 
-        # Store the data inside data/processed
-        os.makedirs(INTERIM_DATA_DIR, exist_ok=True)
+def preprocess_file(
+    src_path: Path,
+    dst_path: Path,
+    col: str = "review",
+    cache_dir: Path = PREPROCESSING_CACHE_DIR,
+    shard_rows: int = 10000,
+    n_jobs: int = 1,
+    chunk_size: int = 5000,
+) -> list[str]:
+    """
+    Preprocess a CSV file shard by shard, reusing the shards of earlier runs.
 
-        train_processed_data.to_csv(INTERIM_TRAIN_DATA_FILE, index=False)
-        test_processed_data.to_csv(INTERIM_TEST_DATA_FILE, index=False)
+    The rows are split with :func:`shard_frame` and every preprocessed shard is kept
+    in ``cache_dir`` as Parquet, so a run after new rows arrive only normalizes the
+    shards that changed, wherever the new rows land in the file. The output keeps the
+    order of the file and is identical to preprocessing it at once. Returns the keys
+    of the shards.
+    """
+    try:
+        df = pd.read_csv(src_path)
+        shards = shard_frame(df, shard_rows, salt=_normalizer_fingerprint())
+        paths = {key: Path(cache_dir, f"{key}.parquet") for key, _ in shards}
+        missing = [(key, shard) for key, shard in shards if not paths[key].exists()]
+        logging.info(
+            "Reusing %d of %d shards of %s",
+            len(shards) - len(missing),
+            len(shards),
+            src_path,
+        )
+
+        if missing:
+            ensure_corpora()
+            texts = [text for _, shard in missing for text in shard[col].tolist()]
+            normalized = iter(normalize_texts(texts, n_jobs, chunk_size))
+            os.makedirs(cache_dir, exist_ok=True)
+            for key, shard in missing:
+                shard = shard.copy()
+                shard[col] = list(islice(normalized, len(shard)))
+                with atomic_path(paths[key]) as tmp:
+                    shard.to_parquet(tmp, index=False)
+
+        # Shards hold rows in content-hash order; restore the order of the file
+        processed = pd.concat(
+            [pd.read_parquet(paths[key]).set_axis(shard.index) for key, shard in shards]
+            or [df.iloc[:0]]
+        ).sort_index()
+        os.makedirs(Path(dst_path).parent, exist_ok=True)
+        processed.dropna(subset=[col]).to_csv(dst_path, index=False)
+        logging.info("Preprocessed %s saved to %s", src_path, dst_path)
+        return list(paths)
+    except Exception as e:
+        logging.error("Error while preprocessing %s: %s", src_path, e)
+        raise
+
+
+def main():
+    try:
+        params = load_params(params_path=PARAMS_FILE.get())
+        n_jobs = params["data_preprocessing"]["n_jobs"]
+        chunk_size = params["data_preprocessing"]["chunk_size"]
+        shard_rows = params["data_preprocessing"].get("shard_rows", 10000)
+
+        # Normalize data/raw into data/interim, reusing the cached shards
+        shard_keys = []
+        for src_path, dst_path in (
+            (TRAIN_DATA_FILE, INTERIM_TRAIN_DATA_FILE),
+            (TEST_DATA_FILE, INTERIM_TEST_DATA_FILE),
+        ):
+            shard_keys += preprocess_file(
+                src_path,
+                dst_path,
+                "review",
+                PREPROCESSING_CACHE_DIR,
+                shard_rows,
+                n_jobs,
+                chunk_size,
+            )
+        prune_cache(PREPROCESSING_CACHE_DIR, shard_keys)
 
         logging.info("Processed data saved to %s", DATA_DIR)
     except Exception as e:
@@ -1,17 +1,302 @@
 # feature engineering
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise, repeat
+import os
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
+from scipy import sparse
+from scipy.sparse import spmatrix, vstack
+import sklearn
+from sklearn.base import clone
+from sklearn.feature_extraction.text import (
+    CountVectorizer,
+    HashingVectorizer,
+    TfidfTransformer,
+)
+from sklearn.pipeline import Pipeline
 
 from capstone.config import (
+    BEST_PARAMS_PATH,
+    FEATURES_CACHE_DIR,
     INTERIM_TEST_DATA_FILE,
     INTERIM_TRAIN_DATA_FILE,
-    PROCESSED_TEST_DATA_FILE,
-    PROCESSED_TRAIN_DATA_FILE,
+    PROCESSED_TEST_FEATURES_DIR,
+    PROCESSED_TRAIN_FEATURES_DIR,
 )
 from capstone.environment import PARAMS_FILE
 from capstone.logger import logging
-from capstone.utils import load_data, load_params, save_data, save_model
+from capstone.utils import (
+    atomic_path,
+    load_best_params,
+    load_data,
+    load_params,
+    prune_cache,
+    save_features,
+    save_model,
+    shard_frame,
+)
+
+VECTORIZER_TYPES = ("count", "hashing")
+
+
+def build_vectorizer(
+    vectorizer_type: str = "count",
+    max_features: int | None = None,
+    n_features: int = 2**20,
+    use_tfidf: bool = False,
+):
+    """
+    Build the text vectorizer described by the feature engineering params.
+
+    ``count`` learns a vocabulary of at most ``max_features`` terms. ``hashing`` maps
+    terms straight to one of ``n_features`` columns, so it needs no fitting and holds no
+    vocabulary. With ``use_tfidf`` the counts are reweighted by a ``TfidfTransformer``
+    and both steps are returned as a ``Pipeline``.
+    """
+    if vectorizer_type == "count":
+        steps = [("count", CountVectorizer(max_features=max_features))]
+    elif vectorizer_type == "hashing":
+        hasher = HashingVectorizer(
+            n_features=n_features, alternate_sign=False, norm=None
+        )
+        steps = [("hashing", hasher)]
+    else:
+        raise ValueError(
+            f"Unknown vectorizer type {vectorizer_type!r}, "
+            f"expected one of {', '.join(VECTORIZER_TYPES)}"
+        )
+    if use_tfidf:
+        steps.append(("tfidf", TfidfTransformer()))
+        return Pipeline(steps)
+    return steps[0][1]
+
+
+def hash_in_chunks(
+    hasher: HashingVectorizer, texts, n_jobs: int = 1, chunk_size: int = 10000
+) -> spmatrix:
+    """
+    Hash texts into a sparse matrix, ``chunk_size`` rows at a time.
+
+    Hashing is stateless, so with ``n_jobs`` other than 1 the chunks are transformed in
+    worker processes (a negative value uses every CPU) and stacked in order.
+    """
+    workers = os.cpu_count() if n_jobs < 0 else n_jobs
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return hasher.transform(texts)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        return vstack(list(executor.map(hasher.transform, chunks)), format="csr")
+
+
+def hash_rows(df: pd.DataFrame) -> np.ndarray:
+    """Content hash of every labeled review, used to tell new rows from trained ones."""
+    return pd.util.hash_pandas_object(
+        df[["review", "sentiment"]], index=False
+    ).to_numpy()
+
+
+def _count_terms(
+    counter: CountVectorizer, texts
+) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Term counts of texts over their own vocabulary, and that vocabulary in order."""
+    counter = clone(counter).set_params(max_features=None)
+    try:
+        counts = counter.fit_transform(texts)
+    except ValueError as e:
+        # Texts with no terms at all, e.g. only one-letter words
+        if "empty vocabulary" not in str(e):
+            raise
+        return sparse.csr_matrix((len(texts), 0), dtype=np.int64), np.array([], str)
+    return counts.tocsr(), counter.get_feature_names_out().astype(str)
+
+
+def merge_vocabulary(
+    shard_counts: list[tuple[sparse.csr_matrix, np.ndarray]],
+    max_features: int | None = None,
+) -> np.ndarray:
+    """
+    The terms a ``CountVectorizer`` fitted on all the shards at once would keep.
+
+    Like scikit-learn, the vocabulary is sorted and the ``max_features`` terms with the
+    highest total count are picked from it, so the result is the same as a full fit.
+    """
+    terms, inverse = np.unique(
+        np.concatenate([terms for _, terms in shard_counts]), return_inverse=True
+    )
+    frequencies = np.zeros(len(terms), dtype=np.int64)
+    np.add.at(
+        frequencies,
+        inverse,
+        np.concatenate(
+            [np.asarray(counts.sum(axis=0)).ravel() for counts, _ in shard_counts]
+        ),
+    )
+    if max_features is not None and len(terms) > max_features:
+        terms = terms[np.sort((-frequencies).argsort()[:max_features])]
+    return terms
+
+
+def select_terms(
+    counts: sparse.csr_matrix, shard_terms: np.ndarray, terms: np.ndarray
+) -> sparse.csr_matrix:
+    """Re-index counts over a shard's own terms to the columns of a vocabulary."""
+    columns = np.searchsorted(terms, shard_terms)
+    kept = columns < len(terms)
+    kept[kept] = terms[columns[kept]] == shard_terms[kept]
+    selection = sparse.csr_matrix(
+        (
+            np.ones(kept.sum(), dtype=counts.dtype),
+            (np.flatnonzero(kept), columns[kept]),
+        ),
+        shape=(len(shard_terms), len(terms)),
+    )
+    return (counts @ selection).tocsr()
+
+
+def load_shard_counts(
+    counter,
+    texts: pd.Series,
+    cache_dir: Path,
+    shard_rows: int,
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+) -> tuple[list[str], list[tuple[sparse.csr_matrix, np.ndarray | None]], np.ndarray]:
+    """
+    Counts of every shard of ``texts``, computing only the shards not cached yet.
+
+    A hashing vectorizer's shards are its final counts. For a ``CountVectorizer`` a
+    shard holds the counts over the shard's own terms along with those terms, since the
+    vocabulary is only known once every shard is counted. Returns the shard keys,
+    ``(counts, terms)`` per shard, ``terms`` being ``None`` for hashed counts, and the
+    position in ``texts`` of every counted row, in shard order.
+    """
+    hashing = isinstance(counter, HashingVectorizer)
+    config = clone(counter).set_params(**({} if hashing else {"max_features": None}))
+    salt = f"{sklearn.__version__}:{type(counter).__name__}:{config.get_params()}"
+    shards = shard_frame(texts.to_frame(), shard_rows, salt=salt)
+    keys = [key for key, _ in shards]
+    missing = [
+        (key, shard)
+        for key, shard in shards
+        if not cache_dir.joinpath(f"{key}.npz").exists()
+    ]
+    logging.info(
+        "Reusing %d of %d feature shards", len(shards) - len(missing), len(shards)
+    )
+
+    if missing:
+        os.makedirs(cache_dir, exist_ok=True)
+        shard_texts = [shard.iloc[:, 0].values for _, shard in missing]
+        workers = os.cpu_count() if n_jobs < 0 else n_jobs
+        if hashing:
+            hashed = hash_in_chunks(
+                counter, np.concatenate(shard_texts), n_jobs, chunk_size
+            )
+            offsets = np.cumsum([0, *map(len, shard_texts)])
+            computed = [(hashed[start:stop], None) for start, stop in pairwise(offsets)]
+        elif workers <= 1 or len(missing) <= 1:
+            computed = [_count_terms(counter, texts) for texts in shard_texts]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(missing))
+            ) as executor:
+                computed = list(
+                    executor.map(_count_terms, repeat(counter), shard_texts)
+                )
+        for (key, _), (counts, terms) in zip(missing, computed):
+            if terms is not None:
+                with (
+                    atomic_path(cache_dir / f"{key}.terms.npy") as tmp,
+                    open(tmp, "wb") as file,
+                ):
+                    np.save(file, terms)
+            # The counts go last: a shard is cached once its .npz exists
+            with (
+                atomic_path(cache_dir / f"{key}.npz") as tmp,
+                open(tmp, "wb") as file,
+            ):
+                sparse.save_npz(file, counts, compressed=False)
+
+    counts = []
+    for key in keys:
+        terms_path = cache_dir / f"{key}.terms.npy"
+        counts.append(
+            (
+                sparse.load_npz(cache_dir / f"{key}.npz").tocsr(),
+                None if hashing else np.load(terms_path),
+            )
+        )
+    positions = np.concatenate(
+        [np.empty(0, dtype=np.int64), *(shard.index for _, shard in shards)]
+    )
+    return keys, counts, positions
+
+
+def vectorize_shards(
+    vectorizer,
+    x_train: pd.Series,
+    x_test: pd.Series,
+    cache_dir: Path,
+    shard_rows: int = 10000,
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+) -> tuple:
+    """
+    Fit ``vectorizer`` on the train texts and transform both sets from cached shards.
+
+    Only shards missing from ``cache_dir`` are tokenized, so after new rows arrive the
+    work is proportional to them. A ``CountVectorizer`` gets the vocabulary a full fit
+    would learn, fixed as its ``vocabulary``. Shards used by neither set are removed
+    from the cache. Returns the fitted vectorizer and the train and test matrices, with
+    their rows in the order of the texts.
+    """
+    pipeline = isinstance(vectorizer, Pipeline)
+    counter = vectorizer[0] if pipeline else vectorizer
+    train_keys, train_counts, train_positions = load_shard_counts(
+        counter, x_train, cache_dir, shard_rows, n_jobs, chunk_size
+    )
+    test_keys, test_counts, test_positions = load_shard_counts(
+        counter, x_test, cache_dir, shard_rows, n_jobs, chunk_size
+    )
+    prune_cache(cache_dir, train_keys + test_keys)
+
+    if isinstance(counter, HashingVectorizer):
+        n_features = counter.n_features
+        train_parts = [counts for counts, _ in train_counts]
+        test_parts = [counts for counts, _ in test_counts]
+    else:
+        terms = merge_vocabulary(train_counts, counter.max_features)
+        counter = clone(counter).set_params(vocabulary=terms.tolist())
+        # Fitting a fixed vocabulary reads no text; it only sets vocabulary_
+        counter.fit([])
+        n_features = len(terms)
+        train_parts = [select_terms(*shard, terms) for shard in train_counts]
+        test_parts = [select_terms(*shard, terms) for shard in test_counts]
+
+    # Shards hold rows in content-hash order; put them back in the order of the texts
+    x_train_bow, x_test_bow = (
+        (
+            vstack(parts, format="csr")[np.argsort(positions)]
+            if parts
+            else sparse.csr_matrix((0, n_features), dtype=np.int64)
+        )
+        for parts, positions in (
+            (train_parts, train_positions),
+            (test_parts, test_positions),
+        )
+    )
+    if pipeline:
+        vectorizer = Pipeline(
+            [(vectorizer.steps[0][0], counter), *vectorizer.steps[1:]]
+        )
+        x_train_bow = vectorizer[-1].fit_transform(x_train_bow)
+        x_test_bow = vectorizer[-1].transform(x_test_bow)
+    else:
+        vectorizer = counter
+    return vectorizer, x_train_bow, x_test_bow
 
 
 def apply_bow(
@@ -19,29 +304,58 @@ def apply_bow(
     test_data: pd.DataFrame,
     max_features: int,
     vectorizer_name: str,
+    vectorizer_type: str = "count",
+    n_features: int = 2**20,
+    use_tfidf: bool = False,
+    n_jobs: int = 1,
+    chunk_size: int = 10000,
+    cache_dir: Path | None = None,
+    shard_rows: int = 10000,
 ) -> tuple:
-    """Apply Count Vectorizer to the data."""
+    """
+    Apply the Count or Hashing Vectorizer to the data.
+
+    With ``cache_dir`` the texts are vectorized shard by shard through
+    :func:`vectorize_shards`, reusing the shards cached by earlier runs.
+
+    Returns the sparse train and test matrices together with their labels.
+    """
     try:
-        logging.info("Applying BOW...")
-        vectorizer = CountVectorizer(max_features=max_features)
+        logging.info("Applying BOW with the %s vectorizer...", vectorizer_type)
+        vectorizer = build_vectorizer(
+            vectorizer_type, max_features, n_features, use_tfidf
+        )
 
         x_train = train_data["review"].values
         y_train = train_data["sentiment"].values
         x_test = test_data["review"].values
         y_test = test_data["sentiment"].values
 
-        x_train_bow = vectorizer.fit_transform(x_train)
-        x_test_bow = vectorizer.transform(x_test)
-
-        train_df = pd.DataFrame(x_train_bow.toarray())
-        train_df["label"] = y_train
+        if cache_dir is not None:
+            vectorizer, x_train_bow, x_test_bow = vectorize_shards(
+                vectorizer,
+                train_data["review"],
+                test_data["review"],
+                Path(cache_dir),
+                shard_rows,
+                n_jobs,
+                chunk_size,
+            )
+        elif vectorizer_type == "hashing":
+            hasher = vectorizer[0] if use_tfidf else vectorizer
+            x_train_bow = hash_in_chunks(hasher, x_train, n_jobs, chunk_size)
+            x_test_bow = hash_in_chunks(hasher, x_test, n_jobs, chunk_size)
+            if use_tfidf:
+                x_train_bow = vectorizer[-1].fit_transform(x_train_bow)
+                x_test_bow = vectorizer[-1].transform(x_test_bow)
+        else:
+            x_train_bow = vectorizer.fit_transform(x_train)
+            x_test_bow = vectorizer.transform(x_test)
 
-        test_df = pd.DataFrame(x_test_bow.toarray())
-        test_df["label"] = y_test
         save_model(vectorizer, vectorizer_name)
         logging.info("Bag of Words applied and data transformed")
 
-        return train_df, test_df
+        return x_train_bow, y_train, x_test_bow, y_test
     except Exception as e:
         logging.error("Error during Bag of Words transformation: %s", e)
         raise
@@ -51,18 +365,45 @@ def main():
     try:
         params_file = PARAMS_FILE.get()
         params = load_params(params_path=params_file)
-        max_features = params["feature_engineering"]["max_features"]
-        vectorizer_name = params["feature_engineering"]["vectorizer_name"]
+        feature_params = params["feature_engineering"]
+        # The model_tuning stage may have picked a better vocabulary size
+        max_features = load_best_params(BEST_PARAMS_PATH).get(
+            "max_features", feature_params["max_features"]
+        )
+        vectorizer_name = feature_params["vectorizer_name"]
 
         train_data = load_data(INTERIM_TRAIN_DATA_FILE)
         test_data = load_data(INTERIM_TEST_DATA_FILE)
 
-        train_df, test_df = apply_bow(
-            train_data, test_data, max_features, vectorizer_name
+        x_train, y_train, x_test, y_test = apply_bow(
+            train_data,
+            test_data,
+            max_features,
+            vectorizer_name,
+            vectorizer_type=feature_params.get("vectorizer_type", "count"),
+            n_features=feature_params.get("n_features", 2**20),
+            use_tfidf=feature_params.get("use_tfidf", False),
+            n_jobs=feature_params.get("n_jobs", 1),
+            chunk_size=feature_params.get("chunk_size", 10000),
+            cache_dir=FEATURES_CACHE_DIR,
+            shard_rows=feature_params.get("shard_rows", 10000),
         )
 
-        save_data(train_df, PROCESSED_TRAIN_DATA_FILE, keep_index=False)
-        save_data(test_df, PROCESSED_TEST_DATA_FILE, keep_index=False)
+        rows_per_part = feature_params.get("rows_per_part")
+        save_features(
+            x_train,
+            y_train,
+            PROCESSED_TRAIN_FEATURES_DIR,
+            rows_per_part,
+            row_ids=hash_rows(train_data),
+        )
+        save_features(
+            x_test,
+            y_test,
+            PROCESSED_TEST_FEATURES_DIR,
+            rows_per_part,
+            row_ids=hash_rows(test_data),
+        )
     except Exception as e:
         logging.error("Failed to complete the feature engineering process: %s", e)
         print(f"Error: {e}")
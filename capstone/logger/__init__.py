@@ -11,14 +11,27 @@ MAX_LOG_SIZE = 5 * 1024 * 1024  # 5 MB
 BACKUP_COUNT = 3  # Number of backup log files to keep
 
 # Construct log file path
-root_dir = os.path.dirname(
-    os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
-)
+root_dir = os.path.dirname(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
 log_dir_path = os.path.join(root_dir, LOG_DIR)
-os.makedirs(log_dir_path, exist_ok=True)
 log_file_path = os.path.join(log_dir_path, LOG_FILE)
 
 
+class LazyRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler that creates the log directory and file on the first record.
+
+    Importing the package then touches no files, so a run that logs nothing (a test,
+    ``--help``) leaves no empty timestamped log behind.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 def configure_logger():
     """
     Configures logging with a rotating file handler and a console handler.
@@ -28,12 +41,10 @@ def configure_logger():
     logger.setLevel(logging.DEBUG)
 
     # Define formatter
-    formatter = logging.Formatter(
-        "[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s"
-    )
+    formatter = logging.Formatter("[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s")
 
     # File handler with rotation
-    file_handler = RotatingFileHandler(
+    file_handler = LazyRotatingFileHandler(
         log_file_path, maxBytes=MAX_LOG_SIZE, backupCount=BACKUP_COUNT, encoding="utf-8"
     )
     file_handler.setFormatter(formatter)
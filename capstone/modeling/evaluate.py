@@ -2,47 +2,84 @@ import json
 from pathlib import Path
 from typing import Any
 
-import mlflow
-from mlflow.models import infer_signature
-import mlflow.sklearn
 import numpy as np
-from sklearn.metrics import accuracy_score, precision_score, recall_score, roc_auc_score
+from scipy.sparse import spmatrix
 
 from capstone.config import (
     EXPERIMENT_INFO_PATH,
+    LINEAR_SCORER_DIR,
     METRICS_PATH,
-    PROCESSED_TEST_DATA_FILE,
+    MODELS_DIR,
+    PR_CURVE_PATH,
+    PROCESSED_TEST_FEATURES_DIR,
+    TRAINING_SNAPSHOT_PATH,
 )
 from capstone.environment import MLFLOW_TRACKING_URI, PARAMS_FILE
 from capstone.logger import logging
-from capstone.utils import load_data, load_model, load_params
+from capstone.modeling.export import export_linear_scorer
+from capstone.modeling.metrics import (
+    bootstrap_metrics,
+    classification_metrics,
+    precision_recall_curve,
+)
+from capstone.utils import iter_features, load_model, load_params
 
-# Set up MLflow tracking URI
-mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
 
+def score_features(clf, store_dir) -> tuple[np.ndarray, np.ndarray, spmatrix]:
+    """
+    Score a feature store part by part with a single ``predict_proba`` pass.
 
-def evaluate_model(clf, x_test: np.ndarray, y_test: np.ndarray) -> tuple[dict, Any]:
-    """Evaluate the model and return the evaluation metrics."""
+    Returns the labels, the positive-class probabilities and the first row, which
+    serves as the logged model's input example.
+    """
     try:
-        y_pred = clf.predict(x_test)
-        y_pred_proba = clf.predict_proba(x_test)[:, 1]
-
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred)
-        recall = recall_score(y_test, y_pred)
-        auc = roc_auc_score(y_test, y_pred_proba)
-
-        metrics_dict = {
-            "accuracy": accuracy,
-            "precision": precision,
-            "recall": recall,
-            "auc": auc,
-        }
-        logging.info("Model evaluation metrics calculated")
-        return (
-            metrics_dict,
-            infer_signature(x_test, y_pred),
+        labels, scores = [], []
+        input_example = None
+        for x_part, y_part in iter_features(store_dir):
+            if input_example is None:
+                input_example = x_part[0:1]
+            labels.append(y_part)
+            scores.append(clf.predict_proba(x_part)[:, 1])
+        logging.info("Scored the features in %s", store_dir)
+        return np.concatenate(labels), np.concatenate(scores), input_example
+    except Exception as e:
+        logging.error("Error while scoring the features: %s", e)
+        raise
+
+
+def evaluate_model(
+    clf,
+    store_dir,
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    random_state: int | None = None,
+) -> tuple[dict, tuple, Any]:
+    """
+    Evaluate the model on a feature store.
+
+    Returns the metrics, the precision-recall curve and an input example. Predictions
+    are derived from the same probabilities as the AUC, and the metrics include the
+    bounds of their bootstrap confidence intervals as ``<metric>_ci_low`` and
+    ``<metric>_ci_high``.
+    """
+    try:
+        y_test, scores, input_example = score_features(clf, store_dir)
+        positives = y_test == clf.classes_[1]
+
+        metrics_dict = classification_metrics(positives, scores)
+        intervals = bootstrap_metrics(
+            positives,
+            scores,
+            n_resamples=n_bootstrap,
+            confidence=confidence,
+            random_state=random_state,
         )
+        for name, (low, high) in intervals.items():
+            metrics_dict[f"{name}_ci_low"] = low
+            metrics_dict[f"{name}_ci_high"] = high
+        curve = precision_recall_curve(positives, scores)
+        logging.info("Model evaluation metrics calculated")
+        return metrics_dict, curve, input_example
     except Exception as e:
         logging.error("Error during model evaluation: %s", e)
         raise
@@ -60,6 +97,24 @@ def save_metrics(metrics: dict, file_path: str | Path) -> None:
         raise
 
 
+def save_pr_curve(curve: tuple, file_path: str | Path) -> None:
+    """Save precision and recall per decision threshold to a CSV file."""
+    try:
+        thresholds, precision, recall = curve
+        np.savetxt(
+            file_path,
+            np.column_stack([thresholds, precision, recall]),
+            delimiter=",",
+            fmt="%.6g",
+            header="threshold,precision,recall",
+            comments="",
+        )
+        logging.info("Precision-recall curve saved to %s", file_path)
+    except Exception as e:
+        logging.error("Error occurred while saving the precision-recall curve: %s", e)
+        raise
+
+
 def save_model_info(run_id: str, model_path: str, file_path: str) -> None:
     """Save the model run ID and path to a JSON file."""
     try:
@@ -74,6 +129,11 @@ def save_model_info(run_id: str, model_path: str, file_path: str) -> None:
 
 
 def main():
+    import mlflow
+    from mlflow.models import infer_signature
+    import mlflow.sklearn
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
     params_file = PARAMS_FILE.get()
     params = load_params(params_path=params_file)
     mlflow.set_experiment(params["model_evaluation"]["experiment_name"])
@@ -83,15 +143,21 @@ def main():
             params_file = PARAMS_FILE.get()
             params = load_params(params_path=params_file)
             model_name = params["model_training"]["model_name"]
+            vectorizer_name = params["feature_engineering"]["vectorizer_name"]
+            evaluation_params = params["model_evaluation"]
             clf = load_model(model_name)
-            test_data = load_data(PROCESSED_TEST_DATA_FILE)
-
-            x_test = test_data.iloc[:, :-1].values
-            y_test = test_data.iloc[:, -1].values
 
-            metrics, signature = evaluate_model(clf, x_test, y_test)
+            metrics, curve, input_example = evaluate_model(
+                clf,
+                PROCESSED_TEST_FEATURES_DIR,
+                n_bootstrap=evaluation_params.get("n_bootstrap", 1000),
+                confidence=evaluation_params.get("confidence", 0.95),
+                random_state=params["model_training"]["random_state"],
+            )
 
             save_metrics(metrics, METRICS_PATH)
+            save_pr_curve(curve, PR_CURVE_PATH)
+            mlflow.log_artifact(PR_CURVE_PATH)
 
             # Log metrics to MLflow
             for metric_name, metric_value in metrics.items():
@@ -103,11 +169,27 @@ def main():
                 for param_name, param_value in params.items():
                     mlflow.log_param(param_name, param_value)
 
-            # Log model to MLflow
+            # Log model to MLflow; a sparse input example gives it a sparse signature
+            signature = infer_signature(input_example, clf.predict(input_example))
             mlflow.sklearn.log_model(
-                clf, "model", input_example=x_test[0:1], signature=signature
+                clf, "model", input_example=input_example, signature=signature
+            )
+
+            # Log the vectorizer with the model so serving can fetch both per version
+            mlflow.log_artifact(
+                MODELS_DIR / f"{vectorizer_name}.pkl", artifact_path="vectorizer"
             )
 
+            # Export the pure-NumPy scorer used by brainserve's linear engine
+            export_linear_scorer(clf, load_model(vectorizer_name), LINEAR_SCORER_DIR)
+            mlflow.log_artifacts(LINEAR_SCORER_DIR, artifact_path="linear_scorer")
+
+            # Log the ids of the trained rows so warm-start retraining skips them
+            if TRAINING_SNAPSHOT_PATH.exists():
+                mlflow.log_artifact(
+                    TRAINING_SNAPSHOT_PATH, artifact_path="training_snapshot"
+                )
+
             # Save model info
             save_model_info(run.info.run_id, "model", EXPERIMENT_INFO_PATH)
 
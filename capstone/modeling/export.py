@@ -0,0 +1,83 @@
+# export the trained linear model as plain NumPy arrays
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import Pipeline
+
+from capstone.logger import logging
+
+LINEAR_SCORER_FORMAT_VERSION = 2
+
+
+def export_linear_scorer(clf, vectorizer, output_dir: str | Path) -> Path:
+    """
+    Export a binary linear classifier and its vectorizer as NumPy arrays.
+
+    The directory holds ``coef.npy``, ``intercept.npy``, ``classes.npy`` and a
+    ``meta.json`` with the tokenization settings, which is everything needed to score
+    raw text with a sparse dot product and a sigmoid. A CountVectorizer adds
+    ``vocabulary.npy`` (terms ordered by column index), while a HashingVectorizer needs
+    no vocabulary at all; a trailing TfidfTransformer adds ``idf.npy``. The arrays are
+    uncompressed ``.npy`` files so they can be memory-mapped.
+    """
+    try:
+        if getattr(clf, "coef_", None) is None or clf.coef_.shape[0] != 1:
+            raise ValueError("Only binary linear classifiers can be exported")
+        tfidf = None
+        if isinstance(vectorizer, Pipeline):
+            if len(vectorizer.steps) != 2 or not isinstance(vectorizer[-1], TfidfTransformer):
+                raise ValueError("Only a vectorizer followed by TF-IDF can be exported")
+            vectorizer, tfidf = vectorizer[0], vectorizer[-1]
+        hashing = isinstance(vectorizer, HashingVectorizer)
+        if (
+            vectorizer.analyzer != "word"
+            or vectorizer.ngram_range != (1, 1)
+            or vectorizer.tokenizer is not None
+            or vectorizer.preprocessor is not None
+            or vectorizer.stop_words is not None
+        ):
+            raise ValueError("Only unigram word vectorizers can be exported")
+
+        output_dir = Path(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        # Drop the arrays of a previous export so the directory matches this one
+        for stale in ("vocabulary.npy", "idf.npy"):
+            (output_dir / stale).unlink(missing_ok=True)
+        np.save(output_dir / "coef.npy", clf.coef_.ravel().astype(np.float64))
+        np.save(output_dir / "intercept.npy", clf.intercept_.astype(np.float64))
+        np.save(output_dir / "classes.npy", clf.classes_)
+        meta = {
+            "format_version": LINEAR_SCORER_FORMAT_VERSION,
+            "vectorizer": "hashing" if hashing else "count",
+            "token_pattern": vectorizer.token_pattern,
+            "lowercase": vectorizer.lowercase,
+            "binary": vectorizer.binary,
+        }
+        if hashing:
+            meta["n_features"] = vectorizer.n_features
+            meta["alternate_sign"] = vectorizer.alternate_sign
+            meta["norm"] = vectorizer.norm
+        else:
+            terms = vectorizer.get_feature_names_out().astype(str)
+            np.save(output_dir / "vocabulary.npy", terms)
+        if tfidf is not None:
+            if tfidf.use_idf:
+                np.save(output_dir / "idf.npy", tfidf.idf_.astype(np.float64))
+            meta["tfidf"] = {"norm": tfidf.norm, "sublinear_tf": tfidf.sublinear_tf}
+        with open(output_dir / "meta.json", "w") as file:
+            # noinspection PyTypeChecker
+            json.dump(meta, file, indent=4)
+        logging.info(
+            "Linear scorer (%s vectorizer, %d features) exported to %s",
+            meta["vectorizer"],
+            clf.coef_.shape[1],
+            output_dir,
+        )
+        return output_dir
+    except Exception as e:
+        logging.error("Error occurred while exporting the linear scorer: %s", e)
+        raise
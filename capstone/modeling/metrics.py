@@ -0,0 +1,131 @@
+# evaluation metrics
+
+import numpy as np
+
+METRIC_NAMES = ("accuracy", "precision", "recall", "auc")
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise ratio that is 0 where the denominator is 0, like scikit-learn."""
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+
+def _sort_by_score(
+    positives: np.ndarray, scores: np.ndarray, threshold: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Labels and predictions in increasing score order, and where each tie starts."""
+    order = np.argsort(scores, kind="mergesort")
+    sorted_scores = scores[order]
+    group_starts = np.r_[0, np.flatnonzero(np.diff(sorted_scores)) + 1]
+    return positives[order], sorted_scores > threshold, group_starts
+
+
+def _weighted_metrics(
+    weights: np.ndarray,
+    positives: np.ndarray,
+    predicted: np.ndarray,
+    group_starts: np.ndarray,
+) -> dict[str, np.ndarray]:
+    """
+    Metrics for every row of ``weights`` (resamples x rows) at once.
+
+    Rows are in increasing score order. A row of ones gives the plain metrics and a row
+    of bootstrap counts the metrics of that resample. AUC is the Mann-Whitney
+    statistic: for every positive, the weight of the negatives scored below it, with
+    ties counting half.
+    """
+    total = weights.sum(axis=1)
+    true_positives = weights @ (positives & predicted)
+    metrics = {
+        "accuracy": _safe_divide(weights @ (positives == predicted), total),
+        "precision": _safe_divide(true_positives, weights @ predicted),
+        "recall": _safe_divide(true_positives, weights @ positives),
+    }
+
+    positive_weights = np.add.reduceat(weights * positives, group_starts, axis=1)
+    negative_weights = np.add.reduceat(weights * ~positives, group_starts, axis=1)
+    negatives_below = np.cumsum(negative_weights, axis=1) - negative_weights
+    pairs = positive_weights.sum(axis=1) * negative_weights.sum(axis=1)
+    concordant = positive_weights * (negatives_below + 0.5 * negative_weights)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics["auc"] = np.where(pairs > 0, concordant.sum(axis=1) / pairs, np.nan)
+    return metrics
+
+
+def classification_metrics(
+    positives: np.ndarray, scores: np.ndarray, threshold: float = 0.5
+) -> dict[str, float]:
+    """Accuracy, precision and recall at ``threshold`` and the ROC AUC of ``scores``."""
+    positives = np.asarray(positives, dtype=bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    metrics = _weighted_metrics(
+        np.ones((1, len(scores))), *_sort_by_score(positives, scores, threshold)
+    )
+    return {name: float(values[0]) for name, values in metrics.items()}
+
+
+def bootstrap_metrics(
+    positives: np.ndarray,
+    scores: np.ndarray,
+    threshold: float = 0.5,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    random_state: int | None = None,
+    max_block_cells: int = 2**22,
+) -> dict[str, tuple[float, float]]:
+    """
+    Percentile bootstrap confidence intervals of :func:`classification_metrics`.
+
+    Each resample is a vector of counts of how often every row was drawn, so the
+    metrics of a whole block of resamples are a few matrix products rather than a
+    Python loop; blocks hold at most ``max_block_cells`` counts to bound memory.
+    """
+    positives, predicted, group_starts = _sort_by_score(
+        np.asarray(positives, dtype=bool),
+        np.asarray(scores, dtype=np.float64),
+        threshold,
+    )
+    n_rows = len(positives)
+    rng = np.random.default_rng(random_state)
+    block_size = max(1, min(n_resamples, max_block_cells // max(n_rows, 1)))
+
+    samples = {name: [] for name in METRIC_NAMES}
+    for start in range(0, n_resamples, block_size):
+        size = min(block_size, n_resamples - start)
+        # Draw n_rows rows with replacement per resample and count the draws per row
+        draws = rng.integers(0, n_rows, size=(size, n_rows))
+        draws += np.arange(size)[:, None] * n_rows
+        counts = np.bincount(draws.ravel(), minlength=size * n_rows)
+        counts = counts.reshape(size, n_rows).astype(np.float64)
+        metrics = _weighted_metrics(counts, positives, predicted, group_starts)
+        for name, values in metrics.items():
+            samples[name].append(values)
+
+    tail = (1.0 - confidence) / 2 * 100
+    intervals = {}
+    for name, values in samples.items():
+        low, high = np.nanpercentile(np.concatenate(values), [tail, 100 - tail])
+        intervals[name] = (float(low), float(high))
+    return intervals
+
+
+def precision_recall_curve(
+    positives: np.ndarray, scores: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Precision and recall at every distinct score used as the decision threshold.
+
+    Returns ``(thresholds, precision, recall)`` with thresholds in decreasing order;
+    a row is predicted positive when its score is at least the threshold.
+    """
+    positives = np.asarray(positives, dtype=bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="mergesort")
+    sorted_scores = scores[order]
+    last_of_group = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1]
+    true_positives = np.cumsum(positives[order])[last_of_group]
+    predicted_positives = last_of_group + 1
+    precision = true_positives / predicted_positives
+    recall = _safe_divide(true_positives, np.full(len(true_positives), positives.sum()))
+    return sorted_scores[last_of_group], precision, recall
@@ -1,29 +1,336 @@
+# batch prediction
+
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
 from pathlib import Path
+import tempfile
+from urllib.parse import urlparse
 
-from loguru import logger
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
 from tqdm import tqdm
 import typer
 
-from capstone.config import MODELS_DIR, PROCESSED_DATA_DIR
+from capstone.config import MODELS_DIR, S3_CACHE_DIR
+from capstone.data.connections.s3 import S3Operations
+from capstone.data.normalizer import TextNormalizer, ensure_corpora
+from capstone.environment import (
+    MLFLOW_TRACKING_URI,
+    PARAMS_FILE,
+    S3_ACCESS_KEY,
+    S3_SECRET_KEY,
+)
+from capstone.logger import logging
+from capstone.utils import load_params
 
 app = typer.Typer()
 
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".json": "jsonl",
+    ".parquet": "parquet",
+}
+
+# Per-process scoring state, set once by _init_worker
+_normalizer: TextNormalizer | None = None
+_vectorizer = None
+_model = None
+
+
+def file_format(path: str | Path) -> str:
+    """The format of a file from its extension: ``csv``, ``jsonl`` or ``parquet``."""
+    suffix = Path(path).suffix.lower()
+    if suffix not in FILE_FORMATS:
+        raise ValueError(
+            f"Unsupported file type {suffix!r}, expected one of {', '.join(FILE_FORMATS)}"
+        )
+    return FILE_FORMATS[suffix]
+
+
+def resolve_input(source: str) -> Path:
+    """Local path of the input, downloading ``s3://bucket/key`` into the S3 cache."""
+    if not source.startswith("s3://"):
+        return Path(source)
+    url = urlparse(source)
+    s3 = S3Operations(
+        url.netloc,
+        S3_ACCESS_KEY.get(not_exists_okay=False),
+        S3_SECRET_KEY.get(not_exists_okay=False),
+    )
+    return Path(s3.download_file_from_s3(url.path.lstrip("/"), S3_CACHE_DIR))
+
+
+def iter_input_chunks(path: Path, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """Stream the input file as DataFrames of ``chunk_size`` rows, after ``skip_rows``."""
+    fmt = file_format(path)
+    if fmt == "csv":
+        chunks = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip_rows + 1))
+        skip_rows = 0
+    elif fmt == "jsonl":
+        chunks = pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        chunks = (
+            batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+        )
+    for chunk in chunks:
+        if skip_rows >= len(chunk):
+            skip_rows -= len(chunk)
+            continue
+        yield chunk.iloc[skip_rows:]
+        skip_rows = 0
+
+
+def load_registered_model(model_name: str, version: str) -> tuple:
+    """
+    Load a registered model version (or the latest one in a stage) and its vectorizer.
+
+    The vectorizer logged with the model's run is preferred; runs from before it was
+    logged fall back to the local ``models/`` file.
+    """
+    import mlflow.sklearn
+
+    try:
+        client = mlflow.MlflowClient()
+        if version.isdigit():
+            model_version = client.get_model_version(model_name, version)
+        else:
+            stage_versions = client.get_latest_versions(model_name, stages=[version])
+            if not stage_versions:
+                raise ValueError(f"Model {model_name} has no version in {version}")
+            model_version = stage_versions[0]
+
+        model_uri = f"models:/{model_name}/{model_version.version}"
+        logging.info("Loading model from %s", model_uri)
+        model = mlflow.sklearn.load_model(model_uri)
+        try:
+            vectorizer_dir = mlflow.artifacts.download_artifacts(
+                run_id=model_version.run_id, artifact_path="vectorizer"
+            )
+            vectorizer = joblib.load(next(Path(vectorizer_dir).glob("*.pkl")))
+        except Exception as e:
+            params = load_params(params_path=PARAMS_FILE.get())
+            vectorizer_name = params["feature_engineering"]["vectorizer_name"]
+            logging.warning("No vectorizer logged with the model (%s); using local", e)
+            vectorizer = joblib.load(MODELS_DIR / f"{vectorizer_name}.pkl")
+        return model, vectorizer, str(model_version.version)
+    except Exception as e:
+        logging.error("Error while loading the registered model: %s", e)
+        raise
+
+
+def _init_worker(vectorizer, model) -> None:
+    """Load the normalizer and hold the vectorizer and model once per process."""
+    global _normalizer, _vectorizer, _model
+    _normalizer, _vectorizer, _model = TextNormalizer(), vectorizer, model
+
+
+def _score_chunk(texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Normalize, vectorize and score one chunk of texts inside a worker."""
+    features = _vectorizer.transform([_normalizer.normalize(text) for text in texts])
+    probabilities = _model.predict_proba(features)[:, 1]
+    labels = _model.classes_[(probabilities > 0.5).astype(int)]
+    return labels, probabilities
+
+
+class PredictionWriter:
+    """
+    Appends prediction chunks to the output so that a run can resume where it stopped.
+
+    CSV and JSONL outputs are single files: :meth:`write` returns the file size after
+    each chunk and a resumed run first truncates the file back to the size recorded in
+    the checkpoint. Parquet outputs are directories of ``part-NNNNN.parquet`` files.
+    """
+
+    def __init__(self, path: Path, state: dict | None = None):
+        self.path = Path(path)
+        self.format = file_format(path)
+        state = state or {}
+        if self.format == "parquet":
+            self.parts = state.get("parts", 0)
+            self.path.mkdir(parents=True, exist_ok=True)
+            for part in self.path.glob("part-*.parquet"):
+                if int(part.stem.split("-")[1]) >= self.parts:
+                    part.unlink()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a+b") as file:
+                file.truncate(state.get("output_bytes", 0))
+
+    def write(self, frame: pd.DataFrame) -> dict:
+        """Write one chunk durably and return the state to checkpoint."""
+        if self.format == "parquet":
+            frame.to_parquet(self.path / f"part-{self.parts:05d}.parquet", index=False)
+            self.parts += 1
+            return {"parts": self.parts}
+        with open(self.path, "a", encoding="utf-8", newline="") as file:
+            if self.format == "csv":
+                frame.to_csv(file, header=file.tell() == 0, index=False)
+            else:
+                # Every record, the last one included, ends with a newline
+                frame.to_json(file, orient="records", lines=True, force_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+            return {"output_bytes": file.tell()}
+
+
+def load_checkpoint(path: Path) -> dict | None:
+    """The checkpoint of a previous run, or ``None`` if there is none."""
+    if not path.exists():
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def save_checkpoint(path: Path, checkpoint: dict) -> None:
+    """Replace the checkpoint atomically, so a crash never leaves half of one."""
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, delete=False) as tmp:
+        # noinspection PyTypeChecker
+        json.dump(checkpoint, tmp, indent=4)
+    os.replace(tmp.name, path)
+
+
+def predict_file(
+    source: str,
+    output_path: Path,
+    model_name: str,
+    model_version: str = "Production",
+    text_column: str = "review",
+    id_column: str | None = None,
+    chunk_size: int = 10000,
+    n_jobs: int = 1,
+    checkpoint_path: Path | None = None,
+    restart: bool = False,
+) -> int:
+    """
+    Score every review of ``source`` and write the predictions to ``output_path``.
+
+    Chunks are normalized, vectorized and scored across ``n_jobs`` processes (negative:
+    every CPU) while the output is written in input order. After each chunk the
+    checkpoint records how many rows are done, so rerunning the same command resumes
+    from there. Returns the number of rows scored by this run.
+    """
+    output_path = Path(output_path)
+    checkpoint_path = Path(checkpoint_path or f"{output_path}.checkpoint.json")
+    model, vectorizer, version = load_registered_model(model_name, model_version)
+
+    checkpoint = None if restart else load_checkpoint(checkpoint_path)
+    if checkpoint is not None:
+        if checkpoint["input"] != source or checkpoint["model_version"] != version:
+            raise ValueError(
+                f"{checkpoint_path} was written for {checkpoint['input']} with model "
+                f"version {checkpoint['model_version']}; pass --restart to start over"
+            )
+        if checkpoint.get("complete"):
+            logging.info("%s is already complete", output_path)
+            return 0
+        logging.info("Resuming after %d rows", checkpoint["rows_done"])
+    else:
+        checkpoint = {"input": source, "model_version": version, "rows_done": 0}
+    writer = PredictionWriter(output_path, checkpoint)
+
+    chunks = iter_input_chunks(
+        resolve_input(source), chunk_size, skip_rows=checkpoint["rows_done"]
+    )
+    workers = os.cpu_count() if n_jobs < 0 else n_jobs
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(vectorizer, model)
+        )
+    else:
+        _init_worker(vectorizer, model)
+
+    start_rows = checkpoint["rows_done"]
+    pending = deque()
+
+    def write_next():
+        chunk, scored = pending.popleft()
+        labels, probabilities = scored.result() if executor else scored
+        frame = pd.DataFrame(
+            {
+                "row": np.arange(len(chunk)) + checkpoint["rows_done"],
+                "prediction": labels,
+                "probability": probabilities,
+            }
+        )
+        if id_column:
+            frame.insert(0, id_column, chunk[id_column].to_numpy())
+        checkpoint.update(writer.write(frame))
+        checkpoint["rows_done"] += len(chunk)
+        save_checkpoint(checkpoint_path, checkpoint)
+        progress.update(len(chunk))
+
+    try:
+        with tqdm(desc="Scoring", unit="rows", initial=start_rows) as progress:
+            for chunk in chunks:
+                texts = chunk[text_column].fillna("").astype(str).tolist()
+                scored = executor.submit(_score_chunk, texts) if executor else _score_chunk(texts)
+                pending.append((chunk, scored))
+                # Keep a bounded number of chunks in flight so memory stays flat
+                if len(pending) > 2 * workers:
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    checkpoint["complete"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    scored_rows = checkpoint["rows_done"] - start_rows
+    logging.info("Wrote %d predictions to %s", scored_rows, output_path)
+    return scored_rows
+
 
 @app.command()
 def main(
-    # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
-    features_path: Path = PROCESSED_DATA_DIR / "test_features.csv",
-    model_path: Path = MODELS_DIR / "model.pkl",
-    predictions_path: Path = PROCESSED_DATA_DIR / "test_predictions.csv",
-    # -----------------------------------------
+    input_path: str = typer.Argument(
+        ..., help="CSV, JSONL or Parquet file of reviews; local path or s3://bucket/key"
+    ),
+    output_path: Path = typer.Argument(
+        ..., help="Predictions file (.csv, .jsonl) or Parquet directory (.parquet)"
+    ),
+    text_column: str = typer.Option("review", help="Column holding the review text"),
+    id_column: str = typer.Option(None, help="Column copied to the output as a key"),
+    model_version: str = typer.Option(
+        "Production", help="Registered model version number or stage"
+    ),
+    chunk_size: int = typer.Option(10000, help="Rows scored per chunk"),
+    n_jobs: int = typer.Option(-1, help="Worker processes; negative uses every CPU"),
+    checkpoint: Path = typer.Option(
+        None, help="Checkpoint file [default: <output>.checkpoint.json]"
+    ),
+    restart: bool = typer.Option(False, help="Ignore the checkpoint and start over"),
 ) -> None:
-    # ---- REPLACE THIS WITH YOUR OWN CODE ----
-    logger.info("Performing inference for model...")
-    for i in tqdm(range(10), total=10):
-        if i == 5:
-            logger.info("Something happened for iteration 5.")
-    logger.success("Inference complete.")
-    # -----------------------------------------
+    """Score reviews offline with the registered model, resuming interrupted runs."""
+    try:
+        import mlflow
+
+        # The normalizer of every worker needs these corpora
+        ensure_corpora()
+        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
+        params = load_params(params_path=PARAMS_FILE.get())
+        predict_file(
+            input_path,
+            output_path,
+            params["model_training"]["model_name"],
+            model_version=model_version,
+            text_column=text_column,
+            id_column=id_column,
+            chunk_size=chunk_size,
+            n_jobs=n_jobs,
+            checkpoint_path=checkpoint,
+            restart=restart,
+        )
+    except Exception as e:
+        logging.error("Failed to complete the batch prediction: %s", e)
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
@@ -1,24 +1,44 @@
 # register model
 
+import sys
 import warnings
 
-import mlflow
-
-from capstone.config import EXPERIMENT_INFO_PATH
+from capstone.config import EXPERIMENT_INFO_PATH, METRICS_PATH
 from capstone.environment import MLFLOW_TRACKING_URI, PARAMS_FILE
 from capstone.logger import logging
-from capstone.utils import load_model_info, load_params
+from capstone.utils import load_metrics, load_model_info, load_params
 
 warnings.simplefilter("ignore", UserWarning)
 warnings.filterwarnings("ignore")
 
-# Set up MLflow tracking URI
-mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
+
+def check_release_gate(metrics: dict, min_ci_low: dict) -> None:
+    """
+    Refuse a release unless every gated metric clears its threshold with confidence.
+
+    The lower bound of the metric's bootstrap confidence interval must reach the
+    threshold, so a lucky point estimate on a small holdout does not pass.
+    """
+    failures = []
+    for name, threshold in min_ci_low.items():
+        key = f"{name}_ci_low"
+        low = metrics.get(key)
+        if low is None:
+            failures.append(f"{key} is missing from the metrics")
+        elif low < threshold:
+            failures.append(f"{name} CI lower bound {low} < {threshold}")
+    if failures:
+        logging.error("Release gate failed: %s", "; ".join(failures))
+        raise ValueError(f"Release gate failed: {'; '.join(failures)}")
+    logging.info("Release gate passed for %s", ", ".join(min_ci_low) or "no metrics")
 
 
 def register_model(model_name: str, model_info: dict):
     """Register the model to the MLflow Model Registry."""
+    import mlflow
+
     try:
+        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
         model_uri = f"runs:/{model_info['run_id']}/{model_info['model_path']}"
 
         # Register the model
@@ -45,10 +65,13 @@ def main():
         params_file = PARAMS_FILE.get()
         params = load_params(params_path=params_file)
         model_name = params["model_training"]["model_name"]
+        min_ci_low = params.get("model_registration", {}).get("min_ci_low", {})
+        check_release_gate(load_metrics(METRICS_PATH), min_ci_low)
         register_model(model_name, model_info)
     except Exception as e:
         logging.error("Failed to complete the model registration process: %s", e)
         print(f"Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,19 +1,49 @@
+from pathlib import Path
+import sys
+
+import joblib
 import numpy as np
-from sklearn.linear_model import LogisticRegression
+from scipy.sparse import spmatrix
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.pipeline import Pipeline
 
-from capstone.config import PROCESSED_TRAIN_DATA_FILE
-from capstone.environment import PARAMS_FILE
+from capstone.config import (
+    BEST_PARAMS_PATH,
+    PROCESSED_TRAIN_FEATURES_DIR,
+    TRAINING_SNAPSHOT_PATH,
+)
+from capstone.environment import MLFLOW_TRACKING_URI, PARAMS_FILE
 from capstone.logger import logging
-from capstone.utils import load_data, load_params, save_model
+from capstone.utils import (
+    iter_features,
+    load_best_params,
+    load_feature_ids,
+    load_feature_labels,
+    load_features,
+    load_model,
+    load_params,
+    save_model,
+)
+
+TRAINING_MODES = ("batch", "incremental", "warm_start")
 
 
 def train_model(
-    x_train: np.ndarray, y_train: np.ndarray, random_state: int
+    x_train: spmatrix,
+    y_train: np.ndarray,
+    random_state: int,
+    C: float = 1.0,
+    penalty: str = "l2",
+    solver: str = "liblinear",
 ) -> LogisticRegression:
     """Train the Logistic Regression model."""
     try:
         clf = LogisticRegression(
-            C=1, solver="liblinear", penalty="l2", random_state=random_state
+            C=C,
+            solver=solver,
+            penalty=penalty,
+            max_iter=1000,
+            random_state=random_state,
         )
         clf.fit(x_train, y_train)
         logging.info("Model training completed")
@@ -23,23 +53,276 @@ def train_model(
         raise
 
 
-def main():
+def _fit_parts(
+    clf: SGDClassifier,
+    store_dir,
+    classes: np.ndarray,
+    epochs: int,
+    batch_size: int,
+    random_state: int,
+    rows: np.ndarray | None = None,
+) -> None:
+    """
+    Run ``epochs`` passes of ``partial_fit`` over the feature store, part by part.
+
+    Each part is fed in shuffled mini-batches of ``batch_size`` rows. ``rows`` is an
+    optional boolean mask over the whole store selecting the rows to fit on.
+    """
+    rng = np.random.default_rng(random_state)
+    for epoch in range(epochs):
+        seen = 0
+        offset = 0
+        for x_part, y_part in iter_features(store_dir):
+            selected = np.arange(x_part.shape[0])
+            if rows is not None:
+                selected = np.flatnonzero(rows[offset : offset + x_part.shape[0]])
+            offset += x_part.shape[0]
+            order = rng.permutation(selected)
+            for start in range(0, len(order), batch_size):
+                batch = order[start : start + batch_size]
+                clf.partial_fit(x_part[batch], y_part[batch], classes=classes)
+            seen += len(order)
+        logging.info("Epoch %d/%d done over %d rows", epoch + 1, epochs, seen)
+
+
+def train_incremental(
+    store_dir,
+    random_state: int,
+    epochs: int = 5,
+    batch_size: int = 10000,
+    alpha: float = 0.0001,
+) -> SGDClassifier:
+    """
+    Train a logistic regression with SGD, streaming the feature store part by part.
+
+    Only one feature part is held in memory at a time. Every epoch streams the parts
+    and feeds each one to ``partial_fit`` in shuffled mini-batches of ``batch_size``
+    rows, so memory is bounded by the part size rather than the corpus.
+    """
+    try:
+        clf = SGDClassifier(loss="log_loss", alpha=alpha, random_state=random_state)
+        classes = np.unique(load_feature_labels(store_dir))
+        _fit_parts(clf, store_dir, classes, epochs, batch_size, random_state)
+        logging.info("Incremental model training completed")
+        return clf
+    except Exception as e:
+        logging.error("Error during incremental model training: %s", e)
+        raise
+
+
+def fetch_production_model(model_name: str) -> tuple:
+    """
+    Fetch the current Production model with its vectorizer and training snapshot.
+
+    The snapshot holds the row ids the model was trained on; it is empty when the
+    Production run did not log one.
+    """
+    import mlflow.sklearn
+
+    try:
+        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
+        client = mlflow.MlflowClient()
+        prod_versions = client.get_latest_versions(model_name, stages=["Production"])
+        if not prod_versions:
+            raise ValueError(f"Model {model_name} has no version in Production")
+        version = prod_versions[0]
+
+        model = mlflow.sklearn.load_model(f"models:/{model_name}/{version.version}")
+        vectorizer_dir = mlflow.artifacts.download_artifacts(
+            run_id=version.run_id, artifact_path="vectorizer"
+        )
+        vectorizer = joblib.load(next(Path(vectorizer_dir).glob("*.pkl")))
+        try:
+            snapshot = np.load(
+                mlflow.artifacts.download_artifacts(
+                    run_id=version.run_id,
+                    artifact_path=f"training_snapshot/{TRAINING_SNAPSHOT_PATH.name}",
+                )
+            )
+        except Exception as e:
+            logging.warning("No training snapshot for run %s: %s", version.run_id, e)
+            snapshot = np.empty(0, dtype=np.uint64)
+        logging.info(
+            "Fetched %s version %s (%d trained rows)",
+            model_name,
+            version.version,
+            len(snapshot),
+        )
+        return model, vectorizer, snapshot
+    except Exception as e:
+        logging.error("Error while fetching the production model: %s", e)
+        raise
+
+
+def _feature_space(vectorizer) -> tuple:
+    """Describe the columns a vectorizer produces, so two of them can be compared."""
+    if isinstance(vectorizer, Pipeline):
+        vectorizer = vectorizer[0]
+    if hasattr(vectorizer, "vocabulary_"):
+        return ("count", *vectorizer.get_feature_names_out().tolist())
+    return ("hashing", vectorizer.n_features)
+
+
+def map_coefficients(coef: np.ndarray, source_vectorizer, target_vectorizer):
+    """
+    Re-index coefficients learned on ``source_vectorizer`` columns to the target ones.
+
+    Vocabulary terms keep their learned weight wherever they moved to and terms new to
+    the target start at zero. Hashed columns only carry over with the same
+    ``n_features``.
+    """
+    source = _feature_space(source_vectorizer)
+    target = _feature_space(target_vectorizer)
+    if source == target:
+        return coef.copy()
+    if source[0] != "count" or target[0] != "count":
+        raise ValueError(
+            f"Cannot map coefficients from a {source[0]} vectorizer to a {target[0]} one"
+        )
+    source_index = {term: index for index, term in enumerate(source[1:])}
+    mapped = np.zeros(len(target) - 1, dtype=coef.dtype)
+    for index, term in enumerate(target[1:]):
+        if term in source_index:
+            mapped[index] = coef[source_index[term]]
+    logging.info(
+        "Mapped %d of %d terms from the production vocabulary",
+        sum(term in source_index for term in target[1:]),
+        len(mapped),
+    )
+    return mapped
+
+
+def train_warm_start(
+    store_dir,
+    base_model,
+    base_vectorizer,
+    vectorizer,
+    snapshot: np.ndarray,
+    random_state: int,
+    epochs: int = 5,
+    batch_size: int = 10000,
+    alpha: float = 0.0001,
+    eta0: float = 0.001,
+):
+    """
+    Continue training ``base_model`` on the rows it has not been trained on yet.
+
+    The coefficients are mapped onto the current vectorizer's columns and refined with
+    SGD ``partial_fit`` over only the rows whose ids are not in ``snapshot``. When
+    there are no new rows and the columns are unchanged, the base model is kept as is.
+    Updates use the constant step ``eta0``: the ``optimal`` schedule restarts at its
+    largest steps, which would overwrite the mapped coefficients.
+    """
+    try:
+        new_rows = ~np.isin(load_feature_ids(store_dir), snapshot)
+        logging.info("%d new rows since the last training snapshot", new_rows.sum())
+        same_columns = _feature_space(base_vectorizer) == _feature_space(vectorizer)
+        if not new_rows.any():
+            if same_columns:
+                logging.info("Nothing new to train on; keeping the production model")
+                return base_model
+            raise ValueError("No new rows to train the remapped coefficients on")
+
+        clf = SGDClassifier(
+            loss="log_loss",
+            alpha=alpha,
+            learning_rate="constant",
+            eta0=eta0,
+            random_state=random_state,
+        )
+        # partial_fit continues from coef_ and intercept_ when they are already set
+        clf.coef_ = map_coefficients(
+            base_model.coef_.ravel(), base_vectorizer, vectorizer
+        ).reshape(1, -1)
+        clf.intercept_ = np.asarray(base_model.intercept_, dtype=np.float64).copy()
+        classes = np.union1d(base_model.classes_, load_feature_labels(store_dir))
+        _fit_parts(
+            clf, store_dir, classes, epochs, batch_size, random_state, rows=new_rows
+        )
+        logging.info("Warm-start model training completed")
+        return clf
+    except Exception as e:
+        logging.error("Error during warm-start model training: %s", e)
+        raise
+
+
+def save_training_snapshot(row_ids: np.ndarray) -> None:
+    """Save the sorted, unique ids of every row the model has been trained on."""
     try:
+        TRAINING_SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        np.save(TRAINING_SNAPSHOT_PATH, np.unique(row_ids))
+        logging.info("Training snapshot saved to %s", TRAINING_SNAPSHOT_PATH)
+    except Exception as e:
+        logging.error("Error occurred while saving the training snapshot: %s", e)
+        raise
+
 
-        train_data = load_data(PROCESSED_TRAIN_DATA_FILE)
-        x_train = train_data.iloc[:, :-1].values
-        y_train = train_data.iloc[:, -1].values
+def main():
+    try:
         params_file = PARAMS_FILE.get()
         params = load_params(params_path=params_file)
-        random_state = params["model_training"]["random_state"]
-        model_name = params["model_training"]["model_name"]
+        training_params = params["model_training"]
+        random_state = training_params["random_state"]
+        model_name = training_params["model_name"]
+        mode = training_params.get("mode", "batch")
+        epochs = training_params.get("epochs", 5)
+        batch_size = training_params.get("batch_size", 10000)
+        alpha = training_params.get("alpha", 0.0001)
+        warm_start_eta0 = training_params.get("warm_start_eta0", 0.001)
 
-        clf = train_model(x_train, y_train, random_state)
+        row_ids = load_feature_ids(PROCESSED_TRAIN_FEATURES_DIR)
+        if mode == "warm_start":
+            base_model, base_vectorizer, snapshot = fetch_production_model(model_name)
+            vectorizer = load_model(params["feature_engineering"]["vectorizer_name"])
+            clf = train_warm_start(
+                PROCESSED_TRAIN_FEATURES_DIR,
+                base_model,
+                base_vectorizer,
+                vectorizer,
+                snapshot,
+                random_state,
+                epochs=epochs,
+                batch_size=batch_size,
+                alpha=alpha,
+                eta0=warm_start_eta0,
+            )
+            row_ids = np.union1d(snapshot, row_ids)
+            if clf is base_model:
+                # The stage outputs must exist, so the production model is saved as is
+                # and the later stages register it again as a new version
+                logging.info("Saving the unchanged production model")
+        elif mode == "incremental":
+            clf = train_incremental(
+                PROCESSED_TRAIN_FEATURES_DIR,
+                random_state,
+                epochs=epochs,
+                batch_size=batch_size,
+                alpha=alpha,
+            )
+        elif mode == "batch":
+            # Hyperparameters picked by the model_tuning stage, when it has run
+            best_params = load_best_params(BEST_PARAMS_PATH)
+            x_train, y_train = load_features(PROCESSED_TRAIN_FEATURES_DIR)
+            clf = train_model(
+                x_train,
+                y_train,
+                random_state,
+                C=best_params.get("C", 1.0),
+                penalty=best_params.get("penalty", "l2"),
+                solver=best_params.get("solver", "liblinear"),
+            )
+        else:
+            raise ValueError(
+                f"Unknown training mode {mode!r}, "
+                f"expected one of {', '.join(TRAINING_MODES)}"
+            )
 
         save_model(clf, model_name)
+        save_training_snapshot(row_ids)
     except Exception as e:
         logging.error("Failed to complete the model building process: %s", e)
         print(f"Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
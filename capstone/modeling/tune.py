@@ -0,0 +1,267 @@
+# hyperparameter tuning
+
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import os
+from pathlib import Path
+import sys
+import time
+import warnings
+
+import numpy as np
+from scipy import sparse
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from capstone.config import BEST_PARAMS_PATH, INTERIM_TRAIN_DATA_FILE
+from capstone.environment import MLFLOW_TRACKING_URI, PARAMS_FILE
+from capstone.feature.engineering import build_vectorizer, hash_in_chunks
+from capstone.logger import logging
+from capstone.utils import load_data, load_params
+
+# Penalties each LogisticRegression solver supports
+SOLVER_PENALTIES = {
+    "liblinear": {"l1", "l2"},
+    "lbfgs": {"l2"},
+    "newton-cg": {"l2"},
+    "newton-cholesky": {"l2"},
+    "sag": {"l2"},
+    "saga": {"l1", "l2"},
+}
+
+# train_model's defaults, used for the keys a grid leaves out
+TRAINER_DEFAULTS = {"C": 1.0, "penalty": "l2", "solver": "liblinear"}
+
+# Vectorized folds shared by every worker process, set by _init_worker
+_folds: list[dict] | None = None
+_use_tfidf = False
+_random_state = 42
+
+
+def build_candidates(grid: dict) -> list[dict]:
+    """
+    Expand the parameter grid, dropping solver/penalty pairs that cannot be fit.
+    C, penalty and solver missing from the grid take the trainer's defaults, while a
+    missing max_features keeps the params.yaml value.
+    """
+    keys = ("C", "penalty", "solver", "max_features")
+    values = [grid.get(key, [TRAINER_DEFAULTS.get(key)]) for key in keys]
+    candidates = []
+    for combination in itertools.product(*values):
+        candidate = dict(zip(keys, combination))
+        if candidate["penalty"] not in SOLVER_PENALTIES.get(candidate["solver"], ()):
+            logging.info(
+                "Skipping solver %s with penalty %s",
+                candidate["solver"],
+                candidate["penalty"],
+            )
+            continue
+        candidates.append(candidate)
+    if not candidates:
+        raise ValueError(f"The tuning grid {grid} has no solver/penalty pair that can be fit")
+    return candidates
+
+
+def vectorize_folds(
+    texts: np.ndarray,
+    labels: np.ndarray,
+    feature_params: dict,
+    cv: int,
+    random_state: int,
+) -> list[dict]:
+    """
+    Vectorize every cross-validation fold once for all candidates.
+
+    With the count vectorizer each fold is vectorized with its full vocabulary, along
+    with the term frequencies of its training rows; every ``max_features`` in the grid
+    is then a column subset of it, exactly the vocabulary a
+    ``CountVectorizer(max_features=...)`` fitted on the fold would keep. Hashing is
+    stateless, so all rows are hashed once and split by fold.
+    """
+    vectorizer_type = feature_params.get("vectorizer_type", "count")
+    splits = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    hashed = None
+    if vectorizer_type == "hashing":
+        hasher = build_vectorizer("hashing", n_features=feature_params["n_features"])
+        hashed = hash_in_chunks(
+            hasher,
+            texts,
+            feature_params.get("n_jobs", 1),
+            feature_params.get("chunk_size", 10000),
+        )
+
+    folds = []
+    for train_index, test_index in splits.split(texts, labels):
+        if hashed is not None:
+            x_train, x_test = hashed[train_index], hashed[test_index]
+            term_frequencies = None
+        else:
+            vectorizer = CountVectorizer()
+            x_train = vectorizer.fit_transform(texts[train_index])
+            x_test = vectorizer.transform(texts[test_index])
+            term_frequencies = np.asarray(x_train.sum(axis=0)).ravel()
+        folds.append(
+            {
+                "x_train": sparse.csr_matrix(x_train),
+                "y_train": labels[train_index],
+                "x_test": sparse.csr_matrix(x_test),
+                "y_test": labels[test_index],
+                "term_frequencies": term_frequencies,
+            }
+        )
+    logging.info("Vectorized %d folds with the %s vectorizer", cv, vectorizer_type)
+    return folds
+
+
+def _select_columns(fold: dict, max_features: int | None) -> tuple:
+    """The fold's matrices restricted to its ``max_features`` most frequent terms."""
+    frequencies = fold["term_frequencies"]
+    if frequencies is None or max_features is None or max_features >= len(frequencies):
+        return fold["x_train"], fold["x_test"]
+    # Same selection (and tie-breaking) as CountVectorizer, kept in term order
+    columns = np.sort((-frequencies).argsort()[:max_features])
+    return fold["x_train"][:, columns], fold["x_test"][:, columns]
+
+
+def _init_worker(folds: list[dict], use_tfidf: bool, random_state: int) -> None:
+    """Hold the vectorized folds once per worker process."""
+    global _folds, _use_tfidf, _random_state
+    _folds, _use_tfidf, _random_state = folds, use_tfidf, random_state
+
+
+def evaluate_candidate(candidate: dict) -> dict:
+    """Cross-validate one candidate on the cached folds and return its scores."""
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+    aucs, accuracies = [], []
+    start = time.perf_counter()
+    for fold in _folds:
+        x_train, x_test = _select_columns(fold, candidate["max_features"])
+        if _use_tfidf:
+            tfidf = TfidfTransformer()
+            x_train = tfidf.fit_transform(x_train)
+            x_test = tfidf.transform(x_test)
+        clf = LogisticRegression(
+            C=candidate["C"],
+            penalty=candidate["penalty"],
+            solver=candidate["solver"],
+            max_iter=1000,
+            random_state=_random_state,
+        )
+        clf.fit(x_train, fold["y_train"])
+        aucs.append(roc_auc_score(fold["y_test"], clf.predict_proba(x_test)[:, 1]))
+        accuracies.append(accuracy_score(fold["y_test"], clf.predict(x_test)))
+    return {
+        "params": candidate,
+        "metrics": {
+            "auc_mean": float(np.mean(aucs)),
+            "auc_std": float(np.std(aucs)),
+            "accuracy_mean": float(np.mean(accuracies)),
+            "fit_seconds": time.perf_counter() - start,
+        },
+    }
+
+
+def run_search(
+    candidates: list[dict],
+    folds: list[dict],
+    use_tfidf: bool,
+    random_state: int,
+    n_jobs: int = 1,
+) -> list[dict]:
+    """Evaluate every candidate, across ``n_jobs`` processes (negative: every CPU)."""
+    workers = min(os.cpu_count() if n_jobs < 0 else n_jobs, len(candidates))
+    if workers <= 1:
+        _init_worker(folds, use_tfidf, random_state)
+        return [evaluate_candidate(candidate) for candidate in candidates]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(folds, use_tfidf, random_state),
+    ) as executor:
+        return list(executor.map(evaluate_candidate, candidates))
+
+
+def save_best_params(best: dict, file_path: str | Path) -> None:
+    """Save the winning parameters for the feature engineering and training stages."""
+    try:
+        with open(file_path, "w") as file:
+            # noinspection PyTypeChecker
+            json.dump(best, file, indent=4)
+        logging.info("Best parameters saved to %s", file_path)
+    except Exception as e:
+        logging.error("Error occurred while saving the best parameters: %s", e)
+        raise
+
+
+def log_search(results: list[dict], best: dict, experiment_name: str) -> None:
+    """
+    Log every candidate as a nested MLflow run under one ``model_tuning`` run.
+
+    Best effort: the best parameters are already saved, so an unreachable tracking
+    server only costs the log.
+    """
+    try:
+        import mlflow
+
+        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI.get(not_exists_okay=False))
+        mlflow.set_experiment(experiment_name)
+        with mlflow.start_run(run_name="model_tuning"):
+            for result in results:
+                with mlflow.start_run(nested=True):
+                    mlflow.log_params(result["params"])
+                    mlflow.log_metrics(result["metrics"])
+            mlflow.log_params({f"best_{k}": v for k, v in best["params"].items()})
+            mlflow.log_metrics({f"best_{k}": v for k, v in best["metrics"].items()})
+    except Exception as e:
+        logging.warning("Could not log the search to MLflow: %s", e)
+
+
+def main():
+    try:
+        params = load_params(params_path=PARAMS_FILE.get())
+        tuning_params = params["model_tuning"]
+        feature_params = params["feature_engineering"]
+        random_state = params["model_training"]["random_state"]
+        grid = dict(tuning_params["grid"])
+        if feature_params.get("vectorizer_type", "count") != "count":
+            grid["max_features"] = [None]
+
+        train_data = load_data(INTERIM_TRAIN_DATA_FILE)
+        texts = train_data["review"].fillna("").values
+        labels = train_data["sentiment"].values
+
+        candidates = build_candidates(grid)
+        folds = vectorize_folds(
+            texts,
+            labels,
+            feature_params,
+            tuning_params.get("cv", 3),
+            random_state,
+        )
+        results = run_search(
+            candidates,
+            folds,
+            feature_params.get("use_tfidf", False),
+            random_state,
+            tuning_params.get("n_jobs", 1),
+        )
+        best = max(results, key=lambda result: result["metrics"]["auc_mean"])
+        logging.info("Best candidate %s: %s", best["params"], best["metrics"])
+
+        # A max_features the grid did not vary (None) keeps its params.yaml value
+        best_params = {k: v for k, v in best["params"].items() if v is not None}
+        best_params["auc_mean"] = best["metrics"]["auc_mean"]
+        save_best_params(best_params, BEST_PARAMS_PATH)
+        log_search(results, best, params["model_evaluation"]["experiment_name"])
+    except Exception as e:
+        logging.error("Failed to complete the model tuning process: %s", e)
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
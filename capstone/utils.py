@@ -1,9 +1,15 @@
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+import hashlib
+from itertools import pairwise
 import json
 import os
 from pathlib import Path
 
 import joblib
+import numpy as np
 import pandas as pd
+from scipy import sparse
 import yaml
 
 from capstone.config import MODELS_DIR
@@ -42,17 +48,157 @@ def load_data(data_url: str | Path) -> pd.DataFrame:
         raise
 
 
-def save_data(df: pd.DataFrame, file_path: Path, keep_index: bool = True) -> None:
-    """Save the dataframe to a CSV file."""
+def save_data(
+    df: pd.DataFrame, file_path: Path, keep_index: bool = True, append: bool = False
+) -> None:
+    """Save the dataframe to a CSV file, optionally appending to an existing one."""
     try:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        df.to_csv(file_path, index=keep_index)
+        header = not (append and os.path.exists(file_path))
+        df.to_csv(file_path, index=keep_index, mode="a" if append else "w", header=header)
         logging.info("Data saved to %s", file_path)
     except Exception as e:
         logging.error("Unexpected error occurred while saving the data: %s", e)
         raise
 
 
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """Yield a temporary path next to ``path`` that replaces it once written."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def shard_frame(
+    df: pd.DataFrame, shard_rows: int, salt: str = ""
+) -> list[tuple[str, pd.DataFrame]]:
+    """
+    Split a DataFrame into content-defined shards of about ``shard_rows`` rows.
+
+    The rows are ordered by their content hash and a shard ends after every row whose
+    hash is a multiple of ``shard_rows``, so the shards depend on which rows there are
+    and not on their positions: shuffling the rows changes no shard, and adding or
+    removing rows only changes the shards they fall into. Each shard comes with a key
+    hashing its rows and ``salt``, under which a stage caches what it computed from
+    the shard, and keeps the positions of its rows in ``df`` as its index.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    order = np.argsort(row_hashes, kind="stable")
+    row_hashes = row_hashes[order]
+    ends = np.flatnonzero(row_hashes % shard_rows == 0) + 1
+    bounds = np.unique(np.r_[0, ends, len(df)])
+    rows = df.reset_index(drop=True)
+    shards = []
+    for start, stop in pairwise(bounds):
+        digest = hashlib.blake2b(salt.encode(), digest_size=16)
+        digest.update(row_hashes[start:stop].tobytes())
+        shards.append((digest.hexdigest(), rows.iloc[order[start:stop]]))
+    return shards
+
+
+def prune_cache(cache_dir: Path, keys: Iterable[str]) -> None:
+    """Delete the files of a shard cache that belong to none of ``keys``."""
+    if not Path(cache_dir).is_dir():
+        return
+    keys = set(keys)
+    stale = [path for path in Path(cache_dir).iterdir() if path.name.split(".")[0] not in keys]
+    for path in stale:
+        path.unlink()
+    logging.info("Removed %d stale files from %s", len(stale), cache_dir)
+
+
+def _feature_parts(store_dir: Path) -> list[Path]:
+    """List the CSR parts of a feature store directory in order."""
+    return sorted(Path(store_dir).glob("part-*.npz"))
+
+
+def save_features(
+    x: sparse.spmatrix,
+    y: np.ndarray,
+    store_dir: Path,
+    rows_per_part: int | None = None,
+    row_ids: np.ndarray | None = None,
+) -> None:
+    """
+    Save a feature matrix and its labels to a feature store directory.
+
+    The matrix is written as CSR ``part-NNNNN.npz`` files and the labels as matching
+    ``part-NNNNN.labels.npy`` files, optionally split every ``rows_per_part`` rows.
+    ``row_ids`` (one content hash per row) are stored as ``part-NNNNN.ids.npy``.
+    """
+    try:
+        store_dir = Path(store_dir)
+        os.makedirs(store_dir, exist_ok=True)
+        for stale in store_dir.glob("part-*"):
+            stale.unlink()
+
+        x = sparse.csr_matrix(x)
+        y = np.asarray(y)
+        step = rows_per_part or max(x.shape[0], 1)
+        for part, start in enumerate(range(0, max(x.shape[0], 1), step)):
+            stem = store_dir / f"part-{part:05d}"
+            sparse.save_npz(f"{stem}.npz", x[start : start + step], compressed=False)
+            np.save(f"{stem}.labels.npy", y[start : start + step])
+            if row_ids is not None:
+                np.save(f"{stem}.ids.npy", row_ids[start : start + step])
+        logging.info("Features %s saved to %s", x.shape, store_dir)
+    except Exception as e:
+        logging.error("Unexpected error occurred while saving the features: %s", e)
+        raise
+
+
+def iter_features(
+    store_dir: Path,
+) -> Iterator[tuple[sparse.csr_matrix, np.ndarray]]:
+    """Yield ``(features, labels)`` for each part of a feature store, in order."""
+    parts = _feature_parts(store_dir)
+    if not parts:
+        logging.error("No feature parts found in %s", store_dir)
+        raise FileNotFoundError(f"No feature parts found in {store_dir}")
+    for part in parts:
+        labels = part.with_name(part.name.replace(".npz", ".labels.npy"))
+        yield sparse.load_npz(part).tocsr(), np.load(labels)
+
+
+def _load_part_arrays(store_dir: Path, suffix: str) -> np.ndarray:
+    """Concatenate the ``part-NNNNN<suffix>`` arrays of a feature store in order."""
+    parts = _feature_parts(store_dir)
+    if not parts:
+        logging.error("No feature parts found in %s", store_dir)
+        raise FileNotFoundError(f"No feature parts found in {store_dir}")
+    return np.concatenate(
+        [np.load(part.with_name(part.name.replace(".npz", suffix))) for part in parts]
+    )
+
+
+def load_feature_labels(store_dir: Path) -> np.ndarray:
+    """Load only the labels of a feature store, without reading any feature part."""
+    return _load_part_arrays(store_dir, ".labels.npy")
+
+
+def load_feature_ids(store_dir: Path) -> np.ndarray:
+    """Load the row ids of a feature store, without reading any feature part."""
+    return _load_part_arrays(store_dir, ".ids.npy")
+
+
+def load_features(store_dir: Path) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Load a whole feature store as one CSR matrix and one label array."""
+    try:
+        xs, ys = zip(*iter_features(store_dir))
+        x = sparse.vstack(xs, format="csr")
+        y = np.concatenate(ys)
+        logging.info("Features %s loaded from %s", x.shape, store_dir)
+        return x, y
+    except Exception as e:
+        logging.error("Unexpected error occurred while loading the features: %s", e)
+        raise
+
+
 def get_model_path():
     """Get the path to the model directory."""
     try:
@@ -68,7 +214,6 @@ def get_model_path():
 def save_model(model, model_name: str) -> None:
     """Save the trained model to a file."""
     try:
-
         model_path = get_model_path() / f"{model_name}.pkl"
         joblib.dump(model, model_path)
         logging.info("Model saved to %s", model_path)
@@ -92,6 +237,35 @@ def load_model(model_name: str | Path):
         raise
 
 
+def load_best_params(file_path: str | Path) -> dict:
+    """Load the parameters chosen by the tuning stage, or ``{}`` if it has not run."""
+    if not Path(file_path).exists():
+        return {}
+    try:
+        with open(file_path, "r") as file:
+            best_params = json.load(file)
+        logging.info("Tuned parameters loaded from %s", file_path)
+        return best_params
+    except Exception as e:
+        logging.error("Unexpected error occurred while loading the parameters: %s", e)
+        raise
+
+
+def load_metrics(file_path: str | Path) -> dict:
+    """Load the evaluation metrics from a JSON file."""
+    try:
+        with open(file_path, "r") as file:
+            metrics = json.load(file)
+        logging.debug("Metrics loaded from %s", file_path)
+        return metrics
+    except FileNotFoundError:
+        logging.error("File not found: %s", file_path)
+        raise
+    except Exception as e:
+        logging.error("Unexpected error occurred while loading the metrics: %s", e)
+        raise
+
+
 def load_model_info(file_path: str | Path) -> dict:
     """Load the model info from a JSON file."""
     try:
@@ -0,0 +1,28 @@
+"""Serve the benchmark stand-in model in tests when no model source is configured."""
+
+import atexit
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+
+def use_standin_model():
+    """
+    Point brainserve at a local stand-in model unless a model or registry is set.
+
+    Must run before ``brainserve.serving`` is imported, since it loads the model at
+    import. With ``MODEL_URI`` or ``MLFLOW_TRACKING_URI`` in the environment the tests
+    use that model instead. Workers do not sync to the shared model refs in the
+    background; the tests that need it call ``sync_model_versions`` themselves.
+    """
+    os.environ.setdefault("MODEL_SYNC_INTERVAL", "0")
+    if "MODEL_URI" in os.environ or "MLFLOW_TRACKING_URI" in os.environ:
+        return
+    from benchmarks.standin import build_standin, synthetic_reviews
+
+    output_dir = Path(tempfile.mkdtemp(prefix="brainserve-test-"))
+    atexit.register(shutil.rmtree, output_dir, ignore_errors=True)
+    model_dir, vectorizer_path, _ = build_standin(synthetic_reviews(200), output_dir)
+    os.environ["MODEL_URI"] = str(model_dir)
+    os.environ["VECTORIZER_PATH"] = str(vectorizer_path)
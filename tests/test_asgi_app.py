@@ -0,0 +1,40 @@
+import unittest
+
+from standin_model import use_standin_model
+from starlette.testclient import TestClient
+
+use_standin_model()
+
+from brainserve.asgi import app
+
+
+class AsgiAppTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = self.enterContext(TestClient(app))
+
+    def test_predict_page(self):
+        response = self.client.post("/predict", data={"text": "I love this!"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            b"Positive" in response.content or b"Negative" in response.content
+        )
+
+    def test_predict_page_rejects_a_missing_text(self):
+        response = self.client.post("/predict", data={"review": "I love this!"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("text", response.json()["error"])
+
+    def test_predict_batch(self):
+        texts = ["I love this!", "This was a terrible movie."]
+        response = self.client.post("/v1/predict/batch", json=texts)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["predictions"]), len(texts))
+
+    def test_predict_batch_rejects_invalid_payload(self):
+        response = self.client.post("/v1/predict/batch", json={"texts": "not a list"})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+
+from brainserve.batching import MicroBatcher
+
+
+class MicroBatcherTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.calls = []
+        self.keys = []
+
+        def predict_fn(texts, keys):
+            self.calls.append(list(texts))
+            self.keys.append(list(keys))
+            return [len(text) for text in texts], [0.5] * len(texts)
+
+        self.batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=50)
+        await self.batcher.start()
+
+    async def asyncTearDown(self):
+        await self.batcher.stop()
+
+    async def test_concurrent_requests_share_one_call(self):
+        results = await asyncio.gather(
+            self.batcher.submit(["a"]), self.batcher.submit(["bb", "ccc"])
+        )
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results[0], ([1], [0.5]))
+        self.assertEqual(results[1], ([2, 3], [0.5, 0.5]))
+
+    async def test_every_text_carries_the_key_of_its_request(self):
+        await asyncio.gather(
+            self.batcher.submit(["a"], "user-1"), self.batcher.submit(["b", "c"])
+        )
+        self.assertEqual(self.keys, [["user-1", None, None]])
+
+    async def test_batches_are_capped_at_max_batch_size(self):
+        await asyncio.gather(*(self.batcher.submit(["x", "y"]) for _ in range(4)))
+        self.assertTrue(all(len(call) <= 4 for call in self.calls))
+        self.assertEqual(sum(len(call) for call in self.calls), 8)
+
+    async def test_requests_that_do_not_fit_open_the_next_batch(self):
+        results = await asyncio.gather(
+            self.batcher.submit(["a", "b", "c"]),
+            self.batcher.submit(["dd", "ee", "ff"]),
+            self.batcher.submit(["g"]),
+        )
+        self.assertEqual(self.calls, [["a", "b", "c"], ["dd", "ee", "ff", "g"]])
+        self.assertEqual(results[1], ([2, 2, 2], [0.5] * 3))
+        self.assertEqual(results[2], ([1], [0.5]))
+
+    async def test_oversized_request_is_scored_alone(self):
+        await asyncio.gather(
+            self.batcher.submit(["a"]), self.batcher.submit(list("bcdefg"))
+        )
+        self.assertEqual(self.calls, [["a"], list("bcdefg")])
+
+
+if __name__ == "__main__":
+    unittest.main()
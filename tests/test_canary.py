@@ -0,0 +1,59 @@
+import unittest
+from unittest import mock
+
+from standin_model import use_standin_model
+
+use_standin_model()
+
+from brainserve import serving
+from brainserve.app import app
+
+REVIEWS = [f"review number {i} was great" for i in range(400)]
+
+
+class CanaryRoutingTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.test_client()
+
+    def setUp(self):
+        canary = serving.current_model()._replace(version="canary")
+        for patcher in (
+            mock.patch.object(serving, "_canary", canary),
+            mock.patch.object(serving, "canary_percent", 25.0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_routes_the_configured_share_to_the_canary(self):
+        share = sum(map(serving.routes_to_canary, REVIEWS)) / len(REVIEWS)
+        self.assertAlmostEqual(share, 0.25, delta=0.06)
+
+    def test_routing_does_not_depend_on_batching(self):
+        _, _, together = serving.predict_texts(REVIEWS)
+        alone = [serving.predict_texts([text])[2][0] for text in REVIEWS[:50]]
+        self.assertEqual(together[:50], alone)
+        self.assertEqual(set(together), {serving.current_model().version, "canary"})
+
+    def test_a_routing_key_sends_the_whole_request_one_way(self):
+        canary_key = next(
+            key for key in map(str, range(1000)) if serving.routes_to_canary(key)
+        )
+        for _ in range(3):
+            response = self.client.post(
+                "/v1/predict/batch",
+                json=REVIEWS[:20],
+                headers={"X-Routing-Key": canary_key},
+            )
+            self.assertEqual(response.get_json()["model_version"], "canary")
+
+    def test_no_canary_traffic_without_a_share(self):
+        with mock.patch.object(serving, "canary_percent", 0.0):
+            self.assertFalse(any(map(serving.routes_to_canary, REVIEWS)))
+        with mock.patch.object(serving, "_canary", None):
+            self.assertFalse(any(map(serving.routes_to_canary, REVIEWS)))
+
+
+if __name__ == "__main__":
+    unittest.main()
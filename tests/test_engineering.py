@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from capstone.feature import engineering
+from capstone.feature.engineering import apply_bow, build_vectorizer
+
+TEXTS = [
+    "great movie loved the acting",
+    "terrible plot boring movie",
+    "wonderful story great music",
+    "awful acting waste of time",
+]
+
+VECTORIZER_PARAMS = (
+    {"vectorizer_type": "count"},
+    {"vectorizer_type": "hashing", "n_features": 2**10},
+    {"vectorizer_type": "hashing", "n_features": 2**10, "use_tfidf": True},
+)
+
+
+def reviews(n_rows):
+    return pd.DataFrame(
+        {
+            "review": [TEXTS[i % len(TEXTS)] for i in range(n_rows)],
+            "sentiment": [1, 0, 1, 0] * (n_rows // 4),
+        }
+    )
+
+
+class ApplyBowTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(engineering, "save_model")
+        self.save_model = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.train = reviews(40)
+        self.test = reviews(8)
+
+    def test_returns_sparse_features_of_a_full_fit(self):
+        for params in VECTORIZER_PARAMS:
+            with self.subTest(**params):
+                x_train, y_train, x_test, y_test = apply_bow(
+                    self.train, self.test, 10, "vectorizer", **params, chunk_size=16
+                )
+                self.assertTrue(sparse.issparse(x_train))
+                self.assertTrue(sparse.issparse(x_test))
+                expected = build_vectorizer(max_features=10, **params)
+                np.testing.assert_allclose(
+                    x_train.toarray(),
+                    expected.fit_transform(self.train["review"]).toarray(),
+                )
+                np.testing.assert_allclose(
+                    x_test.toarray(), expected.transform(self.test["review"]).toarray()
+                )
+                np.testing.assert_array_equal(y_train, self.train["sentiment"])
+                np.testing.assert_array_equal(y_test, self.test["sentiment"])
+                self.save_model.assert_called_with(mock.ANY, "vectorizer")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from capstone.data import pre_process
+from capstone.feature.engineering import build_vectorizer, vectorize_shards
+from capstone.utils import shard_frame
+
+WORDS = ["great", "movie", "acting", "terrible", "plot", "music", "story", "boring"]
+
+VECTORIZER_PARAMS = (
+    {"vectorizer_type": "count", "max_features": 5},
+    {"vectorizer_type": "hashing", "n_features": 2**10, "use_tfidf": True},
+)
+
+
+def make_texts(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.Series(
+        [" ".join(rng.choice(WORDS, size=rng.integers(0, 8))) for _ in range(n_rows)]
+    )
+
+
+def shuffle(texts, seed):
+    return texts.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class FeatureShardTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = Path(self.tmp.name)
+        self.train = make_texts(500, seed=0)
+        self.test = make_texts(100, seed=1)
+
+    def vectorize(self, params, train):
+        return vectorize_shards(
+            build_vectorizer(**params), train, self.test, self.cache_dir, shard_rows=20
+        )
+
+    def cached_files(self):
+        return {path.name: path.stat().st_mtime_ns for path in self.cache_dir.iterdir()}
+
+    def test_shards_do_not_depend_on_row_order(self):
+        before = {key for key, _ in shard_frame(self.train.to_frame(), 20)}
+        shuffled = shuffle(self.train, seed=3)
+        self.assertEqual(
+            {key for key, _ in shard_frame(shuffled.to_frame(), 20)}, before
+        )
+        # Each new row changes at most the one shard it falls into
+        appended = shuffle(pd.concat([shuffled, make_texts(5, seed=2)]), seed=4)
+        after = {key for key, _ in shard_frame(appended.to_frame(), 20)}
+        self.assertGreaterEqual(len(before & after), len(before) - 5)
+
+    def test_shards_keep_the_positions_of_their_rows(self):
+        frame = self.train.to_frame()
+        shards = [shard for _, shard in shard_frame(frame, 20)]
+        restored = pd.concat(shards).sort_index()
+        pd.testing.assert_frame_equal(restored, frame)
+
+    def test_matches_a_full_fit(self):
+        for params in VECTORIZER_PARAMS:
+            with self.subTest(**params):
+                expected = build_vectorizer(**params)
+                x_train = expected.fit_transform(self.train.values)
+                x_test = expected.transform(self.test.values)
+                vectorizer, shard_train, shard_test = self.vectorize(params, self.train)
+                np.testing.assert_allclose(shard_train.toarray(), x_train.toarray())
+                np.testing.assert_allclose(shard_test.toarray(), x_test.toarray())
+                np.testing.assert_allclose(
+                    vectorizer.transform(self.test.values).toarray(),
+                    shard_test.toarray(),
+                )
+
+    def test_reuses_cached_shards_of_reshuffled_rows(self):
+        for params in VECTORIZER_PARAMS:
+            with self.subTest(**params):
+                self.vectorize(params, self.train)
+                cached = self.cached_files()
+                # A fresh split of more rows: every row moves
+                appended = pd.concat([self.train, make_texts(5, seed=2)])
+                appended = shuffle(appended, seed=5)
+                _, x_train, _ = self.vectorize(params, appended)
+                after = self.cached_files()
+                kept = [name for name in cached if after.get(name) == cached[name]]
+                self.assertGreater(len(kept), len(cached) // 2)
+                expected = build_vectorizer(**params).fit_transform(appended.values)
+                np.testing.assert_allclose(x_train.toarray(), expected.toarray())
+
+
+class PreprocessShardTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        for patcher in (
+            mock.patch.object(pre_process, "ensure_corpora"),
+            mock.patch.object(
+                pre_process,
+                "normalize_texts",
+                side_effect=lambda texts, *args: [text.upper() for text in texts],
+            ),
+        ):
+            self.normalize = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def preprocess(self, texts):
+        src = self.dir / "reviews.csv"
+        pd.DataFrame({"review": texts, "sentiment": 1}).to_csv(src, index=False)
+        dst = self.dir / "processed.csv"
+        pre_process.preprocess_file(
+            src, dst, cache_dir=self.dir / "cache", shard_rows=20
+        )
+        return pd.read_csv(dst, keep_default_na=False)
+
+    def test_keeps_the_order_of_the_file(self):
+        texts = make_texts(300, seed=0) + " film"
+        processed = self.preprocess(texts)
+        self.assertEqual(processed["review"].tolist(), texts.str.upper().tolist())
+
+    def test_normalizes_only_new_shards_after_a_reshuffle(self):
+        texts = make_texts(300, seed=0) + " film"
+        self.preprocess(texts)
+        appended = shuffle(pd.concat([texts, make_texts(3, seed=6) + " new"]), seed=7)
+        processed = self.preprocess(appended)
+        self.assertEqual(processed["review"].tolist(), appended.str.upper().tolist())
+        rows_normalized = [len(call.args[0]) for call in self.normalize.call_args_list]
+        self.assertLess(rows_normalized[1], len(appended) // 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
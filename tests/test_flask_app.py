@@ -1,6 +1,16 @@
 import unittest
+from unittest import mock
 
+import numpy as np
+from prometheus_client import CONTENT_TYPE_LATEST
+from scipy import sparse
+from standin_model import use_standin_model
+
+use_standin_model()
+
+from brainserve import serving
 from brainserve.app import app
+from brainserve.metrics import set_model_versions
 
 
 class FlaskAppTests(unittest.TestCase):
@@ -22,6 +32,55 @@ class FlaskAppTests(unittest.TestCase):
             "Response should contain either 'Positive' or 'Negative'",
         )
 
+    def test_predict_batch(self):
+        texts = ["I love this!", "This was a terrible movie."]
+        response = self.client.post("/v1/predict/batch", json={"texts": texts})
+        self.assertEqual(response.status_code, 200)
+        predictions = response.get_json()["predictions"]
+        self.assertEqual(len(predictions), len(texts))
+        for prediction in predictions:
+            self.assertIn(prediction["label"], (0, 1))
+            self.assertTrue(0.0 <= prediction["probability"] <= 1.0)
+
+    def test_predict_batch_rejects_invalid_payload(self):
+        response = self.client.post("/v1/predict/batch", json={"texts": "not a list"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_metrics_report_stages_and_inputs(self):
+        self.client.post("/v1/predict/batch", json={"texts": ["I love this!"]})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], CONTENT_TYPE_LATEST)
+        body = response.get_data(as_text=True)
+        for stage in ("normalize", "vectorize", "predict"):
+            self.assertIn(f'app_stage_latency_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn("model_input_tokens_count", body)
+        self.assertIn(
+            'app_request_count_total{endpoint="/v1/predict/batch",method="POST"}', body
+        )
+
+    def test_metrics_report_only_the_held_model_versions(self):
+        self.addCleanup(serving.publish_model_version)
+        set_model_versions("1", previous="0")
+        set_model_versions("2", previous="1")
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('model_version_info{role="current",version="2"} 1.0', body)
+        self.assertIn('model_version_info{role="previous",version="1"} 1.0', body)
+        self.assertNotIn('version="0"', body)
+
+
+class ScoreTextsTests(unittest.TestCase):
+
+    def test_scores_the_sparse_features(self):
+        served = serving.current_model()
+        model = mock.Mock(wraps=served.model, classes_=served.model.classes_)
+        texts = ["love great movie", "terrible boring plot"]
+        labels, probabilities = serving.score_texts(served._replace(model=model), texts)
+        features = model.predict_proba.call_args.args[0]
+        self.assertTrue(sparse.issparse(features))
+        np.testing.assert_array_equal(labels, served.model.predict(features))
+        self.assertEqual(probabilities.shape, (2,))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,55 @@
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from capstone.data import ingest
+
+
+def raw_chunk(start, n_rows):
+    sentiments = ["positive", "negative", "neutral"]
+    return pd.DataFrame(
+        {
+            "review": [f"review {i}" for i in range(start, start + n_rows)],
+            "sentiment": [sentiments[i % 3] for i in range(start, start + n_rows)],
+        }
+    )
+
+
+class SplitAndSaveChunksTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.raw_dir = Path(tmp.name)
+        patcher = mock.patch.object(ingest, "RAW_DATA_DIR", self.raw_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, name):
+        return pd.read_csv(self.raw_dir / name)
+
+    def test_appends_every_chunk_to_the_splits(self):
+        chunks = [raw_chunk(0, 30), raw_chunk(30, 30), raw_chunk(60, 3)]
+        ingest.split_and_save_chunks(iter(chunks), test_size=0.25)
+        train, test = self.read("train.csv"), self.read("test.csv")
+        self.assertEqual(list(train.columns), ["review", "sentiment"])
+        self.assertEqual((len(train), len(test)), (31, 11))
+        expected = ingest.preprocess_data(pd.concat(chunks))
+        self.assertCountEqual(
+            pd.concat([train, test])["review"].tolist(), expected["review"].tolist()
+        )
+        self.assertTrue(set(pd.concat([train, test])["sentiment"]) <= {0, 1})
+
+    def test_replaces_the_splits_of_an_earlier_run(self):
+        ingest.split_and_save_chunks([raw_chunk(0, 30)], test_size=0.25)
+        # A chunk too small to split goes to training
+        ingest.split_and_save_chunks([raw_chunk(1, 2)], test_size=0.25)
+        self.assertEqual(self.read("train.csv")["review"].tolist(), ["review 1"])
+        self.assertEqual(len(self.read("test.csv")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
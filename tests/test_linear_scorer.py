@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from brainserve.linear_scorer import LinearScorer
+from capstone.feature.engineering import build_vectorizer
+from capstone.modeling.export import export_linear_scorer
+
+TEXTS = [
+    "great movie loved the acting",
+    "terrible plot boring movie",
+    "wonderful story great music",
+    "awful acting waste of time",
+] * 5
+LABELS = [1, 0, 1, 0] * 5
+
+
+class LinearScorerTests(unittest.TestCase):
+
+    vectorizer_params = {"vectorizer_type": "count", "max_features": 10}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.vectorizer = build_vectorizer(**cls.vectorizer_params)
+        cls.clf = LogisticRegression().fit(cls.vectorizer.fit_transform(TEXTS), LABELS)
+        cls.output_dir = tempfile.TemporaryDirectory()
+        export_linear_scorer(cls.clf, cls.vectorizer, cls.output_dir.name)
+        cls.scorer = LinearScorer(cls.output_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.output_dir.cleanup()
+
+    def test_matches_vectorizer_and_classifier(self):
+        texts = [
+            "Great MOVIE, great music!",
+            "boring",
+            "",
+            "unknown words only",
+            "greatest movies",
+        ]
+        expected = self.vectorizer.transform(texts)
+        features = self.scorer.transform(texts)
+        np.testing.assert_allclose(features.toarray(), expected.toarray())
+        np.testing.assert_allclose(
+            self.scorer.predict_proba(features), self.clf.predict_proba(expected)
+        )
+        np.testing.assert_array_equal(
+            self.scorer.predict(features), self.clf.predict(expected)
+        )
+
+    def test_fixed_vocabulary_in_any_order(self):
+        vectorizer = CountVectorizer(vocabulary=["movie", "acting", "great", "awful"])
+        features = vectorizer.transform(TEXTS)
+        clf = LogisticRegression().fit(features, LABELS)
+        with tempfile.TemporaryDirectory() as output_dir:
+            export_linear_scorer(clf, vectorizer, output_dir)
+            scorer = LinearScorer(output_dir)
+            np.testing.assert_allclose(
+                scorer.transform(TEXTS).toarray(), features.toarray()
+            )
+
+    def test_rejects_multiclass_models(self):
+        clf = LogisticRegression().fit(
+            self.vectorizer.transform(["great", "awful", "movie"]), [0, 1, 2]
+        )
+        with tempfile.TemporaryDirectory() as output_dir:
+            with self.assertRaises(ValueError):
+                export_linear_scorer(clf, self.vectorizer, output_dir)
+
+
+class HashingTfidfLinearScorerTests(LinearScorerTests):
+
+    vectorizer_params = {
+        "vectorizer_type": "hashing",
+        "n_features": 2**10,
+        "use_tfidf": True,
+    }
+
+
+if __name__ == "__main__":
+    unittest.main()
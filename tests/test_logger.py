@@ -0,0 +1,42 @@
+import logging
+from pathlib import Path
+import tempfile
+import unittest
+
+from benchmarks.imports import STAGES, measure
+
+from capstone.logger import LazyRotatingFileHandler
+
+
+class LazyRotatingFileHandlerTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log_path = Path(tmp.name, "logs", "run.log")
+
+    def test_creates_the_log_on_the_first_record(self):
+        handler = LazyRotatingFileHandler(self.log_path, maxBytes=1024, backupCount=1)
+        self.addCleanup(handler.close)
+        self.assertFalse(self.log_path.parent.exists())
+        handler.emit(logging.makeLogRecord({"msg": "first record"}))
+        handler.flush()
+        self.assertEqual(self.log_path.read_text(), "first record\n")
+
+    def test_closing_an_unused_handler_leaves_no_file(self):
+        LazyRotatingFileHandler(self.log_path).close()
+        self.assertFalse(self.log_path.parent.exists())
+
+
+class StageImportTests(unittest.TestCase):
+
+    def test_stages_import_only_the_heavy_modules_they_use(self):
+        for module in ("capstone.config", "capstone.data.pre_process"):
+            with self.subTest(module=module):
+                self.assertLessEqual(
+                    set(measure(module)["loaded"]), set(STAGES[module])
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+from sklearn import metrics
+
+from capstone.modeling.metrics import (
+    bootstrap_metrics,
+    classification_metrics,
+    precision_recall_curve,
+)
+
+
+class MetricsTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.positives = rng.random(500) < 0.4
+        # Rounded so that many scores tie
+        cls.scores = np.round(0.3 * cls.positives + 0.7 * rng.random(500), 2)
+
+    def test_matches_scikit_learn(self):
+        result = classification_metrics(self.positives, self.scores)
+        predicted = self.scores > 0.5
+        expected = {
+            "accuracy": metrics.accuracy_score(self.positives, predicted),
+            "precision": metrics.precision_score(self.positives, predicted),
+            "recall": metrics.recall_score(self.positives, predicted),
+            "auc": metrics.roc_auc_score(self.positives, self.scores),
+        }
+        for name, value in expected.items():
+            self.assertAlmostEqual(result[name], value, places=12, msg=name)
+
+    def test_precision_recall_curve_matches_scikit_learn(self):
+        thresholds, precision, recall = precision_recall_curve(
+            self.positives, self.scores
+        )
+        expected_precision, expected_recall, expected_thresholds = (
+            metrics.precision_recall_curve(self.positives, self.scores)
+        )
+        np.testing.assert_allclose(thresholds[::-1], expected_thresholds)
+        np.testing.assert_allclose(precision[::-1], expected_precision[:-1])
+        np.testing.assert_allclose(recall[::-1], expected_recall[:-1])
+
+    def test_bootstrap_intervals_contain_the_point_estimates(self):
+        point = classification_metrics(self.positives, self.scores)
+        intervals = bootstrap_metrics(
+            self.positives, self.scores, n_resamples=200, random_state=0
+        )
+        for name, (low, high) in intervals.items():
+            self.assertLess(low, high, msg=name)
+            self.assertTrue(low <= point[name] <= high, msg=name)
+
+    def test_bootstrap_matches_resampling_row_by_row(self):
+        n_resamples = 50
+        intervals = bootstrap_metrics(
+            self.positives, self.scores, n_resamples=n_resamples, random_state=1
+        )
+        # The same draws, one resample at a time over the rows sorted by score
+        order = np.argsort(self.scores, kind="mergesort")
+        positives, scores = self.positives[order], self.scores[order]
+        draws = np.random.default_rng(1).integers(
+            0, len(scores), size=(n_resamples, len(scores))
+        )
+        resampled = [classification_metrics(positives[i], scores[i]) for i in draws]
+        for name, (low, high) in intervals.items():
+            values = [metrics[name] for metrics in resampled]
+            expected = np.percentile(values, [2.5, 97.5])
+            np.testing.assert_allclose((low, high), expected, err_msg=name)
+
+    def test_bootstrap_does_not_depend_on_the_block_size(self):
+        expected = bootstrap_metrics(
+            self.positives, self.scores, n_resamples=30, random_state=2
+        )
+        blocked = bootstrap_metrics(
+            self.positives,
+            self.scores,
+            n_resamples=30,
+            random_state=2,
+            max_block_cells=7 * len(self.scores),
+        )
+        for name, interval in expected.items():
+            np.testing.assert_allclose(blocked[name], interval, err_msg=name)
+
+    def test_bootstrap_intervals_widen_with_the_confidence(self):
+        narrow, wide = (
+            bootstrap_metrics(
+                self.positives,
+                self.scores,
+                n_resamples=200,
+                confidence=confidence,
+                random_state=0,
+            )
+            for confidence in (0.5, 0.99)
+        )
+        for name, (low, high) in narrow.items():
+            self.assertLessEqual(wide[name][0], low, msg=name)
+            self.assertGreaterEqual(wide[name][1], high, msg=name)
+
+
+if __name__ == "__main__":
+    unittest.main()
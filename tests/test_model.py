@@ -2,11 +2,11 @@ import pickle
 import unittest
 
 import mlflow
-import pandas as pd
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 
+from capstone.config import PROCESSED_TEST_FEATURES_DIR
 from capstone.environment import MLFLOW_TRACKING_URI, PARAMS_FILE
-from capstone.utils import load_params
+from capstone.utils import load_features, load_params
 
 
 class TestModelLoading(unittest.TestCase):
@@ -29,7 +29,7 @@ class TestModelLoading(unittest.TestCase):
         cls.vectorizer = pickle.load(open("models/vectorizer.pkl", "rb"))
 
         # Load holdout test data
-        cls.holdout_data = pd.read_csv("data/processed/test_bow.csv")
+        cls.x_holdout, cls.y_holdout = load_features(PROCESSED_TEST_FEATURES_DIR)
 
     @staticmethod
     def get_latest_model_version(model_name, stage="Staging"):
@@ -44,28 +44,24 @@ class TestModelLoading(unittest.TestCase):
         # Create a dummy input for the model based on expected input shape
         input_text = "hi how are you"
         input_data = self.vectorizer.transform([input_text])
-        input_df = pd.DataFrame(
-            input_data.toarray(), columns=[str(i) for i in range(input_data.shape[1])]
-        )
 
-        # Predict using the new model to verify the input and output shapes
-        prediction = self.new_model.predict(input_df)
+        # Predict on the sparse matrix to verify the input and output shapes
+        prediction = self.new_model.predict(input_data)
 
         # Verify the input shape
         self.assertEqual(
-            input_df.shape[1], len(self.vectorizer.get_feature_names_out())
+            input_data.shape[1], len(self.vectorizer.get_feature_names_out())
         )
 
         # Verify the output shape (assuming binary classification with a single output)
-        self.assertEqual(len(prediction), input_df.shape[0])
+        self.assertEqual(len(prediction), input_data.shape[0])
         self.assertEqual(
             len(prediction.shape), 1
         )  # Assuming a single output column for binary classification
 
     def test_model_performance(self):
-        # Extract features and labels from holdout test data
-        x_holdout = self.holdout_data.iloc[:, 0:-1]
-        y_holdout = self.holdout_data.iloc[:, -1]
+        x_holdout = self.x_holdout
+        y_holdout = self.y_holdout
 
         # Predict using the new model
         y_pred_new = self.new_model.predict(x_holdout)
@@ -0,0 +1,137 @@
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from brainserve import model_cache
+from brainserve.model_cache import ModelCache
+from capstone.feature.engineering import build_vectorizer
+from capstone.modeling.export import export_linear_scorer
+
+TEXTS = ["great movie", "terrible plot", "wonderful story", "awful acting"] * 5
+LABELS = [1, 0, 1, 0] * 5
+
+
+class ModelCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.vectorizer = build_vectorizer(vectorizer_type="count", max_features=10)
+        self.clf = LogisticRegression().fit(
+            self.vectorizer.fit_transform(TEXTS), LABELS
+        )
+        self.vectorizer_path = self.dir / "vectorizer.pkl"
+        joblib.dump(self.vectorizer, self.vectorizer_path)
+        self.cache = ModelCache(self.dir / "cache", "model")
+        patchers = {
+            "load_model": mock.patch.object(
+                model_cache.mlflow.sklearn, "load_model", return_value=self.clf
+            ),
+            "download_artifacts": mock.patch.object(
+                model_cache.mlflow.artifacts,
+                "download_artifacts",
+                return_value=str(self.dir),
+            ),
+        }
+        for patcher in (
+            mock.patch.object(model_cache.mlflow, "MlflowClient"),
+            mock.patch("builtins.print"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name, patcher in patchers.items():
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def assert_serves_the_model(self, model, vectorizer):
+        features = vectorizer.transform(TEXTS)
+        np.testing.assert_array_equal(
+            model.predict(features), self.clf.predict(features)
+        )
+
+    def test_fetches_a_version_only_once(self):
+        self.assertIsNone(self.cache.bundle_path("3"))
+        self.assert_serves_the_model(*self.cache.load("3"))
+        self.assert_serves_the_model(*self.cache.load("3"))
+        self.load_model.assert_called_once_with("models:/model/3")
+        self.assertIsNotNone(self.cache.bundle_path("3"))
+        self.assertEqual(self.cache.latest_version(), "3")
+
+    def test_loads_a_canary_without_recording_it_as_latest(self):
+        self.cache.load("3")
+        self.cache.load("4", latest=False)
+        self.assertEqual(self.cache.latest_version(), "3")
+
+    def test_versions_with_the_same_artifacts_share_one_bundle(self):
+        self.cache.load("3")
+        self.cache.load("4")
+        self.assertEqual(self.cache.bundle_path("3"), self.cache.bundle_path("4"))
+        self.assertEqual(len(list((self.dir / "cache" / "objects").iterdir())), 1)
+
+    def test_falls_back_to_the_local_vectorizer(self):
+        self.download_artifacts.side_effect = OSError("no vectorizer artifact")
+        with self.assertRaises(OSError):
+            self.cache.load("3")
+        cache = ModelCache(self.dir / "cache", "model", self.vectorizer_path)
+        self.assert_serves_the_model(*cache.load("3"))
+
+
+class LinearScorerFetchTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        vectorizer = build_vectorizer(vectorizer_type="count", max_features=10)
+        clf = LogisticRegression().fit(vectorizer.fit_transform(TEXTS), LABELS)
+        self.exported = self.dir / "exported"
+        export_linear_scorer(clf, vectorizer, self.exported)
+        self.cache = ModelCache(self.dir / "cache", "model")
+        self.downloads = 0
+        self.replace = model_cache.os.replace
+        for patcher in (
+            mock.patch.object(model_cache.os, "replace", side_effect=self.fill_first),
+            mock.patch.object(model_cache.mlflow, "MlflowClient"),
+            mock.patch.object(
+                model_cache.mlflow.artifacts,
+                "download_artifacts",
+                side_effect=self.download_artifacts,
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def download_artifacts(self, run_id, artifact_path, dst_path):
+        self.downloads += 1
+        return shutil.copytree(self.exported, Path(dst_path, artifact_path))
+
+    def fill_first(self, src, dst):
+        if self.downloads == 1:
+            # A second worker stores the same arrays just before this one does
+            self.cache._fetch_linear_scorer("1")
+        self.replace(src, dst)
+
+    def test_a_concurrent_fill_of_the_same_key_succeeds(self):
+        with mock.patch("builtins.print"):
+            scorer, _ = self.cache.load("1", engine="linear")
+        self.assertEqual(self.downloads, 2)
+        self.assertEqual(
+            scorer.predict_proba(scorer.transform(["great movie"])).shape, (1, 2)
+        )
+        self.assertEqual(
+            self.cache.bundle_path("1", engine="linear"),
+            next((self.dir / "cache" / "objects").glob("*/linear_scorer")),
+        )
+        # Only the stored arrays are left, no temporary download directories
+        self.assertEqual(len(list((self.dir / "cache" / "objects").iterdir())), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from capstone.data import pre_process
+from capstone.data.normalizer import TextNormalizer
+
+
+class TextNormalizerTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.normalizer = TextNormalizer()
+
+    def test_removes_urls_digits_and_punctuation(self):
+        text = "Watch it at https://example.com/movie or www.example.org in 2024!!!"
+        self.assertEqual(self.normalizer(text), "watch")
+
+    def test_removes_stop_words_and_lemmatizes(self):
+        self.assertEqual(self.normalizer("The movies were GREAT"), "movie great")
+
+    def test_collapses_whitespace(self):
+        self.assertEqual(
+            self.normalizer("  good;;;  acting\n\tplots  "), "good acting plot"
+        )
+
+    def test_lemma_cache_counts_hits_and_misses(self):
+        normalizer = TextNormalizer(lemma_cache_size=10)
+        normalizer("cats cats dogs cats")
+        info = normalizer.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 2))
+
+
+class NormalizeTextsTests(unittest.TestCase):
+
+    def test_keeps_the_order_of_the_rows_across_processes(self):
+        texts = [f"review {i} with {i % 7} cats and {i % 5} dogs" for i in range(50)]
+        df = pd.DataFrame({"text": texts, "label": range(50)})
+        processed = pre_process.preprocess_dataframe(df.copy(), n_jobs=3, chunk_size=4)
+        self.assertEqual(
+            processed["text"].tolist(), [TextNormalizer()(text) for text in texts]
+        )
+        self.assertEqual(processed["label"].tolist(), list(range(50)))
+
+    def test_uses_every_cpu_with_negative_n_jobs(self):
+        texts = ["cats chase dogs"] * 6
+        with (
+            mock.patch.object(pre_process.os, "cpu_count", return_value=2),
+            mock.patch.object(pre_process, "_log_lemma_cache") as log,
+        ):
+            pre_process.normalize_texts(texts, -1, chunk_size=2)
+        self.assertEqual(log.call_args.args[2], 2)
+
+    def test_combines_the_lemma_cache_stats_of_every_worker(self):
+        texts = ["cats chase dogs", "dogs chase cats", "cats nap"] * 4
+        for n_jobs in (1, 2):
+            with (
+                self.subTest(n_jobs=n_jobs),
+                mock.patch.object(pre_process, "_log_lemma_cache") as log,
+            ):
+                normalized = pre_process.normalize_texts(texts, n_jobs, chunk_size=3)
+                self.assertEqual(normalized, [TextNormalizer()(text) for text in texts])
+                hits, misses, processes = log.call_args.args
+                self.assertEqual(hits + misses, 32)
+                self.assertEqual(processes, n_jobs)
+                # Every worker misses each distinct word once at most
+                self.assertLessEqual(misses, 4 * n_jobs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from capstone.modeling import predict
+
+REVIEWS = ["great movie", "terrible plot", "great acting", "boring story"] * 6
+
+
+class LowercaseNormalizer:
+    """Stands in for the NLTK normalizer, which needs downloaded corpora."""
+
+    def normalize(self, text):
+        return text.lower()
+
+
+def read_output(path):
+    fmt = predict.file_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "jsonl":
+        return pd.read_json(path, lines=True)
+    return pd.read_parquet(path)
+
+
+class PredictFileTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.vectorizer = CountVectorizer().fit(REVIEWS)
+        labels = [1, 0, 1, 0] * 6
+        cls.model = LogisticRegression().fit(cls.vectorizer.transform(REVIEWS), labels)
+        cls.frame = pd.DataFrame({"id": range(len(REVIEWS)), "review": REVIEWS})
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        for patcher in (
+            mock.patch.object(
+                predict,
+                "load_registered_model",
+                return_value=(self.model, self.vectorizer, "3"),
+            ),
+            mock.patch.object(predict, "TextNormalizer", LowercaseNormalizer),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_input(self, fmt):
+        path = self.dir / f"reviews.{fmt}"
+        if fmt == "csv":
+            self.frame.to_csv(path, index=False)
+        elif fmt == "jsonl":
+            self.frame.to_json(path, orient="records", lines=True)
+        else:
+            self.frame.to_parquet(path, index=False)
+        return path
+
+    def predict(self, source, output):
+        return predict.predict_file(
+            str(source), output, "model", id_column="id", chunk_size=5
+        )
+
+    def predict_until_crash(self, source, output, chunks):
+        """Crash after writing chunk ``chunks + 1``, before it is checkpointed."""
+        save_checkpoint = predict.save_checkpoint
+        saved = []
+
+        def crash(path, checkpoint):
+            if len(saved) == chunks:
+                raise KeyboardInterrupt
+            saved.append(checkpoint["rows_done"])
+            save_checkpoint(path, checkpoint)
+
+        with mock.patch.object(predict, "save_checkpoint", crash):
+            self.predict(source, output)
+
+    def test_input_chunks_skip_rows(self):
+        for fmt in ("csv", "jsonl", "parquet"):
+            with self.subTest(fmt=fmt):
+                chunks = list(predict.iter_input_chunks(self.write_input(fmt), 5, 7))
+                self.assertTrue(all(0 < len(chunk) <= 5 for chunk in chunks))
+                self.assertEqual(
+                    pd.concat(chunks)["id"].tolist(), list(range(7, len(REVIEWS)))
+                )
+
+    def test_jsonl_output_has_one_record_per_line(self):
+        output = self.dir / "predictions.jsonl"
+        self.predict(self.write_input("csv"), output)
+        lines = output.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(lines), len(REVIEWS))
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record["row"] for record in records], list(range(24)))
+
+    def test_resumes_an_interrupted_run_without_duplicates(self):
+        source = self.write_input("parquet")
+        for suffix in (".csv", ".jsonl", ".parquet"):
+            with self.subTest(output=suffix):
+                expected_path = self.dir / f"expected{suffix}"
+                self.predict(source, expected_path)
+                expected = read_output(expected_path)
+
+                output = self.dir / f"predictions{suffix}"
+                with self.assertRaises(KeyboardInterrupt):
+                    self.predict_until_crash(source, output, chunks=2)
+
+                self.assertEqual(self.predict(source, output), len(REVIEWS) - 10)
+                result = read_output(output)
+                self.assertEqual(result["row"].tolist(), list(range(len(REVIEWS))))
+                pd.testing.assert_frame_equal(result, expected)
+                self.assertEqual(self.predict(source, output), 0)
+
+    def test_refuses_a_checkpoint_of_another_model_version(self):
+        source = self.write_input("csv")
+        output = self.dir / "predictions.csv"
+        self.predict(source, output)
+        with (
+            mock.patch.object(
+                predict,
+                "load_registered_model",
+                return_value=(self.model, self.vectorizer, "4"),
+            ),
+            self.assertRaises(ValueError),
+        ):
+            self.predict(source, output)
+
+
+if __name__ == "__main__":
+    unittest.main()
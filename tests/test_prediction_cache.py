@@ -0,0 +1,119 @@
+from pathlib import Path
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from brainserve.prediction_cache import (
+    PredictionCache,
+    SqlitePredictionCache,
+    cache_key,
+)
+
+
+class PredictionCacheTests(unittest.TestCase):
+
+    def make_cache(self, max_size, ttl=0.0):
+        return PredictionCache(max_size, ttl, on_evict=self.record_eviction)
+
+    def setUp(self):
+        self.evictions = []
+
+    def record_eviction(self, reason, count):
+        self.evictions.append((reason, count))
+
+    def test_keys_depend_on_the_model_version(self):
+        self.assertEqual(cache_key("1", "good film"), cache_key("1", "good film"))
+        self.assertNotEqual(cache_key("1", "good film"), cache_key("2", "good film"))
+
+    def test_hits_and_misses(self):
+        cache = self.make_cache(10)
+        keys = [cache_key("1", text) for text in ("good", "bad")]
+        self.assertEqual(cache.get_many(keys), [None, None])
+        cache.put_many("1", keys[:1], [(1, 0.9)])
+        self.assertEqual(cache.get_many(keys), [(1, 0.9), None])
+
+    def test_least_recently_used_is_evicted(self):
+        cache = self.make_cache(2)
+        a, b, c = (cache_key("1", text) for text in "abc")
+        cache.put_many("1", [a, b], [(1, 0.9), (0, 0.1)])
+        cache.get_many([a])
+        cache.put_many("1", [c], [(1, 0.8)])
+        self.assertEqual(cache.get_many([a, b, c]), [(1, 0.9), None, (1, 0.8)])
+        self.assertEqual(self.evictions, [("capacity", 1)])
+
+    def test_expired_entries_are_misses(self):
+        cache = self.make_cache(10, ttl=0.05)
+        key = cache_key("1", "good")
+        cache.put_many("1", [key], [(1, 0.9)])
+        time.sleep(0.1)
+        self.assertEqual(cache.get_many([key]), [None])
+        self.assertEqual(self.evictions, [("expired", 1)])
+
+    def test_invalidate_drops_only_the_retired_model(self):
+        cache = self.make_cache(10)
+        retired, current, canary = (
+            cache_key(version, "good") for version in ("1", "2", "3")
+        )
+        cache.put_many("1", [retired], [(1, 0.9)])
+        cache.put_many("2", [current], [(1, 0.8)])
+        cache.put_many("3", [canary], [(0, 0.4)])
+        cache.invalidate("1")
+        self.assertEqual(
+            cache.get_many([retired, current, canary]), [None, (1, 0.8), (0, 0.4)]
+        )
+        self.assertEqual(self.evictions, [("model_change", 1)])
+
+
+class SqlitePredictionCacheTests(PredictionCacheTests):
+
+    def make_cache(self, max_size, ttl=0.0):
+        return SqlitePredictionCache(
+            Path(self.tmp.name) / "predictions.db",
+            max_size,
+            ttl,
+            on_evict=self.record_eviction,
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_caches_on_the_same_file_share_hits(self):
+        key = cache_key("1", "good")
+        self.make_cache(10).put_many("1", [key], [(1, 0.9)])
+        self.assertEqual(self.make_cache(10).get_many([key]), [(1, 0.9)])
+
+    def test_hits_update_access_times_in_batches(self):
+        cache = self.make_cache(10)
+        a, b = cache_key("1", "a"), cache_key("1", "b")
+        cache.put_many("1", [a, b], [(1, 0.9), (0, 0.1)])
+        cache.get_many([a])
+        # Both keys still look unread until the touched keys are flushed
+        self.assertEqual(len(set(self.accessed_at(cache).values())), 1)
+        cache.TOUCH_INTERVAL = 0.0
+        cache.get_many([a])
+        accessed_at = self.accessed_at(cache)
+        self.assertGreater(accessed_at[a], accessed_at[b])
+
+    def test_size_is_checked_every_hundredth_of_the_capacity(self):
+        cache = self.make_cache(200)
+        keys = [cache_key("1", str(i)) for i in range(201)]
+        cache.put_many("1", keys[:1], [(1, 0.5)])
+        with mock.patch.object(
+            SqlitePredictionCache, "__len__", return_value=0
+        ) as size:
+            cache.put_many("1", keys[1:2], [(1, 0.5)])
+            self.assertEqual(size.call_count, 1)
+        cache.put_many("1", keys[2:], [(1, 0.5)] * 199)
+        self.assertEqual(len(cache), 200)
+        self.assertEqual(self.evictions, [("capacity", 1)])
+
+    def accessed_at(self, cache):
+        rows = cache._connection().execute("SELECT key, accessed_at FROM predictions")
+        return dict(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from capstone.config import METRICS_PATH
+from capstone.modeling import register
+
+PARAMS = {
+    "model_training": {"model_name": "my_model"},
+    "model_registration": {"min_ci_low": {"accuracy": 0.7}},
+}
+
+
+class ReleaseGateTests(unittest.TestCase):
+
+    def run_main(self, metrics):
+        model_info = {"run_id": "abc", "model_path": "model"}
+        with (
+            mock.patch.object(register, "load_model_info", return_value=model_info),
+            mock.patch.object(register, "load_metrics", return_value=metrics) as load,
+            mock.patch.object(register, "load_params", return_value=PARAMS),
+            mock.patch.object(register, "register_model") as register_model,
+        ):
+            register.main()
+        load.assert_called_once_with(METRICS_PATH)
+        return register_model
+
+    def test_passes_when_the_lower_bound_reaches_the_threshold(self):
+        register.check_release_gate({"accuracy_ci_low": 0.7}, {"accuracy": 0.7})
+
+    def test_fails_on_a_missing_interval(self):
+        with self.assertRaisesRegex(ValueError, "accuracy_ci_low is missing"):
+            register.check_release_gate({"accuracy": 0.9}, {"accuracy": 0.7})
+
+    def test_registers_a_model_that_clears_the_gate(self):
+        register_model = self.run_main({"accuracy": 0.8, "accuracy_ci_low": 0.75})
+        register_model.assert_called_once_with(
+            "my_model", {"run_id": "abc", "model_path": "model"}
+        )
+
+    def test_exits_non_zero_below_the_threshold(self):
+        with self.assertRaises(SystemExit) as raised:
+            self.run_main({"accuracy": 0.8, "accuracy_ci_low": 0.65})
+        self.assertEqual(raised.exception.code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from standin_model import use_standin_model
+
+use_standin_model()
+
+from brainserve import serving
+from brainserve.app import app
+from brainserve.model_cache import ModelCache
+from brainserve.reloader import ModelWatcher
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+class FakeModelCache(ModelCache):
+    """A registry of versions that all serve the stand-in model, except ``broken``."""
+
+    def __init__(self, root, served, broken=()):
+        super().__init__(root, "capstone_model")
+        self.served = served
+        self.broken = set(broken)
+        self.loaded = []
+
+    def load(self, version, engine="sklearn", latest=True):
+        if version in self.broken:
+            raise OSError(f"version {version} is unreadable")
+        self.loaded.append(version)
+        return self.served.model, self.served.vectorizer
+
+
+class ModelWatcherTests(unittest.TestCase):
+
+    def test_keeps_polling_after_a_failed_reload(self):
+        calls = []
+        polled = threading.Event()
+
+        def reload_fn():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                raise RuntimeError("registry unavailable")
+            polled.set()
+
+        watcher = ModelWatcher(reload_fn, 0.01)
+        self.addCleanup(watcher.stop)
+        with mock.patch("traceback.print_exc"):
+            watcher.ensure_started()
+            self.assertTrue(polled.wait(5))
+        self.assertGreaterEqual(len(calls), 2)
+
+    def test_disabled_without_an_interval(self):
+        watcher = ModelWatcher(mock.Mock(), 0)
+        watcher.ensure_started()
+        self.assertIsNone(watcher._pid)
+
+
+class ReloadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.served = serving._served
+        self.cache = FakeModelCache(tmp.name, self.served, broken={"13"})
+        self.latest = "1"
+        for patcher in (
+            mock.patch.object(serving, "model_cache", self.cache),
+            mock.patch.object(serving, "_served", self.served._replace(version="1")),
+            mock.patch.object(
+                serving, "get_latest_model_version", lambda name: self.latest
+            ),
+            mock.patch.object(serving, "_canary", None),
+            mock.patch.object(serving, "_shadow", None),
+            mock.patch.object(serving, "shadow_runner", None),
+            mock.patch.object(serving, "_publish_versions"),
+            mock.patch.dict(os.environ, {"ADMIN_TOKEN": "secret"}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ReloadModelTests(ReloadTestCase):
+
+    def test_swaps_in_the_latest_version(self):
+        self.latest = "2"
+        self.assertTrue(serving.reload_model())
+        self.assertEqual(serving.current_model().version, "2")
+        self.assertFalse(serving.reload_model())
+
+    def test_does_nothing_without_a_registered_version(self):
+        self.latest = None
+        self.assertFalse(serving.reload_model())
+        self.assertEqual(serving.current_model().version, "1")
+        self.assertEqual(self.cache.loaded, [])
+
+    def test_swaps_in_a_canary_and_a_shadow(self):
+        self.assertTrue(serving.reload_model("4", role="canary"))
+        self.assertTrue(serving.reload_model("5", role="shadow"))
+        self.assertEqual(serving._canary.version, "4")
+        self.assertEqual(serving._shadow.version, "5")
+        self.assertIsNotNone(serving.shadow_runner)
+        self.assertEqual(serving.current_model().version, "1")
+
+    def test_keeps_the_predictions_of_a_version_still_held(self):
+        serving.reload_model("4", role="canary")
+        with mock.patch.object(serving, "prediction_cache") as cache:
+            # The canary is promoted: version 4 stays held as the canary
+            serving.reload_model("4")
+            serving.reload_model("6", role="canary")
+        cache.invalidate.assert_called_once_with("1")
+
+    def test_keeps_the_current_model_when_loading_fails(self):
+        with self.assertRaises(OSError):
+            serving.reload_model("13")
+        self.assertEqual(serving.current_model().version, "1")
+
+
+class SyncTests(ReloadTestCase):
+
+    def test_swaps_to_the_shared_target(self):
+        serving.sync_model_versions()
+        self.assertEqual(self.cache.loaded, [])
+        self.cache.set_target_version("primary", "5")
+        serving.sync_model_versions()
+        self.assertEqual(serving.current_model().version, "5")
+
+    def test_swaps_the_canary_and_shadow_to_their_targets(self):
+        self.cache.set_target_version("canary", "4")
+        self.cache.set_target_version("shadow", "13")
+        self.cache.set_target_version("primary", "5")
+        # The broken shadow does not keep the others from swapping
+        with self.assertRaises(OSError):
+            serving.sync_model_versions()
+        self.assertEqual(serving.current_model().version, "5")
+        self.assertEqual(serving._canary.version, "4")
+        self.assertIsNone(serving._shadow)
+
+    def test_starts_with_the_targets_before_the_environment(self):
+        self.cache.set_target_version("canary", "4")
+        canary = serving.load_extra_version("canary", serving.CANARY_MODEL_VERSION)
+        self.assertEqual(canary.version, "4")
+        self.assertIsNone(
+            serving.load_extra_version("shadow", serving.SHADOW_MODEL_VERSION)
+        )
+
+    def test_follows_the_registry_only_when_it_changes(self):
+        self.latest = "2"
+        serving.poll_registry()
+        self.assertEqual(self.cache.target_version("primary"), "2")
+        # A rollback holds until another version is registered
+        self.cache.set_target_version("primary", "1")
+        serving.poll_registry()
+        self.assertEqual(self.cache.target_version("primary"), "1")
+        self.latest = "3"
+        serving.poll_registry()
+        self.assertEqual(self.cache.target_version("primary"), "3")
+
+
+class AdminReloadEndpointTests(ReloadTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = app.test_client()
+
+    def reload(self, headers=ADMIN, **payload):
+        return self.client.post("/admin/reload", json=payload, headers=headers)
+
+    def test_reloads_the_requested_version(self):
+        response = self.reload(version=3)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            response.get_json(), {"accepted": True, "role": "primary", "version": "3"}
+        )
+        self.assertEqual(serving.current_model().version, "3")
+        self.assertEqual(self.cache.target_version("primary"), "3")
+
+    def test_reloads_the_latest_version_without_a_body(self):
+        self.latest = "2"
+        self.assertEqual(
+            self.client.post("/admin/reload", headers=ADMIN).status_code, 202
+        )
+        self.assertEqual(self.cache.target_version("primary"), "2")
+
+    def test_a_reload_reaches_every_worker(self):
+        context = multiprocessing.get_context("fork")
+        requested = context.Event()
+        receiver, sender = context.Pipe(duplex=False)
+        worker = context.Process(target=self.other_worker, args=(requested, sender))
+        worker.start()
+        self.addCleanup(worker.join, 10)
+        self.assertEqual(self.reload(version=3).status_code, 202)
+        self.assertEqual(self.reload(version=4, role="canary").status_code, 202)
+        self.assertEqual(self.reload(version=5, role="shadow").status_code, 202)
+        requested.set()
+        self.assertTrue(receiver.poll(10))
+        self.assertEqual(receiver.recv(), (("1", None, None), ("3", "4", "5")))
+
+    @staticmethod
+    def other_worker(requested, sender):
+        """A second worker forked from the same master, syncing in the background."""
+
+        def held():
+            return tuple(
+                served.version if served is not None else None
+                for served in (
+                    serving.current_model(),
+                    serving._canary,
+                    serving._shadow,
+                )
+            )
+
+        before = held()
+        serving.sync_watcher = ModelWatcher(serving.sync_model_versions, 0.01)
+        requested.wait(10)
+        deadline = time.monotonic() + 5
+        while held() != ("3", "4", "5") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        sender.send((before, held()))
+
+    def test_disabled_without_admin_token(self):
+        del os.environ["ADMIN_TOKEN"]
+        response = self.reload(version=3)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(serving.current_model().version, "1")
+
+    def test_rejects_a_wrong_token(self):
+        response = self.reload(headers={"X-Admin-Token": "guess"}, version=3)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(serving.current_model().version, "1")
+
+    def test_rejects_an_invalid_version(self):
+        self.assertEqual(self.reload(version="latest").status_code, 400)
+        self.assertEqual(self.reload(role="canary").status_code, 400)
+        self.assertEqual(self.reload(version=3, role="standby").status_code, 400)
+
+    def test_reloads_the_canary(self):
+        response = self.reload(version=4, role="canary")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            response.get_json(), {"accepted": True, "role": "canary", "version": "4"}
+        )
+        self.assertEqual(serving._canary.version, "4")
+        self.assertEqual(serving.current_model().version, "1")
+        self.assertEqual(self.cache.target_version("canary"), "4")
+
+    def test_reports_a_failed_load_and_keeps_serving(self):
+        response = self.reload(version=13)
+        self.assertEqual(response.status_code, 503)
+        body = response.get_json()
+        self.assertIn("version 13", body["error"])
+        self.assertEqual(body["model_version"], "1")
+        self.assertIsNone(self.cache.target_version("primary"))
+        predictions = self.client.post("/v1/predict/batch", json=["Great movie!"])
+        self.assertEqual(predictions.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
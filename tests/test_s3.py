@@ -0,0 +1,116 @@
+from io import BytesIO
+from pathlib import Path
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from capstone.data.connections.s3 import S3Operations
+
+FILE_KEY = "data/data.csv"
+
+
+class FakeS3Client:
+    """Serves one object, whole or in ranged GETs, and records the ranges requested."""
+
+    def __init__(self, body, etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.ranges = []
+        self.fail_range = None
+        self.lock = threading.Lock()
+
+    def head_object(self, Bucket, Key):
+        return {"ETag": self.etag, "ContentLength": len(self.body)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        if Range is None:
+            return {"Body": BytesIO(self.body)}
+        if IfMatch != self.etag:
+            raise OSError("PreconditionFailed")
+        start, end = map(int, Range.removeprefix("bytes=").split("-"))
+        with self.lock:
+            self.ranges.append((start, end))
+        if start == self.fail_range:
+            raise OSError("connection reset")
+        return {"Body": BytesIO(self.body[start : end + 1])}
+
+
+def s3_operations(client):
+    with mock.patch("boto3.client", return_value=client):
+        return S3Operations("bucket", "key", "secret", max_workers=4)
+
+
+class FileChunkTests(unittest.TestCase):
+
+    def test_streams_the_rows_in_chunks(self):
+        rows = "".join(f"review {i},{i % 2}\n" for i in range(25))
+        s3 = s3_operations(FakeS3Client(f"review,sentiment\n{rows}".encode()))
+        chunks = list(s3.iter_file_chunks_from_s3(FILE_KEY, chunksize=10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(
+            pd.concat(chunks)["review"].tolist(), [f"review {i}" for i in range(25)]
+        )
+
+
+class DownloadFileTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+        self.client = FakeS3Client(bytes(range(256)) * 40)
+        self.s3 = s3_operations(self.client)
+
+    def download(self):
+        return self.s3.download_file_from_s3(FILE_KEY, self.cache_dir, part_size=1000)
+
+    def cached_files(self):
+        return sorted(
+            str(path.relative_to(self.cache_dir))
+            for path in self.cache_dir.rglob("*")
+            if path.is_file()
+        )
+
+    def test_reassembles_the_ranged_parts(self):
+        local_path = self.download()
+        self.assertEqual(local_path, self.cache_dir / "v1" / FILE_KEY)
+        self.assertEqual(local_path.read_bytes(), self.client.body)
+        self.assertEqual(
+            sorted(self.client.ranges),
+            [(start, min(start + 999, 10239)) for start in range(0, 10240, 1000)],
+        )
+        self.assertEqual(self.cached_files(), ["v1/data/data.csv"])
+
+    def test_reuses_the_cached_file(self):
+        self.download()
+        self.client.ranges.clear()
+        self.assertEqual(self.download().read_bytes(), self.client.body)
+        self.assertEqual(self.client.ranges, [])
+
+    def test_replaces_the_copy_of_a_changed_object(self):
+        self.download()
+        self.client.body = b"changed" * 500
+        self.client.etag = '"v2"'
+        local_path = self.download()
+        self.assertEqual(local_path.read_bytes(), self.client.body)
+        self.assertEqual(self.cached_files(), ["v2/data/data.csv"])
+        self.assertFalse((self.cache_dir / "v1").exists())
+
+    def test_removes_the_partial_file_when_a_range_fails(self):
+        self.client.fail_range = 3000
+        with (
+            mock.patch("capstone.data.connections.s3.logging"),
+            self.assertRaises(OSError),
+        ):
+            self.download()
+        self.assertEqual(self.cached_files(), [])
+        # The next attempt downloads the whole object again
+        self.client.fail_range = None
+        self.assertEqual(self.download().read_bytes(), self.client.body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from capstone.modeling import train
+from capstone.modeling.train import (
+    _fit_parts,
+    map_coefficients,
+    train_incremental,
+    train_warm_start,
+)
+from capstone.utils import save_features
+
+
+class RecordingClassifier:
+    """Records the rows ``partial_fit`` is called with, by their feature value."""
+
+    def __init__(self):
+        self.rows = []
+
+    def partial_fit(self, x, y, classes):
+        self.rows.extend(x.toarray().ravel().astype(int).tolist())
+
+
+class MapCoefficientsTests(unittest.TestCase):
+
+    def vectorizer(self, *terms):
+        return CountVectorizer().fit([" ".join(terms)])
+
+    def test_keeps_the_weight_of_every_term_that_moved(self):
+        source = self.vectorizer("bad", "good", "plot")
+        target = self.vectorizer("acting", "bad", "good", "music", "plot")
+        mapped = map_coefficients(np.array([-2.0, 3.0, 0.5]), source, target)
+        np.testing.assert_array_equal(mapped, [0.0, -2.0, 3.0, 0.0, 0.5])
+
+    def test_drops_the_weight_of_terms_no_longer_in_the_vocabulary(self):
+        source = self.vectorizer("acting", "bad", "good", "plot")
+        target = self.vectorizer("bad", "plot")
+        mapped = map_coefficients(np.array([1.0, -2.0, 3.0, 0.5]), source, target)
+        np.testing.assert_array_equal(mapped, [-2.0, 0.5])
+
+    def test_copies_unchanged_columns(self):
+        vectorizer = self.vectorizer("bad", "good")
+        coef = np.array([-1.0, 1.0])
+        mapped = map_coefficients(coef, vectorizer, self.vectorizer("good", "bad"))
+        np.testing.assert_array_equal(mapped, coef)
+        self.assertIsNot(mapped, coef)
+
+
+class IncrementalTrainingTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store_dir = Path(tmp.name)
+
+    def test_fits_every_row_once_per_epoch(self):
+        save_features(np.arange(1, 26).reshape(-1, 1), np.zeros(25), self.store_dir, 10)
+        clf = RecordingClassifier()
+        _fit_parts(clf, self.store_dir, np.array([0, 1]), 3, 4, 0)
+        self.assertEqual(sorted(clf.rows), sorted(list(range(1, 26)) * 3))
+        # Mini-batches are shuffled rather than in file order
+        self.assertNotEqual(clf.rows[:25], list(range(1, 26)))
+
+    def test_learns_from_streamed_parts(self):
+        rng = np.random.default_rng(0)
+        weights = rng.normal(size=20)
+        x = (rng.random((1000, 20)) < 0.3).astype(float)
+        y = (x @ weights > np.median(x @ weights)).astype(int)
+        save_features(x[:800], y[:800], self.store_dir, rows_per_part=300)
+        clf = train_incremental(self.store_dir, 0, epochs=10, batch_size=50)
+        np.testing.assert_array_equal(clf.classes_, [0, 1])
+        self.assertGreater((clf.predict(x[800:]) == y[800:]).mean(), 0.85)
+
+
+class WarmStartTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store_dir = Path(tmp.name)
+
+    def test_fits_only_the_selected_rows_of_every_part(self):
+        x = np.arange(1, 26).reshape(-1, 1)
+        save_features(x, np.zeros(25), self.store_dir, rows_per_part=10)
+        rows = np.zeros(25, dtype=bool)
+        rows[[3, 9, 10, 17, 24]] = True
+        clf = RecordingClassifier()
+        _fit_parts(clf, self.store_dir, np.array([0, 1]), 2, 2, 0, rows=rows)
+        self.assertEqual(sorted(clf.rows), [4, 4, 10, 10, 11, 11, 18, 18, 25, 25])
+
+    def test_refines_the_production_model_on_new_rows_only(self):
+        rng = np.random.default_rng(0)
+        weights = rng.normal(size=20)
+        x = rng.random((1200, 20)) < 0.3
+        y = (x @ weights > np.median(x @ weights)).astype(int)
+        ids = np.arange(1200)
+        save_features(x.astype(float), y, self.store_dir, 500, row_ids=ids)
+        vectorizer = CountVectorizer().fit([" ".join(f"t{i:02d}" for i in range(20))])
+        base = LogisticRegression().fit(x[:1000], y[:1000])
+
+        clf = train_warm_start(
+            self.store_dir, base, vectorizer, vectorizer, ids[:1000], 0, epochs=1
+        )
+        # A handful of new rows nudges the coefficients rather than replacing them
+        change = np.abs(clf.coef_ - base.coef_).max()
+        self.assertLess(change, 0.1 * np.abs(base.coef_).max())
+        self.assertGreater((clf.predict(x[1000:]) == y[1000:]).mean(), 0.8)
+
+    def test_keeps_the_production_model_without_new_rows(self):
+        x = np.eye(4)
+        save_features(x, np.array([0, 1, 0, 1]), self.store_dir, row_ids=np.arange(4))
+        vectorizer = CountVectorizer().fit(["a1 b2 c3 d4"])
+        base = LogisticRegression().fit(x, [0, 1, 0, 1])
+        clf = train_warm_start(
+            self.store_dir, base, vectorizer, vectorizer, np.arange(4), 0
+        )
+        self.assertIs(clf, base)
+
+
+class MainTests(unittest.TestCase):
+
+    def test_exits_non_zero_on_failure(self):
+        params = {"model_training": {"random_state": 0, "model_name": "m", "mode": "x"}}
+        with (
+            mock.patch.object(train, "load_params", return_value=params),
+            mock.patch.object(train, "load_feature_ids"),
+            mock.patch.object(train, "save_model") as save_model,
+            mock.patch("builtins.print"),
+            self.assertLogs(level="ERROR") as logs,
+            self.assertRaises(SystemExit) as raised,
+        ):
+            train.main()
+        self.assertEqual(raised.exception.code, 1)
+        self.assertIn("Unknown training mode 'x'", logs.output[0])
+        save_model.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
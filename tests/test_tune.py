@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from capstone.modeling import tune
+
+PARAMS = {
+    "model_tuning": {"grid": {"C": [0.1, 1.0]}, "cv": 2, "n_jobs": 1},
+    "feature_engineering": {"vectorizer_type": "count"},
+    "model_training": {"random_state": 0},
+    "model_evaluation": {"experiment_name": "capstone"},
+}
+
+RESULTS = [
+    {"params": {"C": 0.1, "max_features": None}, "metrics": {"auc_mean": 0.7}},
+    {"params": {"C": 1.0, "max_features": None}, "metrics": {"auc_mean": 0.8}},
+]
+
+
+class BuildCandidatesTests(unittest.TestCase):
+
+    def test_fills_missing_keys_with_the_trainer_defaults(self):
+        defaults = {"penalty": "l2", "solver": "liblinear", "max_features": None}
+        self.assertEqual(
+            tune.build_candidates({"C": [0.1, 10.0]}),
+            [{"C": 0.1, **defaults}, {"C": 10.0, **defaults}],
+        )
+
+    def test_drops_the_pairs_a_solver_cannot_fit(self):
+        candidates = tune.build_candidates(
+            {"penalty": ["l1", "l2"], "solver": ["liblinear", "lbfgs"]}
+        )
+        self.assertEqual(
+            [(c["solver"], c["penalty"]) for c in candidates],
+            [("liblinear", "l1"), ("liblinear", "l2"), ("lbfgs", "l2")],
+        )
+
+    def test_rejects_a_grid_without_valid_candidates(self):
+        with self.assertRaises(ValueError):
+            tune.build_candidates({"penalty": ["l1"], "solver": ["lbfgs"]})
+
+
+class TuneTests(unittest.TestCase):
+
+    def test_saves_the_best_params_when_mlflow_is_unreachable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            best_params_path = Path(tmp) / "best_params.json"
+            data = pd.DataFrame({"review": ["good", "bad"], "sentiment": [1, 0]})
+            with (
+                mock.patch.object(tune, "load_params", return_value=PARAMS),
+                mock.patch.object(tune, "load_data", return_value=data),
+                mock.patch.object(tune, "vectorize_folds"),
+                mock.patch.object(tune, "run_search", return_value=RESULTS),
+                mock.patch.object(tune, "BEST_PARAMS_PATH", best_params_path),
+                mock.patch.dict(os.environ),
+                self.assertLogs(level="WARNING") as logs,
+            ):
+                os.environ.pop("MLFLOW_TRACKING_URI", None)
+                tune.main()
+            with open(best_params_path) as file:
+                self.assertEqual(json.load(file), {"C": 1.0, "auc_mean": 0.8})
+        self.assertIn("Could not log the search to MLflow", logs.output[0])
+
+    def test_exits_non_zero_on_failure(self):
+        params = {
+            **PARAMS,
+            "model_tuning": {"grid": {"penalty": ["l1"], "solver": ["sag"]}},
+        }
+        with (
+            mock.patch.object(tune, "load_params", return_value=params),
+            mock.patch.object(tune, "load_data"),
+            mock.patch("builtins.print"),
+            self.assertLogs(level="ERROR"),
+            self.assertRaises(SystemExit) as raised,
+        ):
+            tune.main()
+        self.assertEqual(raised.exception.code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+from capstone.utils import (
+    iter_features,
+    load_feature_ids,
+    load_feature_labels,
+    load_features,
+    save_features,
+)
+
+
+class FeatureStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store_dir = Path(tmp.name, "features")
+        self.x = sparse.random(25, 12, density=0.2, format="csr", random_state=0)
+        self.y = np.arange(25) % 2
+        self.ids = np.arange(100, 125, dtype=np.uint64)
+
+    def test_round_trips_the_features(self):
+        for rows_per_part in (None, 10, 25):
+            with self.subTest(rows_per_part=rows_per_part):
+                save_features(self.x, self.y, self.store_dir, rows_per_part, self.ids)
+                x, y = load_features(self.store_dir)
+                self.assertTrue(sparse.isspmatrix_csr(x))
+                self.assertEqual((x != self.x).nnz, 0)
+                np.testing.assert_array_equal(y, self.y)
+                np.testing.assert_array_equal(load_feature_labels(self.store_dir), y)
+                np.testing.assert_array_equal(
+                    load_feature_ids(self.store_dir), self.ids
+                )
+
+    def test_streams_the_parts_in_order(self):
+        save_features(self.x, self.y, self.store_dir, rows_per_part=10)
+        parts = list(iter_features(self.store_dir))
+        self.assertEqual([x.shape[0] for x, _ in parts], [10, 10, 5])
+        self.assertEqual((sparse.vstack([x for x, _ in parts]) != self.x).nnz, 0)
+        np.testing.assert_array_equal(np.concatenate([y for _, y in parts]), self.y)
+
+    def test_replaces_the_parts_of_a_previous_save(self):
+        save_features(self.x, self.y, self.store_dir, rows_per_part=5)
+        save_features(self.x[:8], self.y[:8], self.store_dir)
+        self.assertEqual(len(list(self.store_dir.glob("part-*.npz"))), 1)
+        x, y = load_features(self.store_dir)
+        self.assertEqual(x.shape, (8, 12))
+        np.testing.assert_array_equal(y, self.y[:8])
+
+    def test_saves_an_empty_matrix(self):
+        save_features(self.x[:0], self.y[:0], self.store_dir, rows_per_part=10)
+        x, y = load_features(self.store_dir)
+        self.assertEqual(x.shape, (0, 12))
+        self.assertEqual(len(y), 0)
+
+    def test_rejects_a_missing_store(self):
+        for load in (load_features, load_feature_labels, load_feature_ids):
+            with self.subTest(load=load.__name__), self.assertRaises(FileNotFoundError):
+                load(self.store_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()